@@ -0,0 +1,783 @@
+"""
+Benchmarks for the QuackScript compiler and virtual machine.
+
+Each benchmark is a subcommand:
+
+    python Benchmarks.py object-load --functions 2000
+    python Benchmarks.py lazy-load --functions 2000
+    python Benchmarks.py link --functions 500 --programs 5
+    python Benchmarks.py startup --record startup.jsonl
+    python Benchmarks.py run-startup --runs 50
+    python Benchmarks.py inline-parse --functions 500
+    python Benchmarks.py build --files 32 --jobs 4
+    python Benchmarks.py codegen --functions 400 --jobs 4
+    python Benchmarks.py stream --functions 900
+    python Benchmarks.py constants --statements 5000
+    python Benchmarks.py statements --functions 300
+    python Benchmarks.py ast-memory --functions 500
+    python Benchmarks.py optimize --repeat 5
+"""
+
+import argparse
+import dataclasses
+import io
+import json
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from QuackBuild import build_tree, find_sources
+from QuackCompiler import PARSER_CACHE_FILE, ModuleResolver, compile_program, compile_source, get_parser
+from QuackLinker import link_program
+from QuackMetrics import CompileMetrics, count_ir_nodes
+from QuackObjectFile import read_object_file, write_object_file
+from QuackOptimizer import DEFAULT_OPTIMIZATION_LEVEL, DEFAULT_UNROLL_FACTOR, JUMPS
+from QuackTransformer import QuackTransformer
+from TransformerClasses import Node, SourceSpans
+from VirtualMachine import QuackVirtualMachine
+
+
+def generate_program(functions: int = 200, statements: int = 20) -> str:
+    """
+    Generates a large but valid QuackScript program with the given number of
+    functions, each one with roughly `statements` statements in its body.
+    """
+    lines = ["program Generated;", "var total: int = 0;", "var scale: float = 1.5;", ""]
+    for f in range(functions):
+        lines.append(f"int func_{f}(n: int, m: int) [")
+        lines.append("    var i, acc: int;")
+        lines.append("    var ratio: float;")
+        lines.append("    {")
+        lines.append("        acc = 0;")
+        lines.append("        i = 0;")
+        for s in range(statements):
+            kind = s % 4
+            if kind == 0:
+                lines.append(f"        acc = acc + n * {s + 1} - m / {s + 2};")
+            elif kind == 1:
+                lines.append(f"        ratio = scale * {s}.5 + acc;")
+            elif kind == 2:
+                lines.append(f"        if (acc > {s * 10} and n < m) {{ acc = acc - {s}; }} else {{ acc = acc + 1; }};")
+            else:
+                lines.append(f"        while (i < {s % 7 + 1}) do {{ acc = acc + i; i = i + 1; }};")
+        lines.append("        return acc;")
+        lines.append("    }")
+        lines.append("];")
+        lines.append("")
+    lines.append("main {")
+    for f in range(0, functions, max(1, functions // 10)):
+        lines.append(f"    total = total + func_{f}({f}, {f + 1});")
+    lines.append('    print("total: ", total, "\\n");')
+    lines.append("}")
+    lines.append("end")
+    return "\n".join(lines)
+
+
+def generate_loop_program(iterations: int = 1000) -> str:
+    """
+    Generates a program whose time goes to a while loop of `iterations`
+    iterations with nested if/else statements in its body and a bound that
+    does not change in the loop.
+    """
+    return f"""program Loops;
+void count(half: int) [
+    var i, parity, evens, odds, small: int;
+    {{
+        i = 0;
+        parity = 0;
+        evens = 0;
+        odds = 0;
+        small = 0;
+        while (i < half * 2) do {{
+            parity = 1 - parity;
+            if (i > 10) {{
+                if (parity == 1) {{
+                    evens = evens + 1;
+                }} else {{
+                    odds = odds + 1;
+                }};
+            }} else {{
+                small = small + 1;
+            }};
+            i = i + 1;
+        }};
+        print(evens, " ", odds, " ", small, "\\n");
+    }}
+];
+main {{
+    count({iterations // 2});
+}}
+end
+"""
+
+
+def generate_counted_program(iterations: int = 1000) -> str:
+    """
+    Generates a program whose time goes to two counted loops of `iterations`
+    iterations each: the product of a range, like factorial_iterativo in
+    tests/factorial.quack, and a sum of multiples of the loop counter.
+    """
+    return f"""program Counted;
+int product(n: int) [
+    var result, i: int;
+    {{
+        result = 1;
+        i = 1;
+        while (i <= n) do {{
+            result = result * i;
+            i = i + 1;
+        }};
+        return result;
+    }}
+];
+int multiples(n: int) [
+    var i, sum: int;
+    {{
+        i = 0;
+        sum = 0;
+        while (i < n) do {{
+            sum = sum + i * 3;
+            i = i + 1;
+        }};
+        return sum;
+    }}
+];
+main {{
+    print(product({iterations}) > 0, " ", multiples({iterations}), "\\n");
+}}
+end
+"""
+
+
+def generate_literal_program(statements: int = 5000, distinct: int = 900) -> str:
+    """
+    Generates a program made of long runs of statements with numeric literals,
+    cycling through `distinct` int and float values. The statements are split in
+    functions of 100 so the temporaries of each one fit its local memory.
+    """
+    lines = ["program Literals;", ""]
+    functions = (statements + 99) // 100
+    for f in range(functions):
+        lines.append(f"int literals_{f}() [")
+        lines.append("    var total: int;")
+        lines.append("    var ratio: float;")
+        lines.append("    {")
+        lines.append("        total = 0;")
+        lines.append("        ratio = 0.0;")
+        for s in range(f * 100, min(statements, (f + 1) * 100)):
+            value = s % distinct
+            lines.append(f"        total = total + {value} * {(value * 7) % distinct};")
+            lines.append(f"        ratio = ratio + {value}.25;")
+        lines.append("        return total;")
+        lines.append("    }")
+        lines.append("];")
+        lines.append("")
+    lines.append("main {")
+    lines.append('    print("total: ", literals_0(), "\\n");')
+    lines.append("}")
+    lines.append("end")
+    return "\n".join(lines)
+
+
+def benchmark_object_load(args):
+    """
+    Compares the load time and size of the binary object format against the
+    previous pickle-based object files.
+    """
+    program = generate_program(functions=args.functions, statements=args.statements)
+    result = compile_source(program)
+    symbol_table, quadruples = result.symbol_table, result.quadruples
+
+    with tempfile.TemporaryDirectory() as tmp:
+        binary_file = os.path.join(tmp, "program.obj")
+        pickle_file = os.path.join(tmp, "program.pickle")
+
+        write_object_file(quadruples, symbol_table, binary_file)
+        with open(pickle_file, "wb") as f:
+            pickle.dump(
+                {
+                    "quadruples": quadruples.quadruples,
+                    "operators": quadruples.operators.operators,
+                    "functions": symbol_table.containers,
+                    "constants_table": symbol_table.constants_table,
+                    "global_container_name": symbol_table.global_container_name,
+                },
+                f,
+            )
+
+        def load_pickle():
+            with open(pickle_file, "rb") as f:
+                return pickle.load(f)
+
+        results = {}
+        for name, loader, path in (
+            ("pickle", load_pickle, pickle_file),
+            ("binary", lambda: read_object_file(binary_file), binary_file),
+        ):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                loader()
+                best = min(best, time.perf_counter() - start)
+            results[name] = (best, os.path.getsize(path))
+
+    print(f"Quadruples: {len(quadruples)}  Functions: {len(symbol_table.containers)}")
+    print(f"{'Format':<10} {'Load (ms)':>12} {'Size (KiB)':>12}")
+    for name, (seconds, size) in results.items():
+        print(f"{name:<10} {seconds * 1000:>12.2f} {size / 1024:>12.1f}")
+
+
+def benchmark_lazy_load(args):
+    """
+    Compares startup time and peak memory of running a large program whose main
+    only calls a few functions, decoding every function up front vs on first call.
+    """
+    program = generate_program(functions=args.functions, statements=args.statements)
+    result = compile_source(program)
+    symbol_table, quadruples = result.symbol_table, result.quadruples
+
+    with tempfile.TemporaryDirectory() as tmp:
+        object_file = os.path.join(tmp, "program.obj")
+        write_object_file(quadruples, symbol_table, object_file)
+
+        results = {}
+        for name, lazy in (("eager", False), ("lazy", True)):
+            best_load = best_run = float("inf")
+            peak = 0
+            for _ in range(args.repeat):
+                tracemalloc.start()
+                start = time.perf_counter()
+                loaded = read_object_file(object_file, lazy=lazy)
+                loaded_at = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    QuackVirtualMachine().execute_program(loaded)
+                finished_at = time.perf_counter()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                called = len(loaded.functions) - 1 - len(loaded.pending_functions)
+                loaded.close()
+                best_load = min(best_load, loaded_at - start)
+                best_run = min(best_run, finished_at - start)
+            results[name] = (best_load, best_run, peak, called)
+
+    print(f"Quadruples: {len(quadruples)}  Functions: {len(symbol_table.containers) - 1}")
+    print(f"{'Mode':<8} {'Load (ms)':>10} {'Load+run (ms)':>14} {'Peak (KiB)':>11} {'Decoded functions':>18}")
+    for name, (load, run, peak, called) in results.items():
+        print(f"{name:<8} {load * 1000:>10.2f} {run * 1000:>14.2f} {peak / 1024:>11.1f} {called:>18}")
+
+
+def benchmark_link(args):
+    """
+    Compares building several programs that each contain a copy of a shared
+    library against compiling the library once as a module and linking it.
+    """
+    library = generate_program(functions=args.functions, statements=args.statements)
+    # The generated program doubles as a library: drop its header and main to get the functions
+    functions = library[library.index("int func_0") : library.index("main {")]
+    calls = "\n".join(f"    total = total + func_{f}({f}, 1);" for f in range(0, args.functions, 50))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "shared.quack"), "w", encoding="utf-8") as f:
+            f.write(f"module shared;\nvar scale: float = 1.5;\n\n{functions}end\n")
+        for p in range(args.programs):
+            main = f"main {{\n{calls}\n    print(total, \"\\n\");\n}}\nend\n"
+            with open(os.path.join(tmp, f"copy_{p}.quack"), "w", encoding="utf-8") as f:
+                f.write(f"program Copy{p};\nvar total: int = 0;\nvar scale: float = 1.5;\n\n{functions}{main}")
+            with open(os.path.join(tmp, f"linked_{p}.quack"), "w", encoding="utf-8") as f:
+                f.write(f"program Linked{p};\nimport shared;\nvar total: int = 0;\n\n{main}")
+
+        start = time.perf_counter()
+        for p in range(args.programs):
+            compile_program(os.path.join(tmp, f"copy_{p}.quack"), os.path.join(tmp, f"copy_{p}.obj"))
+        copied = time.perf_counter() - start
+
+        resolver = ModuleResolver([tmp], use_cache=False)
+        try:
+            start = time.perf_counter()
+            for p in range(args.programs):
+                program_file = os.path.join(tmp, f"linked_{p}.obj")
+                compile_program(os.path.join(tmp, f"linked_{p}.quack"), program_file, resolver)
+                link_program(program_file, resolver.resolve, os.path.join(tmp, f"linked_{p}.exe.obj"))
+            linked = time.perf_counter() - start
+        finally:
+            resolver.cleanup()
+
+    print(f"Programs: {args.programs}  Shared functions: {args.functions}")
+    print(f"{'Build':<22} {'Total (ms)':>12} {'Per program (ms)':>17}")
+    for name, seconds in (("copied library", copied), ("module + link", linked)):
+        print(f"{name:<22} {seconds * 1000:>12.2f} {seconds * 1000 / args.programs:>17.2f}")
+
+
+def benchmark_startup(args):
+    """
+    Measures the wall time of `python Quackify.py --no-cache prog.quack` in fresh
+    processes, with and without the cached parser tables. Results can be appended
+    to a JSON lines file to track them over time.
+    """
+    quackify = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Quackify.py")
+
+    def run(source):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, quackify, "--no-cache", source], check=True, stdout=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "startup.quack")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(generate_program(functions=args.functions, statements=5))
+
+        cold = []
+        warm = []
+        for _ in range(args.repeat):
+            if os.path.exists(PARSER_CACHE_FILE):
+                os.remove(PARSER_CACHE_FILE)
+            cold.append(run(source))
+            warm.append(run(source))
+
+    results = {"cold_parser_cache": statistics.median(cold), "warm_parser_cache": statistics.median(warm)}
+    print(f"{'Parser tables':<20} {'Median (ms)':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<20} {seconds * 1000:>12.2f}")
+
+    if args.record:
+        with open(args.record, "a", encoding="utf-8") as f:
+            record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "functions": args.functions, **results}
+            f.write(json.dumps(record) + "\n")
+
+
+def benchmark_run_startup(args):
+    """
+    Compares many short-lived executions of a precompiled program through the
+    VM-only QuackRun.py against Quackify.py with a cached object.
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "short.quack")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(generate_program(functions=args.functions, statements=5))
+        object_file = os.path.join(tmp, "short.obj")
+        compile_program(source, object_file)
+        # Fill the __quackcache__ next to the source so Quackify only runs the object
+        subprocess.run([sys.executable, os.path.join(package_dir, "Quackify.py"), source], check=True, stdout=subprocess.DEVNULL)
+
+        results = {}
+        for name, command in (
+            ("QuackRun.py", [sys.executable, os.path.join(package_dir, "QuackRun.py"), object_file]),
+            ("Quackify.py (cached)", [sys.executable, os.path.join(package_dir, "Quackify.py"), source]),
+        ):
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            results[name] = (time.perf_counter() - start) / args.runs
+
+    print(f"Runs: {args.runs}")
+    print(f"{'Entry point':<22} {'Per run (ms)':>13}")
+    for name, seconds in results.items():
+        print(f"{name:<22} {seconds * 1000:>13.2f}")
+
+
+def benchmark_inline_parse(args):
+    """
+    Compares compile throughput and peak memory of building the parse tree and
+    transforming it afterwards against running the transformer inline while parsing.
+    """
+    program = generate_program(functions=args.functions, statements=args.statements)
+    lines = program.count("\n") + 1
+    # Build both parsers up front so their construction is not measured
+    get_parser(inline=False)
+    get_parser(inline=True)
+
+    results = {}
+    for name, debug in (("parse + transform", True), ("inline transform", False)):
+        best = float("inf")
+        peak = 0
+        for _ in range(args.repeat):
+            tracemalloc.start()
+            start = time.perf_counter()
+            compile_source(program, debug=debug)
+            best = min(best, time.perf_counter() - start)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        results[name] = (best, peak)
+
+    print(f"Lines: {lines}")
+    print(f"{'Mode':<18} {'Lines/s':>10} {'Peak (MiB)':>11}")
+    for name, (seconds, peak) in results.items():
+        print(f"{name:<18} {lines / seconds:>10.0f} {peak / (1024 * 1024):>11.1f}")
+
+
+def benchmark_build(args):
+    """
+    Compares compiling a tree of generated sources serially against the
+    QuackBuild process pool.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = os.path.join(tmp, "src")
+        for i in range(args.files):
+            directory = os.path.join(source_dir, f"group_{i % 4}")
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"program_{i}.quack"), "w", encoding="utf-8") as f:
+                f.write(generate_program(functions=args.functions, statements=args.statements))
+
+        start = time.perf_counter()
+        serial_dir = os.path.join(tmp, "serial")
+        for source in find_sources(source_dir):
+            object_file = os.path.join(serial_dir, os.path.splitext(source)[0] + ".obj")
+            os.makedirs(os.path.dirname(object_file), exist_ok=True)
+            compile_program(os.path.join(source_dir, source), object_file)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_tree(source_dir, os.path.join(tmp, "parallel"), jobs=args.jobs)
+        parallel = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_tree(source_dir, os.path.join(tmp, "parallel"), jobs=args.jobs)
+        rebuild = time.perf_counter() - start
+
+    print(f"Files: {args.files}  Jobs: {args.jobs or os.cpu_count()}")
+    print(f"{'Build':<22} {'Total (ms)':>12}")
+    for name, seconds in (("serial", serial), ("QuackBuild", parallel), ("QuackBuild, no changes", rebuild)):
+        print(f"{name:<22} {seconds * 1000:>12.2f}")
+
+
+def benchmark_codegen(args):
+    """
+    Compares code generation of a program with many functions done sequentially
+    against per-function buffers, in process and in a pool of workers.
+    """
+    program = generate_program(functions=args.functions, statements=args.statements)
+    get_parser(inline=True)
+
+    results = {}
+    for name, jobs in (("sequential", None), ("buffers, 1 process", 1), (f"buffers, {args.jobs} processes", args.jobs)):
+        metrics = CompileMetrics(trace_memory=False)
+        compile_source(program, metrics=metrics, codegen_jobs=jobs)
+        results[name] = metrics.phases["codegen"].seconds
+
+    print(f"Functions: {args.functions}  CPUs: {os.cpu_count()}")
+    print(f"{'Codegen':<22} {'Time (ms)':>10}")
+    for name, seconds in results.items():
+        print(f"{name:<22} {seconds * 1000:>10.2f}")
+
+
+def benchmark_stream(args):
+    """
+    Compares the time and peak memory of compiling a large program file with
+    compile_program against streaming compilation.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "program.quack")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(generate_program(functions=args.functions, statements=args.statements))
+        size = os.path.getsize(source)
+        get_parser(inline=True)
+        get_parser(streaming=True)
+
+        results = {}
+        for name, streaming in (("compile_program", False), ("streaming", True)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            compile_program(source, os.path.join(tmp, "program.obj"), streaming=streaming)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[name] = (seconds, peak)
+
+    print(f"Functions: {args.functions}  Source: {size / (1024 * 1024):.1f} MiB")
+    print(f"{'Mode':<16} {'Time (ms)':>10} {'Peak (MiB)':>11}")
+    for name, (seconds, peak) in results.items():
+        print(f"{name:<16} {seconds * 1000:>10.2f} {peak / (1024 * 1024):>11.1f}")
+
+
+def benchmark_constants(args):
+    """Measures code generation of a literal-heavy program, dominated by constant interning."""
+    program = generate_literal_program(statements=args.statements, distinct=args.distinct)
+    get_parser()
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        metrics = CompileMetrics(trace_memory=False)
+        compile_source(program, metrics=metrics)
+        best = min(best, metrics.phases["codegen"].seconds)
+
+    print(f"Literals: {args.statements * 3}  Constants: {metrics.counts['constants']}")
+    print(f"Codegen (ms): {best * 1000:.2f}")
+
+
+def benchmark_statements(args):
+    """Measures code generation throughput on a statement-heavy program."""
+    program = generate_program(functions=args.functions, statements=args.statements)
+    get_parser()
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        metrics = CompileMetrics(trace_memory=False)
+        compile_source(program, metrics=metrics)
+        best = min(best, metrics.phases["codegen"].seconds)
+
+    statements = args.functions * (args.statements + 3)
+    print(f"Statements: {statements}  Quadruples: {metrics.counts['quadruples']}")
+    print(f"Codegen (ms): {best * 1000:.2f}")
+    print(f"Statements/s: {statements / best:.0f}")
+    print(f"Quadruples/s: {metrics.counts['quadruples'] / best:.0f}")
+
+
+def _copy_ir(value, classes, spans=None, copied_spans=None):
+    """
+    Copy an IR tree into the node classes mapped by `classes`. With spans, the
+    span of every node is copied into copied_spans.
+    """
+    if isinstance(value, list):
+        return [_copy_ir(item, classes, spans, copied_spans) for item in value]
+    if not isinstance(value, Node):
+        return value
+    cls = classes[type(value)]
+    fields = {f.name: _copy_ir(getattr(value, f.name), classes, spans, copied_spans) for f in dataclasses.fields(cls)}
+    node = cls(**fields)
+    if spans is not None and value in spans:
+        start_pos, end_pos = spans.get(value)
+        copied_spans.set(node, start_pos, end_pos)
+    return node
+
+
+def _ir_size(ir, classes, spans=None) -> int:
+    """Bytes allocated by a copy of ir built with the given node classes, and of its spans if given."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copied_spans = SourceSpans() if spans is not None else None
+    copy = _copy_ir(ir, classes, spans, copied_spans)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del copy, copied_spans
+    return size
+
+
+def benchmark_ast_memory(args):
+    """
+    Compares the memory of the IR of a program per 1000 source lines with the
+    slotted node classes against the previous dataclasses with an instance
+    __dict__, and with the source spans that compiling with debug=True records.
+    """
+    program = generate_program(functions=args.functions, statements=args.statements)
+    lines = program.count("\n") + 1
+    transformer = QuackTransformer(spans=True)
+    ir = transformer.transform(get_parser().parse(program))
+
+    node_classes = Node.__subclasses__()
+    with_dict = {
+        cls: dataclasses.make_dataclass(cls.__name__, [(f.name, f.type) for f in dataclasses.fields(cls)])
+        for cls in node_classes
+    }
+    slotted = {cls: cls for cls in node_classes}
+    results = {
+        "__dict__ nodes": _ir_size(ir, with_dict),
+        "slotted nodes": _ir_size(ir, slotted),
+        "+ debug spans": _ir_size(ir, slotted, transformer.spans),
+    }
+
+    nodes = count_ir_nodes(ir)
+    print(f"Lines: {lines}  IR nodes: {nodes}")
+    print(f"{'Nodes':<16} {'KiB / 1k lines':>15} {'Bytes / node':>13}")
+    for name, size in results.items():
+        print(f"{name:<16} {size / lines * 1000 / 1024:>15.1f} {size / nodes:>13.1f}")
+
+
+class CountingQuadruples(list):
+    """Quadruple list that counts the instructions the VM fetches, and the jumps among them."""
+
+    fetched = 0
+    jumps = 0
+
+    def __getitem__(self, index):
+        self.fetched += 1
+        quadruple = list.__getitem__(self, index)
+        if quadruple[0] in JUMPS:
+            self.jumps += 1
+        return quadruple
+
+
+def _run_counted(object_file):
+    """Run an object file with its output discarded. Returns (the CountingQuadruples it ran, seconds)."""
+    program = read_object_file(object_file)
+    program.quadruples = CountingQuadruples(program.quadruples)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        QuackVirtualMachine().execute_program(program)
+    seconds = time.perf_counter() - start
+    program.close()
+    return program.quadruples, seconds
+
+
+def benchmark_optimize(args):
+    """
+    Compiles the programs in tests/ without the optimizer and at an optimization
+    level, and compares their code size, the instructions the VM executes and
+    the run time.
+    """
+    tests_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+    levels = (0, args.level)
+    totals = {level: (0, 0, 0.0) for level in levels}
+
+    print(f"{'Program':<40} {'Quads':>13} {'Executed':>17} {'Run (ms)':>19}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in find_sources(tests_dir):
+            row = {}
+            for level in levels:
+                object_file = os.path.join(tmp, f"O{level}.obj")
+                with redirect_stdout(io.StringIO()):
+                    assert compile_program(os.path.join(tests_dir, name), object_file, optimization_level=level)
+                quadruples = len(read_object_file(object_file).quadruples)
+                runs = [_run_counted(object_file) for _ in range(args.repeat)]
+                row[level] = (quadruples, runs[0][0].fetched, min(seconds for _, seconds in runs))
+                totals[level] = tuple(total + value for total, value in zip(totals[level], row[level]))
+            _print_optimize_row(name, row[0], row[args.level])
+
+    before, after = totals[0], totals[args.level]
+    _print_optimize_row("total", before, after)
+    print(
+        f"Quadruples: {1 - after[0] / before[0]:.1%} fewer  Executed: {1 - after[1] / before[1]:.1%} fewer  "
+        f"Run time: {1 - after[2] / before[2]:.1%} less"
+    )
+
+
+def _print_optimize_row(name, before, after):
+    print(
+        f"{name:<40} {before[0]:>6} {after[0]:>6} {before[1]:>8} {after[1]:>8} "
+        f"{before[2] * 1000:>9.2f} {after[2] * 1000:>9.2f}"
+    )
+
+
+def benchmark_loops(args):
+    """
+    Compiles loop-heavy programs without the optimizer, at an optimization
+    level without unrolling loops and unrolling them by a factor, and reports
+    the jumps and instructions the VM executes per loop iteration. Runs of two
+    iteration counts are subtracted so the code outside the loops does not
+    count.
+    """
+    programs = {"branches": generate_loop_program, "counted": generate_counted_program}
+    configurations = [
+        ("-O 0", 0, 1),
+        (f"-O {args.level} --unroll 1", args.level, 1),
+        (f"-O {args.level} --unroll {args.unroll}", args.level, args.unroll),
+    ]
+    print(f"{'Program':<10} {'Options':<16} {'Quads':>6} {'Jumps / iter':>13} {'Executed / iter':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, generate in programs.items():
+            for options, level, unroll_factor in configurations:
+                counts = []
+                for iterations in (args.iterations, 2 * args.iterations):
+                    source = os.path.join(tmp, f"{name}.quack")
+                    object_file = os.path.join(tmp, f"{name}.obj")
+                    with open(source, "w", encoding="utf-8") as f:
+                        f.write(generate(iterations))
+                    with redirect_stdout(io.StringIO()):
+                        assert compile_program(
+                            source, object_file, optimization_level=level, unroll_factor=unroll_factor
+                        )
+                    counts.append(_run_counted(object_file)[0])
+                quadruples = len(read_object_file(object_file).quadruples)
+                jumps = (counts[1].jumps - counts[0].jumps) / args.iterations
+                executed = (counts[1].fetched - counts[0].fetched) / args.iterations
+                print(f"{name:<10} {options:<16} {quadruples:>6} {jumps:>13.2f} {executed:>16.2f}")
+
+
+BENCHMARKS = {
+    "object-load": benchmark_object_load,
+    "lazy-load": benchmark_lazy_load,
+    "link": benchmark_link,
+    "startup": benchmark_startup,
+    "run-startup": benchmark_run_startup,
+    "inline-parse": benchmark_inline_parse,
+    "build": benchmark_build,
+    "codegen": benchmark_codegen,
+    "stream": benchmark_stream,
+    "constants": benchmark_constants,
+    "statements": benchmark_statements,
+    "ast-memory": benchmark_ast_memory,
+    "optimize": benchmark_optimize,
+    "loops": benchmark_loops,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QuackScript benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    object_load = subparsers.add_parser("object-load", help="Binary object format vs pickle load time")
+    object_load.add_argument("--functions", type=int, default=1000)
+    object_load.add_argument("--statements", type=int, default=20)
+    object_load.add_argument("--repeat", type=int, default=5)
+
+    lazy_load = subparsers.add_parser("lazy-load", help="Eager vs lazy per-function decoding of object files")
+    lazy_load.add_argument("--functions", type=int, default=1000)
+    lazy_load.add_argument("--statements", type=int, default=20)
+    lazy_load.add_argument("--repeat", type=int, default=3)
+
+    link = subparsers.add_parser("link", help="Copied shared code vs a module compiled once and linked")
+    link.add_argument("--functions", type=int, default=500)
+    link.add_argument("--statements", type=int, default=20)
+    link.add_argument("--programs", type=int, default=5)
+
+    startup = subparsers.add_parser("startup", help="Cold start time of Quackify.py")
+    startup.add_argument("--functions", type=int, default=5)
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.add_argument("--record", help="append the results to this JSON lines file")
+
+    run_startup = subparsers.add_parser("run-startup", help="VM-only runner vs Quackify for precompiled programs")
+    run_startup.add_argument("--functions", type=int, default=5)
+    run_startup.add_argument("--runs", type=int, default=20)
+
+    inline_parse = subparsers.add_parser("inline-parse", help="Parse tree + transform vs inline transformer")
+    inline_parse.add_argument("--functions", type=int, default=500)
+    inline_parse.add_argument("--statements", type=int, default=20)
+    inline_parse.add_argument("--repeat", type=int, default=3)
+
+    build = subparsers.add_parser("build", help="Serial compilation vs the QuackBuild process pool")
+    build.add_argument("--files", type=int, default=32)
+    build.add_argument("--functions", type=int, default=20)
+    build.add_argument("--statements", type=int, default=20)
+    build.add_argument("--jobs", type=int, default=None)
+
+    codegen = subparsers.add_parser("codegen", help="Sequential vs per-function parallel code generation")
+    codegen.add_argument("--functions", type=int, default=400)
+    codegen.add_argument("--statements", type=int, default=20)
+    codegen.add_argument("--jobs", type=int, default=os.cpu_count())
+
+    stream = subparsers.add_parser("stream", help="Whole-program vs streaming compilation of a large file")
+    stream.add_argument("--functions", type=int, default=900)
+    stream.add_argument("--statements", type=int, default=20)
+
+    constants = subparsers.add_parser("constants", help="Code generation of a literal-heavy program")
+    constants.add_argument("--statements", type=int, default=5000)
+    constants.add_argument("--distinct", type=int, default=900)
+    constants.add_argument("--repeat", type=int, default=3)
+
+    statements = subparsers.add_parser("statements", help="Code generation throughput of a statement-heavy program")
+    statements.add_argument("--functions", type=int, default=300)
+    statements.add_argument("--statements", type=int, default=40)
+    statements.add_argument("--repeat", type=int, default=5)
+
+    ast_memory = subparsers.add_parser("ast-memory", help="IR memory per 1k lines, slotted vs __dict__ nodes")
+    ast_memory.add_argument("--functions", type=int, default=500)
+    ast_memory.add_argument("--statements", type=int, default=20)
+
+    optimize = subparsers.add_parser("optimize", help="Code size and executed instructions with and without the optimizer")
+    optimize.add_argument("--level", type=int, default=DEFAULT_OPTIMIZATION_LEVEL)
+    optimize.add_argument("--repeat", type=int, default=5)
+
+    loops = subparsers.add_parser("loops", help="Jumps and instructions executed per loop iteration")
+    loops.add_argument("--level", type=int, default=DEFAULT_OPTIMIZATION_LEVEL)
+    loops.add_argument("--iterations", type=int, default=1000)
+    loops.add_argument("--unroll", type=int, default=DEFAULT_UNROLL_FACTOR)
+
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
@@ -0,0 +1,189 @@
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+
+import pytest
+from lark import Lark
+
+from Benchmarks import generate_program
+from Exceptions import NameNotFoundError
+from MemoryManager import MemoryManager
+from QuackCompiler import GRAMMAR_FILE, compile_program, compile_source, get_parser
+from QuackInterpreter import QuackInterpreter
+from QuackMetrics import CompileMetrics
+from QuackObjectFile import read_object_file
+from QuackOptimizer import DEFAULT_OPTIMIZATION_LEVEL
+from QuackQuadruple import QuackQuadruple
+from QuackTransformer import QuackTransformer
+from TransformerClasses import BodyNode, IdNode
+from VirtualMachine import QuackVirtualMachine
+
+
+def compiled_code(program_text, codegen_jobs=None, optimization_level=DEFAULT_OPTIMIZATION_LEVEL):
+    result = compile_source(program_text, codegen_jobs=codegen_jobs, optimization_level=optimization_level)
+    constants = {address: constant.value for address, constant in result.symbol_table.constants_table.constants.items()}
+    functions = {
+        name: (c.initial_position, c.final_position, c.return_address, c.param_signature, c.required_space)
+        for name, c in result.symbol_table.containers.items()
+    }
+    return list(result.quadruples.quadruples), constants, functions
+
+
+def run_program(program_text):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "program.quack")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(program_text)
+        object_file = os.path.join(tmp, "program.obj")
+        assert compile_program(source, object_file)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            QuackVirtualMachine().translate_program(object_file)
+        return output.getvalue()
+
+
+def expression_program(expression):
+    return f"program Deep;\nvar x: int;\nmain {{\n    x = {expression};\n    print(x);\n}}\nend\n"
+
+
+# ========== TEST CASES ========== #
+
+
+@pytest.mark.parametrize("codegen_jobs", [1, 2])
+def test_per_function_codegen_matches_sequential(codegen_jobs):
+    program = generate_program(functions=12, statements=8)
+    assert compiled_code(program, codegen_jobs) == compiled_code(program)
+
+
+def test_per_function_codegen_keeps_declaration_order_scope():
+    program = """
+    program Order;
+    int first(n: int) [
+        {
+            return second(n);
+        }
+    ];
+    int second(n: int) [
+        {
+            return n;
+        }
+    ];
+    main {
+        print(first(1));
+    }
+    end
+    """
+    with pytest.raises(NameNotFoundError):
+        compile_source(program)
+    with pytest.raises(NameNotFoundError):
+        compile_source(program, codegen_jobs=1)
+
+
+def test_streaming_compilation_writes_the_same_program():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "program.quack")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(generate_program(functions=12, statements=8))
+
+        whole = os.path.join(tmp, "whole.obj")
+        streamed = os.path.join(tmp, "streamed.obj")
+        assert compile_program(source, whole)
+        assert compile_program(source, streamed, streaming=True)
+
+        expected = read_object_file(whole)
+        actual = read_object_file(streamed)
+        assert actual.quadruples == expected.quadruples
+        assert actual.functions == expected.functions
+        assert actual.constants_table == expected.constants_table
+
+
+def test_int_and_float_literals_are_different_constants():
+    program = """
+    program Literals;
+    var count: int;
+    var ratio: float;
+    main {
+        count = 1;
+        ratio = 1.0;
+        count = count + 1;
+    }
+    end
+    """
+    # Without the optimizer, which would fold count + 1
+    _, constants, _ = compiled_code(program, optimization_level=0)
+    assert sorted((type(value).__name__, value) for value in constants.values()) == [("float", 1.0), ("int", 1)]
+
+
+@dataclass
+class DoubleNode:
+    var_name: str
+
+
+def test_registered_statement_handlers_generate_new_node_types():
+    program = """
+    program Extended;
+    var count: int = 2;
+    main {
+        print(count);
+    }
+    end
+    """
+    parser = get_parser(inline=True)
+    ir = parser.parse(program)
+    symbol_table = parser.options.transformer.symbol_table
+
+    def double(interpreter, node):
+        address, _ = interpreter.evaluate_expression(IdNode(name=node.var_name))
+        interpreter.quack_quadruple.add_quadruple("+", address, address, address)
+
+    quadruples = QuackQuadruple()
+    interpreter = QuackInterpreter(symbol_table, quadruples, MemoryManager())
+    interpreter.register_statement(DoubleNode, double)
+    ir.main_body = BodyNode(statements=[DoubleNode(var_name="count")] + ir.main_body.statements)
+    interpreter.execute(ir)
+
+    plus = quadruples.operators.get_operator("+")
+    assert (plus, 1000, 1000, 1000) in quadruples.get_quadruples()
+
+
+def test_long_left_deep_expressions_compile():
+    terms = [i % 50 for i in range(20000)]
+    assert run_program(expression_program(" + ".join(map(str, terms)))) == f"{sum(terms)}"
+
+
+def test_deeply_nested_expressions_compile():
+    depth = 5000
+    expression = "1 + (" * depth + "1" + ")" * depth
+    assert run_program(expression_program(expression)) == f"{depth + 1}"
+    assert compile_source(expression_program(expression), metrics=CompileMetrics(trace_memory=False)) is not None
+
+
+def test_debug_ir_has_source_spans():
+    program = expression_program("(x + 2) * -3")
+    result = compile_source(program, debug=True)
+    assign = result.ir.main_body.statements[-2]
+
+    def source(node):
+        start_pos, end_pos = result.spans.get(node)
+        return program[start_pos:end_pos]
+
+    assert source(assign) == "x = (x + 2) * -3;"
+    assert source(assign.expr) == "(x + 2) * -3"
+    assert source(assign.expr.left) == "(x + 2)"
+    assert result.spans.get(assign.expr.right.left) is None
+    assert not hasattr(assign, "__dict__")
+    # Regular compilation records no spans
+    assert get_parser(inline=True).options.transformer.spans is None
+
+
+def test_inline_parsing_records_source_spans():
+    program = expression_program("(x + 2) * -3")
+    with open(GRAMMAR_FILE, "r", encoding="utf-8") as file:
+        transformer = QuackTransformer(spans=True)
+        ir = Lark(file.read(), start="start", parser="lalr", transformer=transformer).parse(program)
+    expr = ir.main_body.statements[-2].expr
+    start_pos, end_pos = transformer.spans.get(expr)
+    assert program[start_pos:end_pos] == "(x + 2) * -3"
+    assert len(transformer.spans) == len(compile_source(program, debug=True).spans)
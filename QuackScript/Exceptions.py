@@ -54,4 +54,15 @@ class InvalidParameterIndexError(ParameterMismatchError):
 # Variable declaration errors
 class ReservedWordError(InterpreterError):
     """Raised when a variable or identifier is named using a reserved word."""
+    pass
+
+# Object file errors
+class InvalidObjectFileError(InterpreterError):
+    """Raised when an object file is malformed or was written by an incompatible compiler."""
+    pass
+class LinkError(InterpreterError):
+    """Raised when object files cannot be linked into an executable program."""
+    pass
+class CircularImportError(LinkError):
+    """Raised when modules import each other in a cycle."""
     pass
\ No newline at end of file
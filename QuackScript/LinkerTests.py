@@ -0,0 +1,214 @@
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+import pytest
+
+from Exceptions import CircularImportError, InvalidObjectFileError, LinkError
+from QuackCompiler import ModuleResolver, compile_program
+from QuackLinker import link_program
+from QuackObjectFile import is_relocatable, read_object_file
+from VirtualMachine import QuackVirtualMachine
+
+MATHLIB = """
+module mathlib;
+var calls: int = 0;
+const HALF: float = 0.5;
+
+int square(n: int) [
+    {
+        calls = calls + 1;
+        return n * n;
+    }
+];
+
+float half(x: float) [
+    {
+        return x * HALF;
+    }
+];
+
+int call_count() [
+    {
+        return calls;
+    }
+];
+end
+"""
+
+GEOMETRY = """
+module geometry;
+import mathlib;
+var scale: int = 2;
+
+int squared_area(side: int) [
+    {
+        return square(side) * scale;
+    }
+];
+end
+"""
+
+PROGRAM = """
+program Shapes;
+import mathlib;
+import geometry;
+var total: int = 1;
+
+main {
+    total = total + square(3);
+    print("total: ", total, "\\n");
+    print("squared: ", squared_area(4), "\\n");
+    print("half: ", half(5.0), "\\n");
+    print("calls: ", call_count(), "\\n");
+}
+end
+"""
+
+
+def write_sources(directory, **sources):
+    for name, text in sources.items():
+        with open(os.path.join(directory, f"{name}.quack"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def run_object(object_file):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        QuackVirtualMachine().translate_program(object_file, delete_object=False)
+    return output.getvalue()
+
+
+# ========== TEST CASES ========== #
+
+
+def test_link_and_run_program_with_modules():
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sources(tmp, mathlib=MATHLIB, geometry=GEOMETRY, main=PROGRAM)
+        resolver = ModuleResolver([tmp], use_cache=False)
+        try:
+            program_file = os.path.join(tmp, "main.obj")
+            executable = os.path.join(tmp, "main.exe.obj")
+            assert compile_program(os.path.join(tmp, "main.quack"), program_file, resolver)
+            assert is_relocatable(program_file)
+            assert is_relocatable(resolver.resolve("mathlib"))
+
+            link_program(program_file, resolver.resolve, executable)
+            assert not is_relocatable(executable)
+            assert run_object(executable) == "total: 10\nsquared: 32\nhalf: 2.5\ncalls: 2\n"
+        finally:
+            resolver.cleanup()
+
+
+def test_streamed_program_links_with_its_modules():
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sources(tmp, mathlib=MATHLIB, geometry=GEOMETRY, main=PROGRAM)
+        resolver = ModuleResolver([tmp], use_cache=False)
+        try:
+            program_file = os.path.join(tmp, "main.obj")
+            executable = os.path.join(tmp, "main.exe.obj")
+            assert compile_program(os.path.join(tmp, "main.quack"), program_file, resolver, streaming=True)
+
+            link_program(program_file, resolver.resolve, executable)
+            assert run_object(executable) == "total: 10\nsquared: 32\nhalf: 2.5\ncalls: 2\n"
+        finally:
+            resolver.cleanup()
+
+
+def test_modules_are_compiled_at_the_resolver_optimization_level():
+    module = "module folds;\nint six() [\n    {\n        return 2 * 3;\n    }\n];\nend\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sources(tmp, folds=module)
+        direct = os.path.join(tmp, "direct.obj")
+        assert compile_program(os.path.join(tmp, "folds.quack"), direct, optimization_level=0)
+        unfolded = read_object_file(direct, relocatable=True).quadruples
+
+        for level, folded in ((0, False), (1, True)):
+            resolver = ModuleResolver([tmp], use_cache=False, optimization_level=level)
+            try:
+                program = read_object_file(resolver.resolve("folds"), relocatable=True)
+                assert (program.quadruples == unfolded) != folded
+                assert any(quadruple[0] == program.operators["*"] for quadruple in program.quadruples) != folded
+            finally:
+                resolver.cleanup()
+
+
+def test_modules_are_unrolled_by_the_resolver_unroll_factor():
+    module = """
+module counted;
+int product(n: int) [
+    var result, i: int;
+    {
+        result = 1;
+        i = 1;
+        while (i <= n) do {
+            result = result * i;
+            i = i + 1;
+        };
+        return result;
+    }
+];
+end
+"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sources(tmp, counted=module)
+        codes = {}
+        for unroll_factor in (1, 4):
+            direct = os.path.join(tmp, f"direct{unroll_factor}.obj")
+            assert compile_program(os.path.join(tmp, "counted.quack"), direct, unroll_factor=unroll_factor)
+            resolver = ModuleResolver([tmp], use_cache=False, unroll_factor=unroll_factor)
+            try:
+                codes[unroll_factor] = read_object_file(resolver.resolve("counted"), relocatable=True).quadruples
+            finally:
+                resolver.cleanup()
+            assert codes[unroll_factor] == read_object_file(direct, relocatable=True).quadruples
+        assert len(codes[4]) > len(codes[1])
+
+
+def test_relocatable_objects_cannot_run_unlinked():
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sources(tmp, mathlib=MATHLIB)
+        resolver = ModuleResolver([tmp], use_cache=False)
+        try:
+            with pytest.raises(InvalidObjectFileError):
+                read_object_file(resolver.resolve("mathlib"))
+        finally:
+            resolver.cleanup()
+
+
+def test_signature_mismatch_is_a_link_error():
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sources(tmp, mathlib=MATHLIB, geometry=GEOMETRY, main=PROGRAM)
+        resolver = ModuleResolver([tmp], use_cache=False)
+        try:
+            program_file = os.path.join(tmp, "main.obj")
+            assert compile_program(os.path.join(tmp, "main.quack"), program_file, resolver)
+
+            # mathlib changes after the program was compiled against it
+            write_sources(tmp, mathlib=MATHLIB.replace("int square(n: int)", "int square(n: int, m: int)"))
+            changed = os.path.join(tmp, "mathlib.obj")
+            assert compile_program(os.path.join(tmp, "mathlib.quack"), changed, resolver)
+
+            def resolve(name):
+                return changed if name == "mathlib" else resolver.resolve(name)
+
+            with pytest.raises(LinkError):
+                link_program(program_file, resolve, os.path.join(tmp, "main.exe.obj"))
+        finally:
+            resolver.cleanup()
+
+
+def test_circular_imports_are_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sources(
+            tmp,
+            first="module first;\nimport second;\nend\n",
+            second="module second;\nimport first;\nend\n",
+        )
+        resolver = ModuleResolver([tmp], use_cache=False)
+        try:
+            with pytest.raises(CircularImportError):
+                resolver.resolve("first")
+        finally:
+            resolver.cleanup()
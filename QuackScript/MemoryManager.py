@@ -1,6 +1,27 @@
 from dataclasses import dataclass
 from typing import Dict, Optional, Tuple, Union
 
+# Address ranges of every memory space and var type
+DEFAULT_MAPPINGS = {
+    "global": {
+        "int": ((1000, 1999), None),
+        "float": ((2000, 2999), None),
+        "t_int": ((3000, 3999), None),
+        "t_float": ((4000, 4999), None),
+    },
+    "local": {
+        "int": ((5000, 5999), None),
+        "float": ((6000, 6999), None),
+        "t_int": ((7000, 7999), None),
+        "t_float": ((8000, 8999), None),
+    },
+    "constant": {
+        "int": ((9000, 9999), None),
+        "float": ((10000, 10999), None),
+        "str": ((11000, 11999), None),
+    },
+}
+
 
 @dataclass
 class Memory:
@@ -109,25 +130,7 @@ class MemoryManager:
     def __init__(self, mappings: Dict[str, Dict[str, Tuple[Tuple[int, int], Optional[int]]]] = None):
         self.memory_spaces = {}
         if mappings is None:
-            mappings = {
-                "global": {
-                    "int": ((1000, 1999), None),
-                    "float": ((2000, 2999), None),
-                    "t_int": ((3000, 3999), None),
-                    "t_float": ((4000, 4999), None),
-                },
-                "local": {
-                    "int": ((5000, 5999), None),
-                    "float": ((6000, 6999), None),
-                    "t_int": ((7000, 7999), None),
-                    "t_float": ((8000, 8999), None),
-                },
-                "constant": {
-                    "int": ((9000, 9999), None),
-                    "float": ((10000, 10999), None),
-                    "str": ((11000, 11999), None),
-                },
-            }
+            mappings = DEFAULT_MAPPINGS
         for space_name, mapping in mappings.items():
             self.add_memory_space(space_name=space_name, mapping=mapping)
 
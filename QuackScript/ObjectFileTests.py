@@ -0,0 +1,195 @@
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from Exceptions import InvalidObjectFileError
+from QuackBuild import build_tree
+from QuackCache import COMPILER_FILES, ObjectCache
+from QuackCompiler import compile_source
+from QuackObjectFile import FORMAT_VERSION, HEADER, read_object_file, write_object_file
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROGRAM = """
+program Objects;
+var total: int = 0;
+const PI: float = 3.14;
+
+int add(a: int, b: int) [
+    {
+        return a + b;
+    }
+];
+
+main {
+    total = add(2, 3);
+    print("Total: ", total, " Area: ", PI * 2.0, "\\n");
+}
+end
+"""
+
+
+def compile_to_object(program_text, directory):
+    result = compile_source(program_text)
+    symbol_table, quadruples = result.symbol_table, result.quadruples
+    output_file = os.path.join(directory, "program.obj")
+    write_object_file(quadruples, symbol_table, output_file, debug_info={"source": "inline"})
+    return output_file, symbol_table, quadruples
+
+
+# ========== TEST CASES ========== #
+
+
+def test_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file, symbol_table, quadruples = compile_to_object(PROGRAM, tmp)
+        program = read_object_file(output_file)
+
+    assert program.quadruples == list(quadruples.quadruples)
+    assert program.operators == quadruples.operators.operators
+    assert program.global_container_name == "Objects"
+    assert program.debug_info == {"source": "inline"}
+
+    for name, container in symbol_table.containers.items():
+        function = program.functions[name]
+        assert function.return_type == container.return_type
+        assert function.initial_position == container.initial_position
+        assert function.final_position == container.final_position
+        assert function.return_address == container.return_address
+        assert function.param_signature == container.param_signature
+
+    for address, constant in symbol_table.constants_table.constants.items():
+        assert program.constants_table.constants[address] == constant.value
+        assert type(program.constants_table.constants[address]) is type(constant.value)
+
+
+def test_lazy_loading_decodes_functions_on_demand():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file, symbol_table, quadruples = compile_to_object(PROGRAM, tmp)
+        eager = read_object_file(output_file)
+        lazy = read_object_file(output_file, lazy=True)
+        try:
+            add = symbol_table.get_function("add")
+            body = range(add.initial_position, add.final_position + 2)
+            assert set(lazy.pending_functions) == {"add"}
+            assert all(lazy.quadruples[i] is None for i in body)
+            assert all(lazy.quadruples[i] == eager.quadruples[i] for i in range(len(eager.quadruples)) if i not in body)
+
+            lazy.load_function("add")
+            assert lazy.pending_functions == {}
+            assert lazy.quadruples == eager.quadruples
+        finally:
+            lazy.close()
+
+
+def test_rejects_non_object_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bad.obj")
+        with open(path, "wb") as f:
+            f.write(b"not an object file at all")
+        with pytest.raises(InvalidObjectFileError):
+            read_object_file(path)
+
+
+def test_rejects_other_versions():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file, _, _ = compile_to_object(PROGRAM, tmp)
+        with open(output_file, "r+b") as f:
+            magic, _, flags, count, offset = HEADER.unpack(f.read(HEADER.size))
+            f.seek(0)
+            f.write(HEADER.pack(magic, FORMAT_VERSION + 1, flags, count, offset))
+        with pytest.raises(InvalidObjectFileError):
+            read_object_file(output_file)
+
+
+def test_rejects_truncated_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file, _, _ = compile_to_object(PROGRAM, tmp)
+        with open(output_file, "r+b") as f:
+            f.truncate(os.path.getsize(output_file) - struct.calcsize("<4sQQ"))
+        with pytest.raises(InvalidObjectFileError):
+            read_object_file(output_file)
+
+
+def test_cache_hit_and_miss():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ObjectCache(os.path.join(tmp, "__quackcache__"))
+        key = cache.key(PROGRAM.encode("utf-8"))
+        assert cache.lookup(key) is None
+        assert cache.key(PROGRAM.encode("utf-8"), {"optimize": 1}) != key
+
+        object_file, _, _ = compile_to_object(PROGRAM, tmp)
+        cached = cache.store(key, object_file)
+        assert cache.lookup(key) == cached
+        assert read_object_file(cached).global_container_name == "Objects"
+
+
+def test_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ObjectCache(os.path.join(tmp, "__quackcache__"), max_size=250)
+
+        def store(key):
+            path = os.path.join(tmp, f"{key}.obj")
+            with open(path, "wb") as f:
+                f.write(bytes(100))
+            cache.store(key, path)
+
+        store("old")
+        store("used")
+        os.utime(cache.path_for("old"), (1, 1))
+        os.utime(cache.path_for("used"), (0, 0))
+        # A hit makes "used" the most recently used entry
+        assert cache.lookup("used") is not None
+
+        store("new")
+
+        assert cache.lookup("old") is None
+        assert cache.lookup("used") is not None
+        assert cache.lookup("new") is not None
+
+
+def test_compiler_fingerprint_covers_only_compiler_files():
+    for name in COMPILER_FILES:
+        assert os.path.isfile(os.path.join(PACKAGE_DIR, name))
+    assert not any(name.endswith("Tests.py") or name in ("Benchmarks.py", "RunAllTests.py") for name in COMPILER_FILES)
+
+
+def test_run_object_without_compiler():
+    with tempfile.TemporaryDirectory() as tmp:
+        object_file, _, _ = compile_to_object(PROGRAM, tmp)
+        run = subprocess.run(
+            [sys.executable, "QuackRun.py", object_file], cwd=PACKAGE_DIR, capture_output=True, text=True, check=True
+        )
+    assert run.stdout == "Total: 5 Area: 6.28\n"
+
+    imports = subprocess.run(
+        [sys.executable, "-c", "import sys, QuackRun; print(sorted(m for m in sys.modules if m.startswith('lark')))"],
+        cwd=PACKAGE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert imports.stdout.strip() == "[]"
+
+
+def test_build_tree_skips_current_objects_and_reports_failures():
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = os.path.join(tmp, "src")
+        output_dir = os.path.join(tmp, "build")
+        os.makedirs(os.path.join(source_dir, "nested"))
+        with open(os.path.join(source_dir, "nested", "objects.quack"), "w", encoding="utf-8") as f:
+            f.write(PROGRAM)
+        with open(os.path.join(source_dir, "broken.quack"), "w", encoding="utf-8") as f:
+            f.write("program Broken; main { x = ; } end")
+
+        first = {result.source: result.status for result in build_tree(source_dir, output_dir, jobs=2)}
+        assert first == {"broken.quack": "failed", os.path.join("nested", "objects.quack"): "compiled"}
+        assert read_object_file(os.path.join(output_dir, "nested", "objects.obj")).global_container_name == "Objects"
+
+        second = {result.source: result.status for result in build_tree(source_dir, output_dir, jobs=2)}
+        assert second[os.path.join("nested", "objects.quack")] == "up to date"
+        assert second["broken.quack"] == "failed"
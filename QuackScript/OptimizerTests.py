@@ -0,0 +1,581 @@
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+import pytest
+
+from Benchmarks import generate_program
+from QuackBuild import find_sources
+from QuackCompiler import compile_program, compile_source
+from QuackOptimizer import JUMPS, QuackOptimizer, fold_operation, liveness
+from QuackQuadruple import OperatorsInterface
+from VirtualMachine import QuackVirtualMachine
+
+OPERATOR_NAMES = {code: name for name, code in OperatorsInterface().operators.items()}
+TESTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+
+
+def compiled_operators(program_text, optimization_level=1, **options):
+    result = compile_source(program_text, optimization_level=optimization_level, **options)
+    return [OPERATOR_NAMES[quadruple[0]] for quadruple in result.quadruples.quadruples]
+
+
+def run_source(source, optimization_level, **options):
+    with tempfile.TemporaryDirectory() as tmp:
+        object_file = os.path.join(tmp, "program.obj")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            assert compile_program(source, object_file, optimization_level=optimization_level, **options)
+            QuackVirtualMachine().translate_program(object_file)
+        return output.getvalue()
+
+
+def run_program(program_text, optimization_level=1, **options):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "program.quack")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(program_text)
+        return run_source(source, optimization_level, **options)
+
+
+def unread_constants(result):
+    """The values in the constants table of a compilation that no quadruple reads."""
+    read = set()
+    for quadruple in result.quadruples.quadruples:
+        # The result of a jump is a position in the code
+        read.update(quadruple[1:3] if quadruple[0] in JUMPS else quadruple[1:])
+    constants = result.symbol_table.constants_table.constants
+    return [constant.value for address, constant in constants.items() if address not in read]
+
+
+def main_program(body, decls="var x: int;\nvar y: int;"):
+    return f"program Opt;\n{decls}\nmain {{\n{body}\n}}\nend\n"
+
+
+# ========== TEST CASES ========== #
+
+
+def test_negative_literals_are_folded():
+    program = main_program("x = -5;\nprint(x);")
+    assert "-" not in compiled_operators(program)
+    assert run_program(program) == "-5"
+
+
+def test_known_values_are_propagated_into_expressions():
+    program = main_program("x = 5;\ny = x * 2 + 1;\nprint(y);")
+    assert "*" not in compiled_operators(program)
+    assert "+" not in compiled_operators(program)
+    assert run_program(program) == "11"
+
+
+def test_constants_are_substituted_and_not_stored():
+    program = main_program("print(LIMIT * 2);", decls="const LIMIT: int = 21;")
+    assert compiled_operators(program).count("=") == 0
+    constants = compile_source(program).symbol_table.constants_table.constants
+    assert [constant.value for constant in constants.values()] == [42]
+    assert run_program(program) == "42"
+
+
+def test_folded_values_leave_room_for_the_constants_of_later_units():
+    # Folding the chain goes through a thousand values, and the later function nearly fills the int constants
+    chain = "x" + " + 1" * 1100
+    sums = "\n".join(f"z = z + {1000 + i};" for i in range(990))
+    program = f"""
+    program Pressure;
+    var x, y, z: int;
+    void chain() [
+        {{
+            x = 1;
+            y = {chain};
+        }}
+    ];
+    int literals() [
+        {{
+            z = 0;
+            {sums}
+            return 123456;
+        }}
+    ];
+    main {{
+        chain();
+        print(y, " ", literals(), " ", z);
+    }}
+    end
+    """
+    expected = run_program(program, 0)
+    assert expected == f"1101 123456 {sum(range(1000, 1990))}"
+    assert run_program(program) == expected
+    assert unread_constants(compile_source(program)) == []
+
+
+def test_division_by_zero_is_not_folded():
+    program = main_program("y = 0;\nx = 1 / y;\nprint(x);")
+    assert "/" in compiled_operators(program)
+    assert run_program(program) == run_program(program, 0)
+
+
+def test_folding_keeps_the_vm_division_semantics():
+    program = main_program("print(7 / 2);\nprint(7.0 / 2);")
+    assert "/" not in compiled_operators(program)
+    assert run_program(program) == run_program(program, 0)
+
+
+def test_branches_on_known_conditions_are_folded():
+    program = main_program("x = 3;\nif (x > 2) {\nprint(1);\n} else {\nprint(2);\n};")
+    operators = compiled_operators(program)
+    assert "gotoF" not in operators
+    assert ">" not in operators
+    assert run_program(program) == "1"
+
+
+def test_values_are_not_propagated_out_of_loops():
+    program = main_program("x = 0;\nwhile (x < 3) do {\nx = x + 1;\n};\nprint(x);")
+    assert "<" in compiled_operators(program)
+    assert run_program(program) == "3"
+
+
+def test_calls_forget_global_values():
+    program = """
+    program Calls;
+    var x: int;
+    void bump() [
+        {
+            x = x + 1;
+        }
+    ];
+    main {
+        x = 1;
+        bump();
+        print(x * 10);
+    }
+    end
+    """
+    assert run_program(program) == "20"
+
+
+def test_code_after_return_is_removed():
+    program = """
+    program Dead;
+    int pick(a: int) [
+        {
+            if (a > 0) {
+                return 1;
+                print("never");
+            };
+            return 2;
+        }
+    ];
+    main {
+        print(pick(1), pick(0));
+    }
+    end
+    """
+    operators = compiled_operators(program)
+    assert operators.count("print") == 2
+    assert run_program(program) == "12"
+
+
+def test_unset_declarations_are_not_stored():
+    program = """
+    program Dead;
+    var g: int;
+    void show(a: int) [
+        var b: int;
+        {
+            print(a, b);
+        }
+    ];
+    main {
+        show(1);
+        print(g);
+    }
+    end
+    """
+    assert "=" not in compiled_operators(program)
+    assert run_program(program) == run_program(program, 0)
+
+
+def test_stores_that_are_never_read_are_removed():
+    program = """
+    program Dead;
+    void f(a: int) [
+        var b: int;
+        {
+            b = a * 2;
+            b = a + 1;
+            print(b);
+        }
+    ];
+    main {
+        f(4);
+    }
+    end
+    """
+    operators = compiled_operators(program)
+    assert "*" not in operators
+    assert run_program(program) == "5"
+
+
+def test_divisions_that_can_fail_are_kept():
+    program = """
+    program Dead;
+    void f(a: int) [
+        var b: int;
+        {
+            b = 1 / a;
+            print("after");
+        }
+    ];
+    main {
+        f(0);
+    }
+    end
+    """
+    assert "/" in compiled_operators(program)
+    assert run_program(program) == run_program(program, 0)
+
+
+def test_repeated_operations_are_computed_once():
+    program = """
+    program Cse;
+    void f(x: int, y: int) [
+        {
+            print(x * y, " ", (y * x) + 1);
+        }
+    ];
+    main {
+        f(3, 4);
+    }
+    end
+    """
+    assert compiled_operators(program).count("*") == 1
+    assert run_program(program) == "12 13"
+
+
+def test_operations_are_reused_across_blocks():
+    program = """
+    program Cse;
+    void f(n: int) [
+        {
+            print(n - 1);
+            if (n > 1) {
+                print(n - 1);
+            } else {
+                print((n - 1) * 2);
+            };
+        }
+    ];
+    main {
+        f(3);
+        f(0);
+    }
+    end
+    """
+    assert compiled_operators(program).count("-") == 1
+    assert run_program(program) == "22-1-2"
+
+
+def test_stores_and_calls_make_operations_unavailable():
+    program = """
+    program Cse;
+    var a, b: int;
+    void bump() [
+        {
+            a = a + 1;
+        }
+    ];
+    main {
+        a = 1;
+        b = 2;
+        print(a + b);
+        bump();
+        print(a + b);
+        b = 5;
+        print(a + b);
+    }
+    end
+    """
+    assert compiled_operators(program).count("+") == 3
+    assert run_program(program) == "347"
+
+
+def test_call_results_are_read_from_the_return_slot():
+    program = """
+    program Copies;
+    var total: int;
+    int twice(n: int) [
+        {
+            return n * 2;
+        }
+    ];
+    main {
+        total = twice(3);
+        print(total, twice(4));
+    }
+    end
+    """
+    result = compile_source(program)
+    stores = [quadruple for quadruple in result.quadruples.quadruples if OPERATOR_NAMES[quadruple[0]] == "="]
+    assert len(stores) == 1
+    assert run_program(program) == "68"
+
+
+def test_results_are_stored_straight_into_variables():
+    program = """
+    program Copies;
+    void count(n: int) [
+        var i, sum: int;
+        {
+            i = 0;
+            sum = 0;
+            while (i < n) do {
+                sum = sum + i;
+                i = i + 1;
+            };
+            print(sum);
+        }
+    ];
+    main {
+        count(5);
+    }
+    end
+    """
+    operators = compiled_operators(program)
+    assert operators.count("=") == 2
+    assert run_program(program) == "10"
+
+
+def test_jumps_go_straight_to_their_target():
+    program = """
+    program Jumps;
+    void f(a: int, b: int) [
+        {
+            if (a > 0) {
+                if (b > 0) {
+                    print("both");
+                } else {
+                    print("a");
+                };
+            } else {
+                print("none");
+            };
+            print(".");
+        }
+    ];
+    main {
+        f(1, 1);
+        f(1, 0);
+        f(0, 1);
+    }
+    end
+    """
+    quadruples = compile_source(program).quadruples.quadruples
+    for op, _, _, target in quadruples:
+        if OPERATOR_NAMES[op] in ("goto", "gotoF", "gotoT"):
+            assert OPERATOR_NAMES[quadruples[target][0]] != "goto"
+    assert run_program(program) == "both.a.none."
+
+
+def test_loops_run_one_jump_per_iteration():
+    program = """
+    program Loops;
+    void count(n: int) [
+        var i: int;
+        {
+            i = 0;
+            while (i < n) do {
+                print(i);
+                i = i + 1;
+            };
+        }
+    ];
+    main {
+        count(3);
+        count(0);
+    }
+    end
+    """
+    operators = compiled_operators(program, unroll_factor=1)
+    assert "goto" not in operators[1:]
+    assert operators.count("gotoF") == 1
+    assert operators.count("gotoT") == 1
+    assert run_program(program) == "012"
+
+
+def loop_operators(program_text, **options):
+    """The operators before the loop of a program, and the ones in it."""
+    quadruples = compile_source(program_text, **options).quadruples.quadruples
+    for index, (op, _, _, target) in enumerate(quadruples):
+        if OPERATOR_NAMES[op] in ("goto", "gotoF", "gotoT") and target <= index:
+            operators = [OPERATOR_NAMES[quadruple[0]] for quadruple in quadruples]
+            return operators[:target], operators[target : index + 1]
+    raise AssertionError("no loop")
+
+
+def test_loop_invariants_are_computed_once():
+    program = """
+    program Licm;
+    void f(n: int, m: int) [
+        var i, s: int;
+        {
+            i = 0;
+            s = 0;
+            while (i < n * 2) do {
+                s = s + n * m;
+                i = i + 1;
+            };
+            print(s);
+        }
+    ];
+    main {
+        f(3, 4);
+    }
+    end
+    """
+    before, loop = loop_operators(program)
+    assert "*" not in loop
+    assert "*" in before
+    assert run_program(program) == "72"
+
+
+def test_calls_in_loops_keep_operations_on_globals():
+    program = """
+    program Licm;
+    var g: int;
+    void bump() [
+        {
+            g = g + 1;
+        }
+    ];
+    main {
+        g = 1;
+        while (g < 4) do {
+            print(g * 10, " ");
+            bump();
+        };
+    }
+    end
+    """
+    _, loop = loop_operators(program)
+    assert "*" in loop
+    assert run_program(program) == "10 20 30 "
+
+
+COUNTED_LOOPS = """
+program Counted;
+int product(n: int) [
+    var result, i: int;
+    {
+        result = 1;
+        i = 1;
+        while (i <= n) do {
+            result = result * i;
+            i = i + 1;
+        };
+        return result;
+    }
+];
+main {
+    print(product(0), product(1), product(3), product(4), product(5), product(9));
+}
+end
+"""
+
+
+def test_multiplications_by_the_loop_counter_are_reduced():
+    program = """
+    program Reduce;
+    void multiples(n: int) [
+        var i, sum: int;
+        {
+            i = 0;
+            sum = 0;
+            while (i < n) do {
+                sum = sum + i * 3;
+                i = i + 1;
+            };
+            print(sum);
+        }
+    ];
+    main {
+        multiples(5);
+    }
+    end
+    """
+    _, loop = loop_operators(program, unroll_factor=1)
+    assert loop == ["+", "+", "<", "gotoT"]
+    assert run_program(program, unroll_factor=1) == "30"
+
+
+def test_counted_loops_are_unrolled():
+    assert compiled_operators(COUNTED_LOOPS, unroll_factor=4).count("*") == 5
+    assert compiled_operators(COUNTED_LOOPS, unroll_factor=1).count("*") == 1
+    expected = run_program(COUNTED_LOOPS, 0)
+    assert expected == "11624120362880"
+    for unroll_factor in (1, 2, 3, 4):
+        assert run_program(COUNTED_LOOPS, unroll_factor=unroll_factor) == expected
+
+
+def test_temporaries_share_addresses():
+    program = generate_program(functions=2, statements=40)
+    unoptimized = compile_source(program, optimization_level=0).symbol_table.get_function("func_1")
+    optimized = compile_source(program).symbol_table.get_function("func_1")
+    assert unoptimized.required_space["t_int"] > 50
+    assert 0 < optimized.required_space["t_int"] <= 4
+    assert run_program(program) == run_program(program, 0)
+
+
+def test_long_functions_fit_in_the_temporaries():
+    program = generate_program(functions=1, statements=600)
+    result = compile_source(program)
+    assert result.symbol_table.get_function("func_0").required_space["t_int"] <= 4
+    assert run_program(program).startswith("total: ")
+
+
+@pytest.mark.parametrize("name", find_sources(TESTS_DIR))
+def test_optimized_programs_print_the_same(name):
+    source = os.path.join(TESTS_DIR, name)
+    assert run_source(source, 1) == run_source(source, 0)
+
+
+@pytest.mark.parametrize("codegen_jobs", [None, 1])
+def test_optimized_programs_keep_only_the_constants_they_read(codegen_jobs):
+    programs = [generate_program(functions=20, statements=10)]
+    for name in find_sources(TESTS_DIR):
+        with open(os.path.join(TESTS_DIR, name), encoding="utf-8") as f:
+            programs.append(f.read())
+    for program in programs:
+        assert unread_constants(compile_source(program, codegen_jobs=codegen_jobs)) == []
+
+
+def test_liveness_is_computed_a_few_times_per_unit(monkeypatch):
+    computed = []
+
+    def counted(blocks):
+        computed.append(blocks)
+        return liveness(blocks)
+
+    monkeypatch.setattr("QuackOptimizer.liveness", counted)
+    # Every function has a loop; with the globals and main body, 12 units
+    compile_source(generate_program(functions=10, statements=20))
+    assert len(computed) <= 3 * 12
+
+
+def test_optimized_generated_program_prints_the_same():
+    program = generate_program(functions=20, statements=10)
+    assert run_program(program) == run_program(program, 0)
+
+
+def test_unfoldable_results_are_left_to_the_vm():
+    assert fold_operation("/", 1, 0) is None
+    assert fold_operation("*", 2**62, 4) is None
+    assert fold_operation("*", 1e308, 10.0) is None
+    assert fold_operation("/", 7, 2) == 3.5
+
+
+def test_unknown_optimization_level_is_an_error():
+    with pytest.raises(ValueError):
+        QuackOptimizer(7)
+    with pytest.raises(ValueError):
+        QuackOptimizer(1, unroll_factor=0)
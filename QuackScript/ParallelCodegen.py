@@ -0,0 +1,173 @@
+"""
+Per-function code generation.
+
+The body of a function only depends on the global scope and on the signatures
+of the functions declared before it. FunctionCodegen generates every function
+into its own QuackQuadruple, with its own constant pool and with jump targets
+relative to the start of the buffer, in worker processes when jobs > 1. The
+buffers are then appended to the program in declaration order: jump targets and
+entry points are shifted by the position of each buffer and constants are
+interned in the program's constant table in order of first use.
+
+For programs without imports the result is the same code the sequential
+generator produces. Imported functions get their return slots before any
+function is generated instead of on their first call, so only those global
+addresses can differ.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+from Exceptions import ContainerRedeclarationError
+from MemoryManager import MemoryManager
+from QuackInterpreter import QuackInterpreter
+from QuackOptimizer import QuackOptimizer
+from QuackQuadruple import OperatorsInterface, QuackQuadruple
+from SymbolTable import Container, SymbolTable
+from TransformerClasses import FunctionDeclNode
+
+JUMP_OPERATORS = {OperatorsInterface().operators[op] for op in ("goto", "gotoF", "gotoT")}
+
+
+@dataclass
+class CodegenContext:
+    """What a function body can see: the global scope and the functions declared before it."""
+
+    global_container: Container
+    # The program's functions in declaration order, with their signatures and return slots
+    functions: List[Container]
+    # Functions imported from modules
+    externals: List[Container]
+    optimizer: Optional[QuackOptimizer] = None
+
+
+@dataclass
+class FunctionCode:
+    name: str
+    quadruples: List[Tuple]
+    final_position: int
+    param_signature: List[str]
+    required_space: Dict[str, int]
+    # (address in the buffer, value, type) in order of first use
+    constants: List[Tuple[int, Union[int, float, str], str]]
+
+
+def generate_function(context: CodegenContext, index: int, decl: FunctionDeclNode) -> FunctionCode:
+    """Generate the code of the index-th function into its own buffer."""
+    global_container = context.global_container
+    later = {function.name for function in context.functions[index + 1 :]}
+
+    symbol_table = SymbolTable()
+    symbol_table.create_global_container(global_container.name)
+    visible_globals = symbol_table.get_function(global_container.name)
+    # Return slots of later functions are not in scope yet, as in sequential code generation
+    visible_globals.symbols = {name: symbol for name, symbol in global_container.symbols.items() if name not in later}
+    for function in context.externals + context.functions[:index]:
+        symbol_table.containers[function.name] = function
+
+    quadruples = QuackQuadruple()
+    interpreter = QuackInterpreter(symbol_table, quadruples, MemoryManager())
+    interpreter.optimizer = context.optimizer
+    interpreter.execute(decl)
+
+    container = symbol_table.get_function(decl.name.name)
+    return FunctionCode(
+        name=container.name,
+        quadruples=quadruples.get_quadruples(),
+        final_position=container.final_position,
+        param_signature=container.param_signature,
+        required_space=container.required_space,
+        constants=[
+            (address, constant.value, constant.var_type)
+            for address, constant in symbol_table.constants_table.constants.items()
+        ],
+    )
+
+
+_worker_context: Optional[CodegenContext] = None
+
+
+def _init_worker(context: CodegenContext) -> None:
+    global _worker_context
+    _worker_context = context
+
+
+def _generate_in_worker(index: int, decl: FunctionDeclNode) -> FunctionCode:
+    return generate_function(_worker_context, index, decl)
+
+
+class FunctionCodegen:
+    """
+    Function generator for QuackInterpreter that emits each function into its
+    own buffer. With jobs > 1 the buffers are generated in a process pool.
+    """
+
+    def __init__(self, jobs: int = 1):
+        self.jobs = jobs
+
+    def declare_functions(self, interpreter: QuackInterpreter, functions: List[FunctionDeclNode]) -> CodegenContext:
+        """Declare the signature and return slot of every function before generating any body."""
+        symbol_table = interpreter.symbol_table
+
+        externals = [container for container in symbol_table.containers.values() if container.module is not None]
+        for container in externals:
+            if container.return_type != "void" and container.return_address is None:
+                container.return_address = interpreter.allocate_return_slot(container.name, container.return_type)
+
+        declared = []
+        names = set()
+        for decl in functions:
+            name = decl.name.name
+            if name in names or symbol_table.is_function_declared(name):
+                raise ContainerRedeclarationError(f"Container '{name}' already exists.")
+            names.add(name)
+
+            container = Container(name=name, return_type=decl.return_type)
+            container.param_signature = [param.param_type for param in decl.params.params]
+            if decl.return_type != "void":
+                container.return_address = interpreter.allocate_return_slot(name, decl.return_type)
+            declared.append(container)
+
+        return CodegenContext(
+            global_container=symbol_table.get_function(interpreter.global_container_name),
+            functions=declared,
+            externals=externals,
+            optimizer=interpreter.optimizer,
+        )
+
+    def generate(self, interpreter: QuackInterpreter, functions: List[FunctionDeclNode]) -> None:
+        context = self.declare_functions(interpreter, functions)
+
+        if self.jobs > 1 and len(functions) > 1:
+            chunksize = max(1, len(functions) // (self.jobs * 4))
+            with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker, initargs=(context,)) as pool:
+                codes = list(pool.map(_generate_in_worker, range(len(functions)), functions, chunksize=chunksize))
+        else:
+            codes = [generate_function(context, index, decl) for index, decl in enumerate(functions)]
+
+        for container, code in zip(context.functions, codes):
+            self.append_function(interpreter, container, code)
+
+    def append_function(self, interpreter: QuackInterpreter, container: Container, code: FunctionCode) -> None:
+        """Relocate a function buffer to the end of the program and register the function."""
+        quack_quadruple = interpreter.quack_quadruple
+        base = quack_quadruple.get_current_index()
+        constants = {address: interpreter.intern_constant(value, var_type) for address, value, var_type in code.constants}
+
+        relocated = []
+        for op, arg1, arg2, result in code.quadruples:
+            arg1 = constants.get(arg1, arg1)
+            arg2 = constants.get(arg2, arg2)
+            if op in JUMP_OPERATORS:
+                result += base
+            else:
+                result = constants.get(result, result)
+            relocated.append((op, arg1, arg2, result))
+        quack_quadruple.extend(relocated)
+
+        container.initial_position = base
+        container.final_position = base + code.final_position
+        container.param_signature = code.param_signature
+        container.required_space = code.required_space
+        interpreter.symbol_table.containers[container.name] = container
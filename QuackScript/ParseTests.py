@@ -1,7 +1,9 @@
+import os
+
 from lark import Lark, UnexpectedInput
 
 # Load your grammar file or string
-with open("grammar.lark") as f:
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar.lark")) as f:
     grammar = f.read()
 
 parser = Lark(grammar, start="start", parser="lalr")
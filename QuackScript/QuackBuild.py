@@ -0,0 +1,148 @@
+"""
+Parallel build driver for trees of QuackScript sources.
+
+Every `.quack` file under the source directory is compiled into the same
+relative path under the output directory, with a `.obj` extension:
+
+    python QuackBuild.py src/ build/ --jobs 8
+
+Files are compiled in a process pool whose workers build the parser once and
+reuse it for every file they get. The output directory keeps a manifest with
+the cache key (see QuackCache) of every object it holds, so files whose source
+and compiler did not change, and whose imported modules kept their signatures,
+are skipped. A file that fails to compile is reported and the rest of the batch
+goes on; the exit status is 1 if any file failed.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from QuackCache import CACHE_DIR_NAME, ObjectCache
+from QuackCompiler import ModuleResolver, compile_program, get_parser, imports_are_current
+
+MANIFEST_NAME = ".quackbuild.json"
+
+
+@dataclass
+class BuildResult:
+    source: str
+    object_file: str
+    status: str  # "compiled", "up to date" or "failed"
+    key: Optional[str] = None
+    message: str = ""
+
+
+def find_sources(source_dir: str) -> List[str]:
+    """List the .quack files under source_dir, relative to it and in a stable order."""
+    sources = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if d != CACHE_DIR_NAME)
+        for name in sorted(files):
+            if name.endswith(".quack"):
+                sources.append(os.path.relpath(os.path.join(root, name), source_dir))
+    return sources
+
+
+def load_manifest(output_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(output_dir: str, manifest: Dict[str, str]) -> None:
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _warm_worker() -> None:
+    # Build the parser once per worker instead of once per file
+    get_parser(inline=True)
+
+
+def build_file(source_dir: str, source: str, output_dir: str, previous_key: Optional[str]) -> BuildResult:
+    """Compile one source file unless its object in output_dir is current."""
+    source_file = os.path.join(source_dir, source)
+    object_file = os.path.join(output_dir, os.path.splitext(source)[0] + ".obj")
+    resolver = ModuleResolver([os.path.dirname(os.path.abspath(source_file)), os.path.abspath(source_dir)])
+    output = io.StringIO()
+    try:
+        with open(source_file, "rb") as f:
+            key = ObjectCache(output_dir).key(f.read())
+
+        if key == previous_key and os.path.exists(object_file):
+            with redirect_stdout(output):
+                current = imports_are_current(object_file, resolver)
+            if current:
+                return BuildResult(source, object_file, "up to date", key)
+
+        os.makedirs(os.path.dirname(object_file), exist_ok=True)
+        temp_file = f"{object_file}.{os.getpid()}.tmp"
+        try:
+            with redirect_stdout(output):
+                compiled = compile_program(source_file, temp_file, resolver)
+            if not compiled:
+                return BuildResult(source, object_file, "failed", message=output.getvalue().strip())
+            os.replace(temp_file, object_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        return BuildResult(source, object_file, "compiled", key)
+    except Exception as e:
+        return BuildResult(source, object_file, "failed", message=f"{type(e).__name__}: {e}")
+    finally:
+        resolver.cleanup()
+
+
+def build_tree(source_dir: str, output_dir: str, jobs: Optional[int] = None) -> List[BuildResult]:
+    """Compile every source under source_dir into output_dir using a pool of jobs processes."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    sources = find_sources(source_dir)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_warm_worker) as pool:
+        futures = [
+            pool.submit(build_file, source_dir, source, output_dir, manifest.get(source)) for source in sources
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result.status == "failed":
+                manifest.pop(result.source, None)
+            else:
+                manifest[result.source] = result.key
+
+    save_manifest(output_dir, manifest)
+    return sorted(results, key=lambda result: result.source)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a tree of QuackScript sources in parallel.")
+    parser.add_argument("source_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    results = build_tree(args.source_dir, args.output_dir, args.jobs)
+
+    for result in results:
+        if result.status == "failed":
+            print(f"FAILED      {result.source}\n            {result.message}")
+        else:
+            print(f"{result.status:<11} {result.source}")
+
+    failed = sum(1 for result in results if result.status == "failed")
+    compiled = sum(1 for result in results if result.status == "compiled")
+    print(f"\n{len(results)} files: {compiled} compiled, {len(results) - compiled - failed} up to date, {failed} failed")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,148 @@
+"""
+Persistent cache of compiled object files.
+
+Like Python's __pycache__, compiled objects are stored in a `__quackcache__`
+directory next to the source file. Entries are keyed by the hash of the source,
+the compiler fingerprint (grammar and compiler sources), the object format
+version and the compiler options, so any change to one of them produces a new
+key. The directory has a size cap; when it is exceeded the least recently used
+entries are evicted.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Optional
+
+from QuackObjectFile import FORMAT_VERSION
+
+CACHE_DIR_NAME = "__quackcache__"
+CACHE_EXTENSION = ".obj"
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The grammar and the modules that decide what goes into an object file
+COMPILER_FILES = [
+    "grammar.lark",
+    "Exceptions.py",
+    "MemoryManager.py",
+    "ParallelCodegen.py",
+    "QuackCompiler.py",
+    "QuackInterpreter.py",
+    "QuackObjectFile.py",
+    "QuackOptimizer.py",
+    "QuackQuadruple.py",
+    "QuackTransformer.py",
+    "SemanticCube.py",
+    "StreamingCodegen.py",
+    "SymbolTable.py",
+    "TransformerClasses.py",
+]
+
+_compiler_fingerprint = None
+
+
+def compiler_fingerprint() -> str:
+    """
+    Hash of the grammar and of the compiler sources. Objects compiled by a
+    different version of the compiler never match.
+    """
+    global _compiler_fingerprint
+    if _compiler_fingerprint is None:
+        digest = hashlib.sha256()
+        for path in (os.path.join(PACKAGE_DIR, name) for name in COMPILER_FILES):
+            digest.update(os.path.basename(path).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        _compiler_fingerprint = digest.hexdigest()
+    return _compiler_fingerprint
+
+
+class ObjectCache:
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    @classmethod
+    def for_source(cls, source_file: str, max_size: int = DEFAULT_MAX_SIZE) -> "ObjectCache":
+        """Create the cache that lives next to the given source file."""
+        directory = os.path.join(os.path.dirname(os.path.abspath(source_file)), CACHE_DIR_NAME)
+        return cls(directory, max_size=max_size)
+
+    def key(self, source: bytes, options: Dict = None) -> str:
+        """Get the cache key for a source file compiled with the given options."""
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(source).digest())
+        digest.update(compiler_fingerprint().encode("ascii"))
+        digest.update(str(FORMAT_VERSION).encode("ascii"))
+        digest.update(json.dumps(options or {}, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def path_for(self, key: str) -> str:
+        """Get the path where the object for a key is stored."""
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Get the cached object for a key, or None on a miss.
+        A hit refreshes the entry's modification time, which is what eviction orders by.
+        """
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, key: str, object_file: str) -> str:
+        """
+        Move a freshly compiled object file into the cache and evict old entries
+        if the cache grew past its size cap.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        os.replace(object_file, path)
+        self.evict(keep=path)
+        return path
+
+    def new_object_path(self) -> str:
+        """Get a temporary path inside the cache directory to compile into."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        return path
+
+    def evict(self, keep: str = None) -> None:
+        """Remove the least recently used entries until the cache fits in max_size."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        """Remove every cached object."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_EXTENSION):
+                os.remove(os.path.join(self.directory, name))
@@ -1,76 +1,534 @@
 import logging
 import os
-import pickle
+import shutil
 import sys
+import tempfile
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, TextIO, Union
 
-from lark import Lark, UnexpectedInput, logger
+from lark import Lark, Token, Tree, UnexpectedInput, logger
 
+from Exceptions import CircularImportError, LinkError, NameNotFoundError
 from MemoryManager import MemoryManager
+from ParallelCodegen import FunctionCodegen
+from QuackCache import CACHE_DIR_NAME, PACKAGE_DIR, ObjectCache
 from QuackInterpreter import QuackInterpreter
-from QuackQuadruple import QuackQuadruple
-from QuackTransformer import QuackTransformer
+from QuackMetrics import CompileMetrics
+from QuackObjectFile import ObjectFileWriter, read_object_file, write_object_file
+from QuackOptimizer import DEFAULT_OPTIMIZATION_LEVEL, DEFAULT_UNROLL_FACTOR, QuackOptimizer
+from QuackQuadruple import OperatorsInterface, QuackQuadruple
+from QuackTransformer import QuackTransformer, StreamingTransformer
+from StreamingCodegen import StreamingCodegen
+from SymbolTable import SymbolTable
+from TransformerClasses import ModuleNode, ProgramNode, SourceSpans
 
-logger.setLevel(logging.DEBUG)
+GRAMMAR_FILE = os.path.join(PACKAGE_DIR, "grammar.lark")
+# The LALR tables are stored next to the compiled objects of the package. Lark checks
+# the hash of the grammar, its options and the Lark version before reusing them.
+PARSER_CACHE_FILE = os.path.join(PACKAGE_DIR, CACHE_DIR_NAME, "grammar.lark-cache")
 
-# Import grammar from file
-with open("grammar.lark", "r") as file:
-    grammar = file.read()
+# Set QUACK_DEBUG=1 to build the parser in debug mode with Lark's debug logging
+DEBUG = os.environ.get("QUACK_DEBUG", "") not in ("", "0")
 
-# Create the Lark parser
-quackParser = Lark(grammar, start="start", parser="lalr", debug=True)
-quack = quackParser.parse
+# Streaming compilation reads the source in chunks of about this many characters
+STREAM_CHUNK_SIZE = 1 << 20
 
+_parsers = {}
 
-def generate_obj_file(quadruples, symbol_table, output_file):
+
+def get_parser(debug=DEBUG, inline=False, streaming=False):
+    """
+    Get the LALR parser, building it on first use. The parse tables are loaded
+    from PARSER_CACHE_FILE when it matches the current grammar, and written to
+    it otherwise, so only the first process after a grammar change analyzes it.
+    An inline parser runs its QuackTransformer on every reduction and returns
+    the IR instead of a parse tree. A streaming parser is an inline parser with
+    a StreamingTransformer.
+    """
+    key = (debug, inline, streaming)
+    if key not in _parsers:
+        if debug:
+            logger.setLevel(logging.DEBUG)
+
+        with open(GRAMMAR_FILE, "r", encoding="utf-8") as file:
+            grammar = file.read()
+
+        try:
+            os.makedirs(os.path.dirname(PARSER_CACHE_FILE), exist_ok=True)
+            cache = PARSER_CACHE_FILE
+        except OSError:
+            # Read-only installs fall back to Lark's cache in the temporary directory
+            cache = True
+
+        _parsers[key] = Lark(
+            grammar,
+            start="start",
+            parser="lalr",
+            debug=debug,
+            cache=cache,
+            transformer=StreamingTransformer() if streaming else QuackTransformer() if inline else None,
+        )
+    return _parsers[key]
+
+
+def quack(program):
+    """Parse a QuackScript program into a Lark parse tree."""
+    return get_parser().parse(program)
+
+
+def generate_obj_file(quadruples, symbol_table, output_file, kind="program", dependencies=()):
     """
     Generates a binary object file from the quadruple and symbol table.
+    The layout is documented in QuackObjectFile.
+    """
+    write_object_file(quadruples, symbol_table, output_file, kind=kind, dependencies=dependencies)
+
+
+def register_imports(symbol_table, imports, import_resolver):
     """
-    data = {
-        "quadruples": quadruples.quadruples,
-        "operators": quadruples.operators.operators,
-        "functions": symbol_table.containers,
-        "constants_table": symbol_table.constants_table,
-        "global_container_name": symbol_table.global_container_name,
-    }
-    with open(output_file, "wb") as f:
-        pickle.dump(data, f)
+    Declare the functions of every imported module in the symbol table, so calls
+    to them are type checked against the signatures in the module objects.
+    """
+    for module_name in imports:
+        if import_resolver is None:
+            raise NameNotFoundError(f"Cannot import module '{module_name}' without a module search path.")
+        module = read_object_file(import_resolver.resolve(module_name), relocatable=True)
+        for name, function in module.functions.items():
+            if name == module.global_container_name:
+                continue
+            symbol_table.add_external_function(
+                name=name,
+                return_type=function.return_type,
+                param_signature=function.param_signature,
+                module=module_name,
+            )
+
 
+@dataclass
+class CompilationResult:
+    """
+    Output of compile_source. The symbol table and quadruples are all the object
+    file needs; the parse tree, IR, the source spans of its nodes and the
+    compile-time memory are only kept when compiling with debug=True. The text
+    dumps are built when they are asked for.
+    """
 
-def parse_program(program):
+    symbol_table: SymbolTable
+    quadruples: QuackQuadruple
+    kind: str
+    dependencies: List[str]
+    tree: Optional[Tree] = None
+    ir: Optional[Union[ProgramNode, ModuleNode]] = None
+    spans: Optional[SourceSpans] = None
+    memory: Optional[MemoryManager] = None
+
+    def dump_tree(self) -> str:
+        return self.tree.pretty() if self.tree is not None else ""
+
+    def dump_ir(self) -> str:
+        return str(self.ir)
+
+    def dump_symbol_table(self) -> str:
+        return self.symbol_table.get_str_representation()
+
+    def dump_quadruples(self) -> str:
+        return self.quadruples.get_str_representation(pretty=True)
+
+    def dump_memory(self) -> str:
+        return self.memory.get_str_representation() if self.memory is not None else ""
+
+    def debug_dump(self) -> str:
+        """Every debug artifact in the format of the .out files of `python QuackCompiler.py`."""
+        return (
+            f"Parse Tree:\n{self.dump_tree()}\n"
+            f"IR:\n{self.dump_ir()}\n\n"
+            f"Symbol Table:\n{self.dump_symbol_table()}\n"
+            f"Quadruples:\n{self.dump_quadruples()}\n\n"
+            f"Memory:\n{self.dump_memory()}\n\n"
+        )
+
+
+def _phase(metrics, name):
+    return metrics.phase(name) if metrics is not None else nullcontext()
+
+
+def make_optimizer(optimization_level: int, unroll_factor: int = DEFAULT_UNROLL_FACTOR) -> Optional[QuackOptimizer]:
+    """The optimizer for an optimization level, None for level 0."""
+    return QuackOptimizer(optimization_level, unroll_factor) if optimization_level else None
+
+
+def compile_source(
+    program,
+    import_resolver=None,
+    debug=False,
+    metrics: Optional[CompileMetrics] = None,
+    codegen_jobs: Optional[int] = None,
+    optimization_level: int = DEFAULT_OPTIMIZATION_LEVEL,
+    unroll_factor: int = DEFAULT_UNROLL_FACTOR,
+):
+    """
+    Compiles the source of a program or module to quadruples.
+    Without debug, the transformer runs inline with the parser so no parse tree
+    is built, and the IR and compile-time memory are dropped once code generation
+    finishes. With debug, the parse tree is built and every artifact is kept for
+    the dumps of CompilationResult. Returns None if the program does not parse.
+    When collecting metrics, parsing and transforming run as separate passes so
+    each one can be measured on its own. With codegen_jobs, every function is
+    generated into its own buffer, in codegen_jobs worker processes when it is
+    more than 1 (see ParallelCodegen). The code is optimized at
+    optimization_level, unrolling counted loops by unroll_factor, see
+    QuackOptimizer.
+    """
     try:
-        # Parse the input program
-        tree = quack(program)
+        if debug or metrics is not None:
+            # Parse the input program
+            with _phase(metrics, "parser"):
+                parser = get_parser()
+            with _phase(metrics, "parse"):
+                tree = parser.parse(program)
 
-        # Transform the parse tree using QuackTransformer
-        quack_transformer = QuackTransformer()
-        ir = quack_transformer.transform(tree)
+            # Transform the parse tree using QuackTransformer
+            with _phase(metrics, "transform"):
+                quack_transformer = QuackTransformer(spans=debug)
+                ir = quack_transformer.transform(tree)
+            if not debug:
+                tree = None
+        else:
+            parser = get_parser(inline=True)
+            quack_transformer = parser.options.transformer
+            ir = parser.parse(program)
+            tree = None
+    except UnexpectedInput as e:
+        print(f"Parsing failed: {e}")
+        return None
 
-        # Get the symbol table from the transformer
-        symbol_table = quack_transformer.symbol_table
+    # Get the symbol table from the transformer. The inline transformer is shared,
+    # so it must not keep this program alive until the next compilation.
+    symbol_table = quack_transformer.symbol_table
+    quack_transformer.symbol_table = None
+    if ir.imports:
+        with _phase(metrics, "imports"):
+            register_imports(symbol_table, ir.imports, import_resolver)
 
-        # Execute the IR
-        # Initialize the memory manager
+    # Execute the IR
+    # Initialize the memory manager
+    with _phase(metrics, "codegen"):
         memory_manager = MemoryManager()
         quack_quadruple = QuackQuadruple()
         quack_interpreter = QuackInterpreter(symbol_table, quack_quadruple, memory_manager)
+        if codegen_jobs is not None:
+            quack_interpreter.function_generator = FunctionCodegen(jobs=codegen_jobs)
+        quack_interpreter.optimizer = make_optimizer(optimization_level, unroll_factor)
         quack_interpreter.execute(ir)
 
-        return (tree.pretty(), ir, symbol_table, quack_quadruple, memory_manager)
+    if metrics is not None:
+        if quack_interpreter.optimizer is not None:
+            metrics.split_phase("codegen", "optimize", quack_interpreter.optimizer.seconds)
+        metrics.count_result(ir, symbol_table, quack_quadruple)
+
+    result = CompilationResult(
+        symbol_table=symbol_table,
+        quadruples=quack_quadruple,
+        kind="module" if isinstance(ir, ModuleNode) else "program",
+        dependencies=list(ir.imports),
+    )
+    if debug:
+        result.tree = tree
+        result.ir = ir
+        result.spans = quack_transformer.spans
+        result.memory = memory_manager
+    return result
+
+
+def _stream_tokens(parser, file: TextIO) -> Iterator[Token]:
+    """
+    Lex a source file in chunks of whole lines, with the positions of the tokens
+    in the whole file. No token of the grammar spans more than one line.
+    """
+    line_offset = 0
+    char_offset = 0
+    while True:
+        lines = file.readlines(STREAM_CHUNK_SIZE)
+        if not lines:
+            return
+        chunk = "".join(lines)
+        for token in parser.lex(chunk):
+            token.line += line_offset
+            token.end_line += line_offset
+            token.start_pos += char_offset
+            token.end_pos += char_offset
+            yield token
+        line_offset += len(lines)
+        char_offset += len(chunk)
+
+
+def compile_streaming(
+    input_file,
+    output_file,
+    import_resolver=None,
+    metrics: Optional[CompileMetrics] = None,
+    optimization_level: int = DEFAULT_OPTIMIZATION_LEVEL,
+    unroll_factor: int = DEFAULT_UNROLL_FACTOR,
+):
+    """
+    Compiles a program or module like compile_program, without holding its source,
+    IR or code in memory. The source is parsed a chunk at a time with Lark's
+    interactive parser and every function is generated and written out as soon
+    as it is parsed (see StreamingCodegen). Returns False if the program does not parse.
+    """
+    with _phase(metrics, "parser"):
+        parser = get_parser(streaming=True)
+    transformer = parser.options.transformer
+    writer = ObjectFileWriter(OperatorsInterface().operators)
+    optimizer = make_optimizer(optimization_level, unroll_factor)
+    codegen = StreamingCodegen(
+        transformer,
+        writer,
+        lambda symbol_table, imports: register_imports(symbol_table, imports, import_resolver),
+        optimizer,
+    )
+    transformer.on_function = codegen.function
+    try:
+        with _phase(metrics, "compile"):
+            with open(input_file, "r", encoding="utf-8") as file:
+                interactive = parser.parse_interactive()
+                for token in _stream_tokens(parser, file):
+                    interactive.feed_token(token)
+                ir = interactive.feed_eof()
+            codegen.finish(ir)
+
+        symbol_table = codegen.interpreter.symbol_table
+        if metrics is not None:
+            if optimizer is not None:
+                metrics.split_phase("compile", "optimize", optimizer.seconds)
+            metrics.counts.update(
+                {
+                    "functions": sum(1 for c in symbol_table.containers.values() if c.initial_position is not None),
+                    "quadruples": writer.instruction_count,
+                    "constants": len(symbol_table.constants_table.constants),
+                }
+            )
+        with _phase(metrics, "serialize"):
+            writer.finish(
+                symbol_table,
+                output_file,
+                kind="module" if isinstance(ir, ModuleNode) else "program",
+                dependencies=ir.imports,
+            )
+        return True
     except UnexpectedInput as e:
         print(f"Parsing failed: {e}")
+        return False
+    finally:
+        # The transformer is shared, so it must not keep this program alive
+        transformer.on_function = None
+        transformer.symbol_table = None
+        transformer.declarations = []
+        writer.close()
 
 
-def compile_program(input_file, output_file):
+def compile_program(
+    input_file,
+    output_file,
+    import_resolver=None,
+    metrics: Optional[CompileMetrics] = None,
+    codegen_jobs: Optional[int] = None,
+    streaming: bool = False,
+    optimization_level: int = DEFAULT_OPTIMIZATION_LEVEL,
+    unroll_factor: int = DEFAULT_UNROLL_FACTOR,
+):
     """
-    Compiles a QuackScript program from an input file and generates an object file.
+    Compiles a QuackScript program or module from an input file and generates an object file.
+    Modules, and programs that import modules, produce relocatable objects that
+    have to go through QuackLinker. Returns True if the object file was written.
+    If metrics is given, it receives the time and memory of every phase.
+    codegen_jobs enables per-function code generation, see compile_source.
+    With streaming, the program is compiled with compile_streaming instead and
+    codegen_jobs is ignored. optimization_level selects the QuackOptimizer passes
+    and unroll_factor how much they unroll counted loops.
     """
     try:
-        with open(input_file, "r", encoding="utf-8") as file:
-            program = file.read()
-        tree, ir, symbol_table, quadruples, memory = parse_program(program)
-        generate_obj_file(quadruples, symbol_table, output_file)
+        if streaming:
+            return compile_streaming(
+                input_file, output_file, import_resolver, metrics, optimization_level, unroll_factor
+            )
+        with _phase(metrics, "read"):
+            with open(input_file, "r", encoding="utf-8") as file:
+                program = file.read()
+        if metrics is not None:
+            metrics.counts["source_lines"] = program.count("\n") + 1
+        result = compile_source(
+            program,
+            import_resolver,
+            metrics=metrics,
+            codegen_jobs=codegen_jobs,
+            optimization_level=optimization_level,
+            unroll_factor=unroll_factor,
+        )
+        if result is None:
+            return False
+        with _phase(metrics, "serialize"):
+            generate_obj_file(
+                result.quadruples,
+                result.symbol_table,
+                output_file,
+                kind=result.kind,
+                dependencies=result.dependencies,
+            )
+        return True
+    except LinkError:
+        # Import cycles are reported once, by the program being built
+        raise
     except Exception as e:
         print(f"An error occurred: {e}")
+        return False
+
+
+def imports_are_current(object_file, import_resolver):
+    """
+    Check that the functions a compiled object imports still have the same
+    signatures in the current version of their modules.
+    """
+    program = read_object_file(object_file, relocatable=True)
+    modules = {}
+    for entry in program.imports.values():
+        if entry.module not in modules:
+            modules[entry.module] = read_object_file(import_resolver.resolve(entry.module), relocatable=True)
+        function = modules[entry.module].functions.get(entry.name)
+        if (
+            function is None
+            or function.return_type != entry.return_type
+            or function.param_signature != entry.param_signature
+        ):
+            return False
+    return True
+
+
+def compile_cached(
+    input_file,
+    cache,
+    import_resolver=None,
+    metrics: Optional[CompileMetrics] = None,
+    codegen_jobs: Optional[int] = None,
+    streaming: bool = False,
+    optimization_level: int = DEFAULT_OPTIMIZATION_LEVEL,
+    unroll_factor: int = DEFAULT_UNROLL_FACTOR,
+):
+    """
+    Returns the path of the compiled object for input_file, compiling it only
+    when the cache has no entry for the current source and compiler, or when
+    the modules it imports changed their signatures. With metrics, the program
+    is always compiled so there is something to measure.
+    """
+    with open(input_file, "rb") as file:
+        source = file.read()
+
+    # The optimizer options change the generated code, the other options do not
+    key = cache.key(source, {"optimization_level": optimization_level, "unroll_factor": unroll_factor})
+    object_file = cache.lookup(key)
+    if (
+        metrics is None
+        and object_file is not None
+        and (import_resolver is None or imports_are_current(object_file, import_resolver))
+    ):
+        return object_file
+
+    temp_file = cache.new_object_path()
+    try:
+        if not compile_program(
+            input_file,
+            temp_file,
+            import_resolver,
+            metrics,
+            codegen_jobs,
+            streaming,
+            optimization_level,
+            unroll_factor,
+        ):
+            return None
+        return cache.store(key, temp_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+class ModuleResolver:
+    """
+    Finds `<name>.quack` modules in the search paths and compiles each one once.
+    With use_cache, module objects are kept in the __quackcache__ next to each
+    module, so unchanged modules are never recompiled; otherwise they are compiled
+    into a temporary directory that is removed by cleanup. Modules are
+    optimized at optimization_level and unroll loops by unroll_factor, like the
+    program that imports them.
+    """
+
+    def __init__(
+        self,
+        search_paths,
+        use_cache=True,
+        optimization_level: int = DEFAULT_OPTIMIZATION_LEVEL,
+        unroll_factor: int = DEFAULT_UNROLL_FACTOR,
+    ):
+        self.search_paths = list(search_paths)
+        self.use_cache = use_cache
+        self.optimization_level = optimization_level
+        self.unroll_factor = unroll_factor
+        self.objects = {}
+        self.resolving = []
+        self.temp_dir = None
+
+    def find_source(self, name):
+        for path in self.search_paths:
+            source = os.path.join(path, f"{name}.quack")
+            if os.path.isfile(source):
+                return source
+        raise NameNotFoundError(f"Module '{name}' not found in {', '.join(self.search_paths)}.")
+
+    def resolve(self, name):
+        """Get the path of the compiled object of a module, compiling it if needed."""
+        if name in self.objects:
+            return self.objects[name]
+        if name in self.resolving:
+            raise CircularImportError(f"Circular import: {' -> '.join(self.resolving + [name])}.")
+
+        source = self.find_source(name)
+        self.resolving.append(name)
+        try:
+            if self.use_cache:
+                object_file = compile_cached(
+                    source,
+                    ObjectCache.for_source(source),
+                    self,
+                    optimization_level=self.optimization_level,
+                    unroll_factor=self.unroll_factor,
+                )
+            else:
+                if self.temp_dir is None:
+                    self.temp_dir = tempfile.mkdtemp(prefix="quack-modules-")
+                object_file = os.path.join(self.temp_dir, f"{name}.obj")
+                compiled = compile_program(
+                    source,
+                    object_file,
+                    self,
+                    optimization_level=self.optimization_level,
+                    unroll_factor=self.unroll_factor,
+                )
+                if not compiled:
+                    object_file = None
+        finally:
+            self.resolving.pop()
+
+        if object_file is None:
+            raise NameNotFoundError(f"Module '{name}' could not be compiled.")
+        self.objects[name] = object_file
+        return object_file
+
+    def cleanup(self):
+        """Remove the module objects compiled outside of the cache."""
+        if self.temp_dir is not None:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
 
 
 if __name__ == "__main__":
@@ -88,25 +546,11 @@ if __name__ == "__main__":
                 sys.stdout = log_file
                 with open(os.path.join("./tests", file), "r", encoding="utf-8") as input_file:
                     program = input_file.read()
-                    tree, ir, symbol_table, quadruples, memory = parse_program(program)
+                    result = compile_source(program, debug=True)
                     # Guarda el output en un archivo .out
                     with open(
                         os.path.join("./output", file.replace(".quack", ".out")), "w", encoding="utf-8"
                     ) as output_file:
-                        output_file.write("Parse Tree:\n")
-                        output_file.write(str(tree))
-                        output_file.write("\n")
-                        output_file.write("IR:\n")
-                        output_file.write(str(ir))
-                        output_file.write("\n\n")
-                        output_file.write("Symbol Table:\n")
-                        output_file.write(symbol_table.get_str_representation())
-                        output_file.write("\n")
-                        output_file.write("Quadruples:\n")
-                        output_file.write(quadruples.get_str_representation(pretty=True))
-                        output_file.write("\n\n")
-                        output_file.write("Memory:\n")
-                        output_file.write(memory.get_str_representation())
-                        output_file.write("\n\n")
+                        output_file.write(result.debug_dump())
 
             sys.stdout = sys.__stdout__
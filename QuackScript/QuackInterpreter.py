@@ -5,6 +5,7 @@ from Exceptions import (
 )
 from MemoryManager import Memory
 from SemanticCube import SemanticCube
+from SymbolTable import Constant
 from TransformerClasses import (
     ArithmeticOpNode,
     AssignNode,
@@ -19,6 +20,7 @@ from TransformerClasses import (
     IfNode,
     LogicalAndNode,
     LogicalOrNode,
+    ModuleNode,
     MultiplicativeOpNode,
     ParamNode,
     PrintNode,
@@ -38,6 +40,14 @@ class QuackInterpreter:
         self.semantic_cube = SemanticCube()
         self.quack_quadruple = quack_quadruple
         self.current_memory_space = "global"
+        # Generates the functions of a program, see ParallelCodegen. None generates them in order here.
+        self.function_generator = None
+        # QuackOptimizer that optimizes every unit of code once it is generated. None turns optimization off.
+        self.optimizer = None
+        # The first constant address of each type the unit being generated took, see start_unit
+        self.unit_constants = None
+        self.statement_handlers = dict(self.STATEMENT_HANDLERS)
+        self.expression_handlers = dict(self.EXPRESSION_HANDLERS)
 
     def __process_func_call(self, func_call):
         func_name = func_call.name.name
@@ -87,85 +97,187 @@ class QuackInterpreter:
 
         return return_type
 
-    def __evaluate_expression(self, expr_tree):
-        if isinstance(expr_tree, IdNode):
-            var_name = expr_tree.name
-            variable = self.symbol_table.get_variable(name=var_name, containerName=self.current_container)
-            value = variable.address
-            var_type = variable.var_type
-            return value, var_type
-
-        if isinstance(expr_tree, FuncCallNode):
-            func_name = expr_tree.name.name
-            return_type = self.__process_func_call(expr_tree)
-
-            if return_type != "void":
-                if self.symbol_table.get_function(self.global_container_name).is_symbol_declared(name=func_name):
-                    func_address = self.symbol_table.get_variable(
-                        name=func_name, containerName=self.global_container_name
-                    ).address
-                else:
-                    func_address = self.memory_manager.get_first_available_address(
-                        var_type=return_type,
-                        space="global",
-                    )
-                    self.symbol_table.add_variable(
-                        name=func_name,
-                        var_type=return_type,
-                        containerName=self.global_container_name,
-                        address=func_address,
-                    )
-                temp_address = self.memory_manager.get_first_available_address(
-                    var_type=f"t_{return_type}",
-                    space=self.current_memory_space,
-                )
-                self.symbol_table.add_temp(
-                    var_type=f"t_{return_type}",
-                    containerName=self.current_container,
-                )
-                self.quack_quadruple.add_quadruple("=", func_address, None, temp_address)
-                self.symbol_table.get_function(func_name).return_address = func_address
-
-                return temp_address, return_type
-            else:
-                raise TypeMismatchError(
-                    f"Function '{func_name}' does not return a value, cannot be used in an expression."
-                )
-
-        elif isinstance(expr_tree, CteNumNode) or isinstance(expr_tree, CteStringNode):
-            var_type = type(expr_tree.value).__name__
-            value = expr_tree.value
+    def allocate_return_slot(self, func_name, return_type):
+        """
+        Get the global address where a function leaves its return value,
+        allocating it unless the global scope already declares it.
+        """
+        global_container = self.symbol_table.get_function(self.global_container_name)
+        if global_container.is_symbol_declared(func_name):
+            return global_container.get_symbol(func_name).address
+
+        address = self.memory_manager.get_first_available_address(
+            var_type=return_type,
+            space="global",
+        )
+        self.symbol_table.add_variable(
+            name=func_name,
+            var_type=return_type,
+            containerName=self.global_container_name,
+            address=address,
+        )
+        return address
 
-            constant_address = self.symbol_table.constants_table.check_and_get_address(value)
+    def intern_constant(self, value, var_type):
+        """Get the address of a constant, allocating it on its first use."""
+        constant_address = self.symbol_table.constants_table.check_and_get_address(value, var_type)
 
-            if constant_address is not None:
-                result = constant_address
-            else:
-                result = self.memory_manager.get_first_available_address(
-                    var_type=var_type,
-                    space="constant",
-                )
-                self.symbol_table.add_constant(address=result, value=value, value_type=var_type)
+        if constant_address is not None:
+            return constant_address
 
-            return result, var_type
-
-        elif (
-            isinstance(expr_tree, MultiplicativeOpNode)
-            or isinstance(expr_tree, ArithmeticOpNode)
-            or isinstance(expr_tree, ComparisonNode)
-            or isinstance(expr_tree, LogicalAndNode)
-            or isinstance(expr_tree, LogicalOrNode)
-        ):
-            left_value, left_type = self.__evaluate_expression(expr_tree.left)
-            right_value, right_type = self.__evaluate_expression(expr_tree.right)
+        address = self.memory_manager.get_first_available_address(
+            var_type=var_type,
+            space="constant",
+        )
+        self.symbol_table.add_constant(address=address, value=value, value_type=var_type)
+        return address
+
+    def generate_functions(self, functions):
+        """Generate the code of the functions of a program or module, in declaration order."""
+        if self.function_generator is not None:
+            self.function_generator.generate(self, functions)
+            return
+        for func in functions:
+            self.execute(func)
+
+    def start_unit(self):
+        """
+        Start a unit of code, which optimize_code optimizes once it is generated.
+        Returns the position it starts at. The constants interned from here on
+        are the unit's own, which the optimizer gives back if it no longer reads them.
+        """
+        self.unit_constants = dict(self.memory_manager.memory_spaces["constant"].next_available)
+        return self.quack_quadruple.get_current_index()
+
+    def optimize_code(self, start):
+        """Optimize the code generated from position start on as one unit, see QuackOptimizer."""
+        if self.optimizer is not None:
+            self.optimizer.optimize(self, start)
+
+    def generate_globals(self, decls):
+        """Generate the declarations of the global variables and constants."""
+        start = self.start_unit()
+        for decl in decls:
+            self.execute(decl)
+        self.optimize_code(start)
+
+    def generate_main(self, main_body):
+        """Generate the main body of a program and the end of the program."""
+        start = self.start_unit()
+        self.execute(main_body)
+        self.quack_quadruple.add_quadruple("end", None, None, None)
+        self.optimize_code(start)
+
+    def register_statement(self, node_type, handler):
+        """Generate the code of node_type statements with handler(interpreter, node)."""
+        self.statement_handlers[node_type] = handler
+
+    def register_expression(self, node_type, handler):
+        """Evaluate node_type expressions with handler(interpreter, node), which returns (address, type)."""
+        self.expression_handlers[node_type] = handler
 
-            result_type = self.semantic_cube.get_type(left_type, right_type, expr_tree.op)
+    def __evaluate_expression(self, expr_tree):
+        handler = self.expression_handlers.get(type(expr_tree))
+        if handler is None:
+            raise UnsupportedOperationError(f"Unsupported expression type: {type(expr_tree)}")
+        return handler(self, expr_tree)
+
+    def evaluate_expression(self, expr_tree):
+        """Generate the code of an expression and return the address and type of its value."""
+        return self.__evaluate_expression(expr_tree)
+
+    def _evaluate_id(self, expr_tree):
+        var_name = expr_tree.name
+        variable = self.symbol_table.get_variable(name=var_name, containerName=self.current_container)
+        if variable.constant is not None:
+            # Constants with a known value are read from the constants table
+            return self.intern_constant(variable.constant.value, variable.constant.var_type), variable.var_type
+        value = variable.address
+        var_type = variable.var_type
+        return value, var_type
+
+    def _evaluate_func_call(self, expr_tree):
+        func_name = expr_tree.name.name
+        return_type = self.__process_func_call(expr_tree)
+
+        if return_type != "void":
+            function = self.symbol_table.get_function(func_name)
+            if function.return_address is None:
+                # Imported functions get a return slot in this module, the linker maps it to theirs
+                function.return_address = self.allocate_return_slot(func_name, return_type)
+            func_address = function.return_address
+
+            temp_address = self.memory_manager.get_first_available_address(
+                var_type=f"t_{return_type}",
+                space=self.current_memory_space,
+            )
+            self.symbol_table.add_temp(
+                var_type=f"t_{return_type}",
+                containerName=self.current_container,
+            )
+            self.quack_quadruple.add_quadruple("=", func_address, None, temp_address)
 
-            if result_type is None:
-                raise UnsupportedOperationError(
-                    f"Unsupported operation '{expr_tree.op}' for types '{left_type}' and '{right_type}'"
-                )
+            return temp_address, return_type
+        else:
+            raise TypeMismatchError(f"Function '{func_name}' does not return a value, cannot be used in an expression.")
+
+    def _evaluate_constant(self, expr_tree):
+        var_type = type(expr_tree.value).__name__
+        return self.intern_constant(expr_tree.value, var_type), var_type
+
+    def _evaluate_binary_op(self, expr_tree):
+        # Operator chains are lowered with an explicit stack in the same order a recursive
+        # evaluation would use, so expressions like 1 + 2 + ... + n do not recurse per operator.
+        # The result of an operator is only read by its parent, so the parent writes its own
+        # result over it when the types match and a chain of any length needs one temporary.
+        handlers = self.expression_handlers
+        results = []
+        stack = [(expr_tree, False)]
+        while stack:
+            node, operands_ready = stack.pop()
+            if operands_ready:
+                right = results.pop()
+                left = results.pop()
+                results.append(self.__emit_binary_op(node, left, right))
+            elif handlers.get(type(node)) is QuackInterpreter._evaluate_binary_op:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            else:
+                value, var_type = self.__evaluate_expression(node)
+                results.append((value, var_type, False))
+        value, var_type, _ = results[0]
+        return self.__operand(value), var_type
+
+    def __operand(self, value):
+        # Operators folded by the optimizer give a Constant, which only takes an address once it is used
+        if isinstance(value, Constant):
+            return self.intern_constant(value.value, value.var_type)
+        return value
+
+    def __emit_binary_op(self, expr_tree, left, right):
+        """Emit an operator whose operands are (address, type, is the result of another operator)."""
+        left_value, left_type, left_is_result = left
+        right_value, right_type, right_is_result = right
+        result_type = self.semantic_cube.get_type(left_type, right_type, expr_tree.op)
+
+        if result_type is None:
+            raise UnsupportedOperationError(
+                f"Unsupported operation '{expr_tree.op}' for types '{left_type}' and '{right_type}'"
+            )
 
+        if self.optimizer is not None:
+            constant = self.optimizer.fold(self, expr_tree.op, left_value, right_value)
+            if constant is not None:
+                return constant, result_type, False
+        left_value = self.__operand(left_value)
+        right_value = self.__operand(right_value)
+
+        if left_is_result and left_type == result_type:
+            func_address = left_value
+        elif right_is_result and right_type == result_type:
+            func_address = right_value
+        else:
             func_address = self.memory_manager.get_first_available_address(
                 var_type=f"t_{result_type}",
                 space=self.current_memory_space,
@@ -175,200 +287,259 @@ class QuackInterpreter:
                 containerName=self.current_container,
             )
 
-            result = self.quack_quadruple.add_quadruple(
-                op=expr_tree.op, arg1=left_value, arg2=right_value, result=func_address
-            )
-            return result, result_type
-
-        else:
-            raise UnsupportedOperationError(f"Unsupported expression type: {type(expr_tree)}")
-            # return expr_tree
+        result = self.quack_quadruple.add_quadruple(
+            op=expr_tree.op, arg1=left_value, arg2=right_value, result=func_address
+        )
+        return result, result_type, True
 
     def execute(self, ir):
-        if isinstance(ir, AssignNode):
-            var_name = ir.var_name
-            variable = self.symbol_table.get_variable(name=var_name, containerName=self.current_container)
+        handler = self.statement_handlers.get(type(ir))
+        if handler is None:
+            raise UnknownIRTypeError(f"Unknown IR type: {type(ir)}")
+        handler(self, ir)
 
-            if variable.isConstant:
-                raise TypeMismatchError(f"Cannot reassign constant variable '{var_name}'")
+    def _execute_assign(self, ir):
+        var_name = ir.var_name
+        variable = self.symbol_table.get_variable(name=var_name, containerName=self.current_container)
 
-            value, value_type = self.__evaluate_expression(ir.expr)
+        if variable.isConstant:
+            raise TypeMismatchError(f"Cannot reassign constant variable '{var_name}'")
 
-            if self.semantic_cube.is_decl_valid(variable.var_type, value_type):
-                self.quack_quadruple.add_quadruple("=", value, None, variable.address)
-            else:
-                raise TypeMismatchError(
-                    f"Cannot assign type '{value_type}' to variable '{var_name}' of type '{variable.var_type}'"
-                )
+        value, value_type = self.__evaluate_expression(ir.expr)
 
-        elif isinstance(ir, VarDeclNode):
-            var_type = ir.var_type
-
-            value, value_type = (None, None)
-            if ir.init_value:
-                value, value_type = self.__evaluate_expression(ir.init_value)
-                if not self.semantic_cube.is_decl_valid(var_type, value_type):
-                    raise TypeMismatchError(
-                        f"Cannot assign value of type '{value_type}' to variable of type '{var_type}'"
-                    )
-
-            for var_name in ir.names:
-                address = self.memory_manager.get_first_available_address(
-                    var_type=var_type,
-                    space=self.current_memory_space,
-                )
-                self.symbol_table.add_variable(
-                    name=var_name.name,
-                    var_type=var_type,
-                    containerName=self.current_container,
-                    isConstant=ir.isConstant,
-                    address=address,
-                )
-                self.quack_quadruple.add_quadruple("=", value, None, address)
+        if self.semantic_cube.is_decl_valid(variable.var_type, value_type):
+            self.quack_quadruple.add_quadruple("=", value, None, variable.address)
+        else:
+            raise TypeMismatchError(
+                f"Cannot assign type '{value_type}' to variable '{var_name}' of type '{variable.var_type}'"
+            )
 
-        elif isinstance(ir, BodyNode):
+    def _execute_var_decl(self, ir):
+        var_type = ir.var_type
+
+        value, value_type = (None, None)
+        if ir.init_value:
+            value, value_type = self.__evaluate_expression(ir.init_value)
+            if not self.semantic_cube.is_decl_valid(var_type, value_type):
+                raise TypeMismatchError(f"Cannot assign value of type '{value_type}' to variable of type '{var_type}'")
+
+        constant = None
+        if ir.isConstant and self.optimizer is not None:
+            constant = self.optimizer.constant(self, value)
+
+        for var_name in ir.names:
+            address = self.memory_manager.get_first_available_address(
+                var_type=var_type,
+                space=self.current_memory_space,
+            )
+            self.symbol_table.add_variable(
+                name=var_name.name,
+                var_type=var_type,
+                containerName=self.current_container,
+                isConstant=ir.isConstant,
+                address=address,
+            )
+            if constant is not None:
+                # Every read of the constant uses its value, so it is never stored
+                self.symbol_table.get_variable(var_name.name, self.current_container).constant = constant
+                continue
+            self.quack_quadruple.add_quadruple("=", value, None, address)
+
+    def _execute_body(self, ir):
+        if self.optimizer is None:
             for statement in ir.statements:
                 self.execute(statement)
+            return
+        memory = self.memory_manager.memory_spaces[self.current_memory_space]
+        for statement in ir.statements:
+            available = dict(memory.next_available)
+            self.execute(statement)
+            self.optimizer.release_temporaries(memory, available)
 
-        elif isinstance(ir, WhileNode):
-            self.quack_quadruple.add_return()
-            condition = self.__evaluate_expression(ir.condition)
+    def _execute_while(self, ir):
+        self.quack_quadruple.add_return()
+        condition = self.__evaluate_expression(ir.condition)
 
-            self.quack_quadruple.push_jump()
-            self.quack_quadruple.add_jump(type="gotoF", condition=condition[0])
+        self.quack_quadruple.push_jump()
+        self.quack_quadruple.add_jump(type="gotoF", condition=condition[0])
 
-            self.execute(ir.body)
+        self.execute(ir.body)
 
-            self.quack_quadruple.add_jump(type="goto", target=self.quack_quadruple.pop_return())
-            self.quack_quadruple.update_jump(
-                index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
-            )
+        self.quack_quadruple.add_jump(type="goto", target=self.quack_quadruple.pop_return())
+        self.quack_quadruple.update_jump(
+            index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
+        )
 
-        elif isinstance(ir, PrintNode):
-            for value in ir.values:
-                value, value_type = self.__evaluate_expression(value)
-                self.quack_quadruple.add_quadruple("print", None, None, value)
+    def _execute_print(self, ir):
+        for value in ir.values:
+            value, value_type = self.__evaluate_expression(value)
+            self.quack_quadruple.add_quadruple("print", None, None, value)
 
-        elif isinstance(ir, IfNode):
-            value, value_type = self.__evaluate_expression(ir.condition)
+    def _execute_if(self, ir):
+        value, value_type = self.__evaluate_expression(ir.condition)
 
-            self.quack_quadruple.push_jump()
-            self.quack_quadruple.add_jump(type="gotoF", condition=value)
+        self.quack_quadruple.push_jump()
+        self.quack_quadruple.add_jump(type="gotoF", condition=value)
 
-            self.execute(ir.then_body)
+        self.execute(ir.then_body)
 
-            self.quack_quadruple.update_jump(
-                index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
-            )
+        self.quack_quadruple.update_jump(
+            index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
+        )
 
-        elif isinstance(ir, IfElseNode):
-            value, value_type = self.__evaluate_expression(ir.condition)
+    def _execute_if_else(self, ir):
+        value, value_type = self.__evaluate_expression(ir.condition)
 
-            self.quack_quadruple.push_jump()
-            self.quack_quadruple.add_jump(type="gotoF", condition=value, target=None)
+        self.quack_quadruple.push_jump()
+        self.quack_quadruple.add_jump(type="gotoF", condition=value, target=None)
 
-            self.execute(ir.then_body)
+        self.execute(ir.then_body)
 
-            # Add 1 to the current index to skip the else block
-            self.quack_quadruple.update_jump(
-                index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index() + 1
-            )
+        # Add 1 to the current index to skip the else block
+        self.quack_quadruple.update_jump(
+            index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index() + 1
+        )
 
-            self.quack_quadruple.push_jump()
-            self.quack_quadruple.add_jump()
+        self.quack_quadruple.push_jump()
+        self.quack_quadruple.add_jump()
 
-            self.execute(ir.else_body)
+        self.execute(ir.else_body)
 
-            self.quack_quadruple.update_jump(
-                index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
-            )
+        self.quack_quadruple.update_jump(
+            index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
+        )
 
-        elif isinstance(ir, FunctionDeclNode):
-            func_name = ir.name.name
-            func_return_type = ir.return_type
-            func_params = ir.params.params
-            func_body = ir.body
-            func_var_decls = ir.var_decls
-
-            self.current_container = func_name
-            self.current_memory_space = "local"
-
-            old_memory = self.memory_manager.replace_memory_space(
-                "local",
-                Memory(
-                    mapping={
-                        "int": ((5000, 5999), 0),
-                        "float": ((6000, 6999), 0),
-                        "t_int": ((7000, 7999), 0),
-                        "t_float": ((8000, 8999), 0),
-                    }
-                ),
+    def _execute_function_decl(self, ir):
+        func_name = ir.name.name
+        func_return_type = ir.return_type
+        func_params = ir.params.params
+        func_body = ir.body
+        func_var_decls = ir.var_decls
+
+        self.current_container = func_name
+        self.current_memory_space = "local"
+
+        old_memory = self.memory_manager.replace_memory_space(
+            "local",
+            Memory(
+                mapping={
+                    "int": ((5000, 5999), 0),
+                    "float": ((6000, 6999), 0),
+                    "t_int": ((7000, 7999), 0),
+                    "t_float": ((8000, 8999), 0),
+                }
+            ),
+        )
+
+        self.symbol_table.add_function(name=func_name, return_type=func_return_type)
+        if func_return_type != "void":
+            self.symbol_table.get_function(func_name).return_address = self.allocate_return_slot(
+                func_name, func_return_type
             )
 
-            self.symbol_table.add_function(name=func_name, return_type=func_return_type)
+        starting_index = self.start_unit()
+        self.symbol_table.get_function(func_name).initial_position = starting_index
 
-            starting_index = self.quack_quadruple.get_current_index()
-            self.symbol_table.get_function(func_name).initial_position = starting_index
+        for param in func_params:
+            self.execute(param)
 
-            for param in func_params:
-                self.execute(param)
+        for var_decl in func_var_decls:
+            self.execute(var_decl)
 
-            for var_decl in func_var_decls:
-                self.execute(var_decl)
+        self.execute(func_body)
 
-            self.execute(func_body)
+        self.quack_quadruple.add_quadruple("endFunc", None, None, func_name)
+        self.optimize_code(starting_index)
 
-            final_index = self.quack_quadruple.get_current_index()
-            self.symbol_table.get_function(func_name).final_position = final_index - 1
+        # A return jumps to final_position, the quadruple before the endFunc
+        final_index = self.quack_quadruple.get_current_index() - 1
+        self.symbol_table.get_function(func_name).final_position = final_index - 1
 
-            self.quack_quadruple.add_quadruple("endFunc", None, None, func_name)
+        self.current_container = self.global_container_name
+        self.current_memory_space = "global"
+        self.symbol_table.get_function(func_name).clear()
 
-            self.current_container = self.global_container_name
-            self.current_memory_space = "global"
-            self.symbol_table.get_function(func_name).clear()
+        self.memory_manager.replace_memory_space("local", old_memory)
 
-            self.memory_manager.replace_memory_space("local", old_memory)
+    def _execute_param(self, ir):
+        param_name = ir.name.name
+        param_type = ir.param_type
 
-        elif isinstance(ir, ParamNode):
-            param_name = ir.name.name
-            param_type = ir.param_type
+        address = self.memory_manager.get_first_available_address(
+            var_type=param_type,
+            space=self.current_memory_space,
+        )
+        self.symbol_table.add_parameter(
+            name=param_name,
+            var_type=param_type,
+            containerName=self.current_container,
+            address=address,
+        )
 
-            address = self.memory_manager.get_first_available_address(
-                var_type=param_type,
-                space=self.current_memory_space,
-            )
-            self.symbol_table.add_parameter(
-                name=param_name,
-                var_type=param_type,
-                containerName=self.current_container,
-                address=address,
-            )
+    def _execute_func_call(self, ir):
+        self.__process_func_call(ir)
 
-        elif isinstance(ir, FuncCallNode):
-            self.__process_func_call(ir)
+    def _execute_return(self, ir):
+        return_value = self.__evaluate_expression(ir.expresion)
+        self.quack_quadruple.add_quadruple("return", self.current_container, None, return_value[0])
 
-        elif isinstance(ir, ReturnNode):
-            return_value = self.__evaluate_expression(ir.expresion)
-            self.quack_quadruple.add_quadruple("return", self.current_container, None, return_value[0])
+    def _execute_program(self, ir):
+        self.generate_globals(ir.global_decls)
 
-        elif isinstance(ir, ProgramNode):
-            for decl in ir.global_decls:
-                self.execute(decl)
+        self.quack_quadruple.push_jump()
+        self.quack_quadruple.add_jump(type="goto")
 
-            self.quack_quadruple.push_jump()
-            self.quack_quadruple.add_jump(type="goto")
+        self.generate_functions(ir.functions)
 
-            for func in ir.functions:
-                self.execute(func)
+        self.quack_quadruple.update_jump(
+            index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
+        )
 
-            self.quack_quadruple.update_jump(
-                index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
-            )
+        self.generate_main(ir.main_body)
 
-            self.execute(ir.main_body)
+        self.symbol_table.get_function(self.global_container_name).clear()
 
-            self.quack_quadruple.add_quadruple("end", None, None, None)
+    def _execute_module(self, ir):
+        self.generate_globals(ir.global_decls)
 
-            self.symbol_table.get_function(self.global_container_name).clear()
-        else:
-            raise UnknownIRTypeError(f"Unknown IR type: {type(ir)}")
+        self.quack_quadruple.push_jump()
+        self.quack_quadruple.add_jump(type="goto")
+
+        self.generate_functions(ir.functions)
+
+        # Modules have no main, their initialization falls through to the code linked after them
+        self.quack_quadruple.update_jump(
+            index=self.quack_quadruple.pop_jump(), target=self.quack_quadruple.get_current_index()
+        )
+
+        self.symbol_table.get_function(self.global_container_name).clear()
+
+    # Node type -> handler(interpreter, node). Every interpreter starts with a copy,
+    # see register_statement and register_expression.
+    STATEMENT_HANDLERS = {
+        AssignNode: _execute_assign,
+        VarDeclNode: _execute_var_decl,
+        BodyNode: _execute_body,
+        WhileNode: _execute_while,
+        PrintNode: _execute_print,
+        IfNode: _execute_if,
+        IfElseNode: _execute_if_else,
+        FunctionDeclNode: _execute_function_decl,
+        ParamNode: _execute_param,
+        FuncCallNode: _execute_func_call,
+        ReturnNode: _execute_return,
+        ProgramNode: _execute_program,
+        ModuleNode: _execute_module,
+    }
+
+    EXPRESSION_HANDLERS = {
+        IdNode: _evaluate_id,
+        FuncCallNode: _evaluate_func_call,
+        CteNumNode: _evaluate_constant,
+        CteStringNode: _evaluate_constant,
+        MultiplicativeOpNode: _evaluate_binary_op,
+        ArithmeticOpNode: _evaluate_binary_op,
+        ComparisonNode: _evaluate_binary_op,
+        LogicalAndNode: _evaluate_binary_op,
+        LogicalOrNode: _evaluate_binary_op,
+    }
@@ -0,0 +1,233 @@
+"""
+Linker for QuackScript object files.
+
+Modules and programs that import modules are compiled into relocatable objects
+(see QuackObjectFile). The linker merges a program with every module it imports,
+directly or not, into a single executable object:
+
+- Code is concatenated with the modules first, in dependency order, and the
+  program last, so the initialization of every module runs before main.
+  Jump targets and function entry points are shifted by each object's code base.
+- Global variables of each object are moved after the globals of the objects
+  linked before it, per var type.
+- Constant pools are merged, so a constant shared by several objects is stored once.
+- The return slots that a program allocated for imported functions are replaced
+  by the return address of the function in its module.
+
+Usage:
+
+    python QuackLinker.py -o program.exe.obj program.obj module.obj ...
+"""
+
+import argparse
+import sys
+from dataclasses import replace
+from typing import Callable, Dict, List
+
+from Exceptions import CircularImportError, LinkError
+from MemoryManager import DEFAULT_MAPPINGS
+from QuackObjectFile import (
+    RELOCATE_CODE,
+    RELOCATE_CONSTANT,
+    RELOCATE_GLOBAL,
+    ConstantPool,
+    FunctionEntry,
+    ObjectProgram,
+    read_object_file,
+    write_object,
+)
+
+
+def _address_type(space: str, address: int) -> str:
+    for var_type, ((start, end), _) in DEFAULT_MAPPINGS[space].items():
+        if start <= address <= end:
+            return var_type
+    raise LinkError(f"Address {address} is not in the {space} memory space.")
+
+
+class _Relocator:
+    """Relocation state of one object being linked."""
+
+    def __init__(self, code_base: int, global_bases: Dict[str, int]):
+        self.code_base = code_base
+        self.global_bases = global_bases
+        self.constants = {}
+        self.return_slots = {}
+
+    def relocate_global(self, address: int) -> int:
+        if address in self.return_slots:
+            return self.return_slots[address]
+        return address + self.global_bases.get(_address_type("global", address), 0)
+
+
+def _check_capacity(space: str, used: Dict[str, int]) -> None:
+    for var_type, amount in used.items():
+        start, end = DEFAULT_MAPPINGS[space][var_type][0]
+        if amount > end - start + 1:
+            raise LinkError(f"Linked program needs {amount} {space} {var_type} addresses, only {end - start + 1} exist.")
+
+
+def link_objects(objects: List[ObjectProgram]) -> ObjectProgram:
+    """
+    Links relocatable objects into an executable program.
+    objects must list the modules in dependency order followed by the program.
+    """
+    if not objects or objects[-1].kind != "program":
+        raise LinkError("The last object to link must be a program.")
+    if any(obj.kind != "module" for obj in objects[:-1]):
+        raise LinkError("Only one program can be linked, every other object must be a module.")
+
+    program = objects[-1]
+    relocators = []
+    functions = {}
+    global_space = {}
+    constants = {}
+    constant_addresses = {}
+    constant_space = {}
+    code_base = 0
+
+    for obj in objects:
+        relocator = _Relocator(code_base, dict(global_space))
+        relocators.append(relocator)
+        code_base += len(obj.quadruples)
+
+        for var_type, amount in obj.functions[obj.global_container_name].required_space.items():
+            global_space[var_type] = global_space.get(var_type, 0) + amount
+
+        for address, value in obj.constants_table.constants.items():
+            var_type = _address_type("constant", address)
+            key = (var_type, value)
+            if key not in constant_addresses:
+                new_address = DEFAULT_MAPPINGS["constant"][var_type][0][0] + constant_space.get(var_type, 0)
+                constant_space[var_type] = constant_space.get(var_type, 0) + 1
+                constant_addresses[key] = new_address
+                constants[new_address] = value
+            relocator.constants[address] = constant_addresses[key]
+
+        for name, function in obj.functions.items():
+            if name == obj.global_container_name:
+                continue
+            if name in functions:
+                raise LinkError(f"Function '{name}' is defined by more than one object.")
+            functions[name] = replace(
+                function,
+                initial_position=function.initial_position + relocator.code_base,
+                final_position=function.final_position + relocator.code_base,
+                return_address=(
+                    None if function.return_address is None else relocator.relocate_global(function.return_address)
+                ),
+            )
+
+    _check_capacity("global", global_space)
+    _check_capacity("constant", constant_space)
+
+    # Imports are resolved once every function has its final address
+    defined_by = {}
+    for obj in objects:
+        for name in obj.functions:
+            defined_by[name] = obj.global_container_name
+    for obj, relocator in zip(objects, relocators):
+        for entry in obj.imports.values():
+            function = functions.get(entry.name)
+            if function is None or defined_by[entry.name] != entry.module:
+                raise LinkError(f"Unresolved symbol '{entry.name}' imported from module '{entry.module}'.")
+            if function.return_type != entry.return_type or function.param_signature != entry.param_signature:
+                raise LinkError(
+                    f"Function '{entry.name}' of module '{entry.module}' does not match the signature "
+                    f"'{obj.global_container_name}' was compiled against. Recompile it."
+                )
+            if entry.return_address is not None:
+                relocator.return_slots[entry.return_address] = function.return_address
+
+    quadruples = []
+    for obj, relocator in zip(objects, relocators):
+        code = [list(quadruple) for quadruple in obj.quadruples]
+        for index, operand_field, kind in obj.relocations:
+            instruction = code[index]
+            value = instruction[operand_field]
+            if kind == RELOCATE_CODE:
+                instruction[operand_field] = value + relocator.code_base
+            elif kind == RELOCATE_GLOBAL:
+                instruction[operand_field] = relocator.relocate_global(value)
+            elif kind == RELOCATE_CONSTANT:
+                instruction[operand_field] = relocator.constants[value]
+            else:
+                raise LinkError(f"Unknown relocation kind {kind}.")
+        quadruples.extend(tuple(instruction) for instruction in code)
+
+    global_container = program.functions[program.global_container_name]
+    functions[program.global_container_name] = FunctionEntry(
+        name=program.global_container_name,
+        return_type=global_container.return_type,
+        initial_position=None,
+        final_position=None,
+        return_address=None,
+        param_signature=[],
+        required_space=global_space,
+    )
+
+    return ObjectProgram(
+        quadruples=quadruples,
+        operators=program.operators,
+        functions=functions,
+        constants_table=ConstantPool(constants=constants, required_space=constant_space),
+        global_container_name=program.global_container_name,
+        debug_info=program.debug_info,
+    )
+
+
+def link_program(program_file: str, resolve_module: Callable[[str], str], output_file: str) -> None:
+    """
+    Links a program object with the modules it imports and writes the executable object.
+    resolve_module maps a module name to the path of its object file.
+    """
+    program = read_object_file(program_file, relocatable=True)
+    if program.kind != "program":
+        raise LinkError(f"'{program_file}' is a module, only programs can be linked into an executable.")
+
+    modules = []
+    loaded = set()
+    loading = []
+
+    def load(name):
+        if name in loaded:
+            return
+        if name in loading:
+            raise CircularImportError(f"Circular import: {' -> '.join(loading + [name])}.")
+        loading.append(name)
+        module = read_object_file(resolve_module(name), relocatable=True)
+        if module.kind != "module" or module.global_container_name != name:
+            raise LinkError(f"Object for '{name}' is not the module '{name}'.")
+        for dependency in module.dependencies:
+            load(dependency)
+        loading.pop()
+        loaded.add(name)
+        modules.append(module)
+
+    for dependency in program.dependencies:
+        load(dependency)
+
+    write_object(link_objects(modules + [program]), output_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Link QuackScript object files into an executable object.")
+    parser.add_argument("-o", "--output", required=True, help="executable object to write")
+    parser.add_argument("program", help="object file of the program")
+    parser.add_argument("modules", nargs="*", help="object files of the imported modules")
+    args = parser.parse_args()
+
+    module_files = {}
+    for module_file in args.modules:
+        module_files[read_object_file(module_file, relocatable=True).global_container_name] = module_file
+
+    def resolve_module(name):
+        if name not in module_files:
+            raise LinkError(f"No object file given for module '{name}'.")
+        return module_files[name]
+
+    try:
+        link_program(args.program, resolve_module, args.output)
+    except LinkError as e:
+        print(f"Link error: {e}")
+        sys.exit(1)
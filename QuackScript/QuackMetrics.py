@@ -0,0 +1,123 @@
+"""
+Timing, memory and size metrics of a compilation.
+
+compile_program fills a CompileMetrics with one entry per phase it runs (file
+read, parser load, parse, transform, imports, codegen, optimize, serialize) and
+with counts of what it produced. Streaming compilation parses and generates
+code in a single compile phase. Memory is measured with tracemalloc: for each
+phase the peak and the net allocation while it ran. The optimizer runs on every
+unit of code as it is generated, so the optimize phase only reports its time;
+its memory is part of the phase it ran in.
+"""
+
+import dataclasses
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict
+
+
+@dataclasses.dataclass
+class PhaseMetrics:
+    seconds: float = 0.0
+    peak_bytes: int = 0
+    allocated_bytes: int = 0
+
+
+def count_ir_nodes(ir) -> int:
+    """Count the IR nodes (TransformerClasses dataclasses) reachable from ir."""
+    count = 0
+    stack = [ir]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack.extend(node)
+        elif dataclasses.is_dataclass(node):
+            count += 1
+            stack.extend(getattr(node, f.name) for f in dataclasses.fields(node))
+    return count
+
+
+class CompileMetrics:
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.phases: Dict[str, PhaseMetrics] = {}
+        self.counts: Dict[str, int] = {}
+        self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a phase of the compilation. Phases that run more than once are added up."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            metrics = self.phases.setdefault(name, PhaseMetrics())
+            metrics.seconds += time.perf_counter() - start
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                metrics.peak_bytes = max(metrics.peak_bytes, peak - before)
+                metrics.allocated_bytes += current - before
+
+    def split_phase(self, phase: str, name: str, seconds: float) -> None:
+        """Report seconds of a phase as a phase of their own, for work that runs interleaved with it."""
+        if phase in self.phases:
+            self.phases[phase].seconds -= seconds
+            self.phases.setdefault(name, PhaseMetrics()).seconds += seconds
+
+    def stop(self) -> None:
+        """Stop tracemalloc if these metrics started it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def count_result(self, ir, symbol_table, quadruples) -> None:
+        """Record the sizes of the IR, the symbol table and the generated code."""
+        temporaries = 0
+        for container in symbol_table.containers.values():
+            temporaries += sum(
+                amount for var_type, amount in container.required_space.items() if var_type.startswith("t_")
+            )
+        self.counts.update(
+            {
+                "ir_nodes": count_ir_nodes(ir),
+                "functions": sum(1 for c in symbol_table.containers.values() if c.initial_position is not None),
+                "quadruples": len(quadruples),
+                "constants": len(symbol_table.constants_table.constants),
+                "temporaries": temporaries,
+            }
+        )
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(metrics.seconds for metrics in self.phases.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "total_seconds": self.total_seconds,
+            "phases": {name: dataclasses.asdict(metrics) for name, metrics in self.phases.items()},
+            "counts": dict(self.counts),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def format_table(self) -> str:
+        lines = [f"{'Phase':<10} {'Time (ms)':>10} {'Peak (KiB)':>11} {'Alloc (KiB)':>12}"]
+        for name, metrics in self.phases.items():
+            lines.append(
+                f"{name:<10} {metrics.seconds * 1000:>10.2f} "
+                f"{metrics.peak_bytes / 1024:>11.1f} {metrics.allocated_bytes / 1024:>12.1f}"
+            )
+        lines.append(f"{'total':<10} {self.total_seconds * 1000:>10.2f}")
+        lines.append("")
+        for name, value in self.counts.items():
+            lines.append(f"{name:<14} {value:>10}")
+        return "\n".join(lines)
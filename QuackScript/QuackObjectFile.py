@@ -0,0 +1,778 @@
+"""
+Binary object file format for compiled QuackScript programs.
+
+An object file is a small header followed by a sequence of sections and a
+section directory. All integers are little-endian.
+
+Header (20 bytes)::
+
+    magic             4s   b"QOBJ"
+    version           H    FORMAT_VERSION
+    flags             H    bit 0 set for relocatable objects, which must be linked
+    section_count     I    number of entries in the section directory
+    directory_offset  Q    file offset of the section directory
+
+Section directory entry (20 bytes)::
+
+    tag     4s   section identifier
+    offset  Q    file offset of the section payload
+    size    Q    size in bytes of the section payload
+
+Sections:
+
+- ``STRS`` string pool. ``I`` count, then ``I`` length + UTF-8 bytes per string.
+- ``OPER`` operator table. ``I`` count, then ``I`` code + ``I`` string index per operator.
+- ``CODE`` instructions, split in separately addressable blocks. ``I`` total
+  instruction count and ``I`` block count, then one ``<IIQi`` entry per block: base
+  position, instruction count, offset of its records from the start of the section
+  and owner (string index of the function name, -1 for program code). Every function
+  body, from its initial position to its ``endFunc``, is a block of its own. Each
+  block holds one ``<iiii`` record (op, arg1, arg2, result) per quadruple. Operands
+  are addresses or positions (>= 0), ``-1`` for ``None`` and ``-(2 + index)`` for a
+  string from the string pool (function names).
+- ``FUNC`` function table. ``I`` count, then per function: name index ``I``, return
+  type index ``i`` (-1 for none), initial position ``i``, final position ``i``,
+  return address ``i`` (-1 for none), required space ``4I`` (int, float, t_int,
+  t_float), ``H`` parameter count and ``I`` string index per parameter type.
+- ``CNST`` constant pool. ``I`` count, then per constant: address ``I``, tag ``B``
+  (0 int, 1 float, 2 str) and the value (``q``, ``d`` or ``I`` length + UTF-8).
+- ``PROG`` program information. ``I`` string index of the global container name,
+  ``B`` kind (0 program, 1 module), then ``I`` count and ``I`` string index per
+  imported module.
+- ``SYMB`` (relocatable objects) imported functions. ``I`` count, then per function:
+  name index ``I``, module index ``I``, return type index ``i`` (-1 for none), return
+  slot ``i`` (the global address this object reads the return value from, -1 for
+  none), ``H`` parameter count and ``I`` string index per parameter type.
+- ``RELO`` (relocatable objects) relocation table. ``I`` count, then one ``<IBB``
+  entry (instruction position, operand field 1-3, kind) per operand that changes
+  when the object is linked. Kinds are 0 for code positions, 1 for global addresses
+  and 2 for constant addresses. Function entry points, return addresses and the
+  constant pool are relocated through their own tables.
+- ``DBUG`` (optional) debug information. ``I`` count, then key/value string index pairs.
+
+Reading an object file never unpickles Python objects: the file is memory-mapped
+and every section is decoded with ``struct``. When read lazily, only program code
+is decoded up front and each function block is decoded on its first call.
+
+Modules and programs that import modules are written as relocatable objects;
+QuackLinker merges them into a single executable object.
+ObjectFileWriter writes the same layout for compilers that append the code as
+they generate it.
+"""
+
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from Exceptions import InvalidObjectFileError
+from MemoryManager import DEFAULT_MAPPINGS
+
+MAGIC = b"QOBJ"
+FORMAT_VERSION = 3
+FLAG_RELOCATABLE = 1
+
+HEADER = struct.Struct("<4sHHIQ")
+DIRECTORY_ENTRY = struct.Struct("<4sQQ")
+INSTRUCTION = struct.Struct("<iiii")
+CODE_HEADER = struct.Struct("<II")
+CODE_BLOCK = struct.Struct("<IIQi")
+COUNT = struct.Struct("<I")
+FUNCTION_ENTRY = struct.Struct("<IiiiiIIIIH")
+IMPORT_ENTRY = struct.Struct("<IIiiH")
+RELOCATION_ENTRY = struct.Struct("<IBB")
+PROGRAM_INFO = struct.Struct("<IB")
+CONSTANT_ENTRY = struct.Struct("<IB")
+PAIR = struct.Struct("<II")
+INT_VALUE = struct.Struct("<q")
+FLOAT_VALUE = struct.Struct("<d")
+
+NONE_OPERAND = -1
+SPACE_TYPES = ("int", "float", "t_int", "t_float")
+CONSTANT_TAGS = {"int": 0, "float": 1, "str": 2}
+PROGRAM_KINDS = ("program", "module")
+
+RELOCATE_CODE = 0
+RELOCATE_GLOBAL = 1
+RELOCATE_CONSTANT = 2
+GLOBAL_RANGE = (DEFAULT_MAPPINGS["global"]["int"][0][0], DEFAULT_MAPPINGS["global"]["t_float"][0][1])
+CONSTANT_RANGE = (DEFAULT_MAPPINGS["constant"]["int"][0][0], DEFAULT_MAPPINGS["constant"]["str"][0][1])
+
+
+@dataclass
+class FunctionEntry:
+    name: str
+    return_type: Optional[str]
+    initial_position: Optional[int]
+    final_position: Optional[int]
+    return_address: Optional[int]
+    param_signature: List[str]
+    required_space: Dict[str, int]
+
+
+@dataclass
+class ImportEntry:
+    name: str
+    module: str
+    return_type: Optional[str]
+    param_signature: List[str]
+    return_address: Optional[int]
+
+
+@dataclass
+class ConstantPool:
+    constants: Dict[int, Union[int, float, str]]
+    required_space: Dict[str, int]
+
+
+@dataclass
+class ObjectProgram:
+    quadruples: List[Optional[tuple]]
+    operators: Dict[str, int]
+    functions: Dict[str, FunctionEntry]
+    constants_table: ConstantPool
+    global_container_name: str
+    debug_info: Dict[str, str] = field(default_factory=dict)
+    kind: str = "program"
+    dependencies: List[str] = field(default_factory=list)
+    imports: Dict[str, ImportEntry] = field(default_factory=dict)
+    relocations: List[Tuple[int, int, int]] = field(default_factory=list)
+    # Function name -> (base, count, offset) of the code blocks not decoded yet
+    pending_functions: Dict[str, List[Tuple[int, int, int]]] = field(default_factory=dict)
+    buffer: Optional[mmap.mmap] = None
+    decode_operand: Optional[Callable] = None
+
+    @property
+    def is_relocatable(self) -> bool:
+        """Modules and programs that import modules have to be linked before they can run."""
+        return self.kind == "module" or bool(self.dependencies)
+
+    def load_function(self, name: str) -> None:
+        """Decode the code blocks of a function into their positions in quadruples."""
+        for base, count, offset in self.pending_functions.pop(name, ()):
+            self.quadruples[base : base + count] = _decode_instructions(
+                self.buffer, offset, count, self.decode_operand
+            )
+
+    def load_all(self) -> None:
+        """Decode every function that is still pending."""
+        for name in list(self.pending_functions):
+            self.load_function(name)
+
+    def close(self) -> None:
+        """Release the memory-mapped file. Pending functions can no longer be loaded."""
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+
+class StringPool:
+    def __init__(self):
+        self.strings = []
+        self.indexes = {}
+
+    def add(self, value: str) -> int:
+        """Intern a string and return its index in the pool."""
+        index = self.indexes.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self.indexes[value] = index
+        return index
+
+    def encode(self) -> bytes:
+        """Serialize the pool as a STRS section payload."""
+        parts = [COUNT.pack(len(self.strings))]
+        for value in self.strings:
+            encoded = value.encode("utf-8")
+            parts.append(COUNT.pack(len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+
+def _encode_operand(value, strings: StringPool) -> int:
+    if value is None:
+        return NONE_OPERAND
+    if isinstance(value, str):
+        return -(2 + strings.add(value))
+    return value
+
+
+def _encode_optional(value: Optional[int]) -> int:
+    return -1 if value is None else value
+
+
+def _code_blocks(total: int, functions) -> List[Tuple[int, int, Optional[str]]]:
+    """Split the program in blocks: one per function body and the program code between them."""
+    functions = sorted(
+        (function.initial_position, function.final_position + 2, name)
+        for name, function in functions.items()
+        if function.initial_position is not None
+    )
+    blocks = []
+    position = 0
+    for start, end, name in functions:
+        if position < start:
+            blocks.append((position, start, None))
+        blocks.append((start, end, name))
+        position = end
+    if position < total:
+        blocks.append((position, total, None))
+    return blocks
+
+
+def _encode_code_table(total: int, functions, strings: StringPool) -> bytes:
+    """Encode the CODE header and block table. The records of the blocks follow it in order."""
+    blocks = _code_blocks(total, functions)
+    table = [CODE_HEADER.pack(total, len(blocks))]
+    offset = CODE_HEADER.size + CODE_BLOCK.size * len(blocks)
+    for start, end, owner in blocks:
+        owner_index = -1 if owner is None else strings.add(owner)
+        table.append(CODE_BLOCK.pack(start, end - start, offset, owner_index))
+        offset += (end - start) * INSTRUCTION.size
+    return b"".join(table)
+
+
+def _encode_instructions(quadruples, strings: StringPool) -> bytes:
+    pack = INSTRUCTION.pack
+    return b"".join(
+        pack(
+            op,
+            _encode_operand(arg1, strings),
+            _encode_operand(arg2, strings),
+            _encode_operand(result, strings),
+        )
+        for op, arg1, arg2, result in quadruples
+    )
+
+
+def _encode_code(quadruples, functions, strings: StringPool) -> bytes:
+    # Blocks cover the program in order, so their records are the instructions in order
+    return _encode_code_table(len(quadruples), functions, strings) + _encode_instructions(quadruples, strings)
+
+
+def _encode_operators(operators: Dict[str, int], strings: StringPool) -> bytes:
+    parts = [COUNT.pack(len(operators))]
+    for name, code in operators.items():
+        parts.append(PAIR.pack(code, strings.add(name)))
+    return b"".join(parts)
+
+
+def _encode_functions(functions, strings: StringPool) -> bytes:
+    parts = [COUNT.pack(len(functions))]
+    for name, container in functions.items():
+        return_type = -1 if container.return_type is None else strings.add(container.return_type)
+        parts.append(
+            FUNCTION_ENTRY.pack(
+                strings.add(name),
+                return_type,
+                _encode_optional(container.initial_position),
+                _encode_optional(container.final_position),
+                _encode_optional(container.return_address),
+                *(container.required_space.get(space_type, 0) for space_type in SPACE_TYPES),
+                len(container.param_signature),
+            )
+        )
+        for param_type in container.param_signature:
+            parts.append(COUNT.pack(strings.add(param_type)))
+    return b"".join(parts)
+
+
+def _encode_constants(constants: Dict[int, Union[int, float, str]]) -> bytes:
+    parts = [COUNT.pack(len(constants))]
+    for address, value in constants.items():
+        tag = CONSTANT_TAGS[type(value).__name__]
+        parts.append(CONSTANT_ENTRY.pack(address, tag))
+        if tag == 0:
+            parts.append(INT_VALUE.pack(value))
+        elif tag == 1:
+            parts.append(FLOAT_VALUE.pack(value))
+        else:
+            encoded = value.encode("utf-8")
+            parts.append(COUNT.pack(len(encoded)))
+            parts.append(encoded)
+    return b"".join(parts)
+
+
+def _encode_debug(debug_info: Dict[str, str], strings: StringPool) -> bytes:
+    parts = [COUNT.pack(len(debug_info))]
+    for key, value in debug_info.items():
+        parts.append(PAIR.pack(strings.add(key), strings.add(str(value))))
+    return b"".join(parts)
+
+
+def _encode_program_info(program: ObjectProgram, strings: StringPool) -> bytes:
+    parts = [
+        PROGRAM_INFO.pack(strings.add(program.global_container_name), PROGRAM_KINDS.index(program.kind)),
+        COUNT.pack(len(program.dependencies)),
+    ]
+    for module in program.dependencies:
+        parts.append(COUNT.pack(strings.add(module)))
+    return b"".join(parts)
+
+
+def _encode_imports(imports: Dict[str, ImportEntry], strings: StringPool) -> bytes:
+    parts = [COUNT.pack(len(imports))]
+    for entry in imports.values():
+        parts.append(
+            IMPORT_ENTRY.pack(
+                strings.add(entry.name),
+                strings.add(entry.module),
+                -1 if entry.return_type is None else strings.add(entry.return_type),
+                _encode_optional(entry.return_address),
+                len(entry.param_signature),
+            )
+        )
+        for param_type in entry.param_signature:
+            parts.append(COUNT.pack(strings.add(param_type)))
+    return b"".join(parts)
+
+
+def _encode_relocations(relocations) -> bytes:
+    pack = RELOCATION_ENTRY.pack
+    return COUNT.pack(len(relocations)) + b"".join(pack(*relocation) for relocation in relocations)
+
+
+def compute_relocations(quadruples, operators: Dict[str, int]) -> List[Tuple[int, int, int]]:
+    """
+    List the operands that change when the code is linked: jump targets, and
+    addresses in the global and constant memory spaces. Local addresses and
+    function names stay as they are.
+    """
+    jump_ops = {operators["goto"], operators["gotoF"], operators["gotoT"]}
+    global_start, global_end = GLOBAL_RANGE
+    constant_start, constant_end = CONSTANT_RANGE
+
+    relocations = []
+    for index, (op, *operands) in enumerate(quadruples):
+        for operand_field, value in enumerate(operands, start=1):
+            if not isinstance(value, int):
+                continue
+            if operand_field == 3 and op in jump_ops:
+                relocations.append((index, operand_field, RELOCATE_CODE))
+            elif global_start <= value <= global_end:
+                relocations.append((index, operand_field, RELOCATE_GLOBAL))
+            elif constant_start <= value <= constant_end:
+                relocations.append((index, operand_field, RELOCATE_CONSTANT))
+    return relocations
+
+
+def _write_sections(output_file: str, sections, flags: int) -> None:
+    """
+    Write the header, the sections and the section directory. A section payload
+    is bytes, or a tuple of bytes and binary files whose whole content is copied.
+    """
+    with open(output_file, "wb") as f:
+        f.write(bytes(HEADER.size))
+        directory = []
+        for tag, payload in sections:
+            offset = f.tell()
+            for part in payload if isinstance(payload, tuple) else (payload,):
+                if isinstance(part, bytes):
+                    f.write(part)
+                else:
+                    part.seek(0)
+                    shutil.copyfileobj(part, f)
+            directory.append(DIRECTORY_ENTRY.pack(tag, offset, f.tell() - offset))
+        directory_offset = f.tell()
+        f.write(b"".join(directory))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(directory), directory_offset))
+
+
+def _write_program(program: ObjectProgram, output_file: str, strings: StringPool, operators, code, relocations) -> None:
+    sections = [
+        (b"OPER", operators),
+        (b"CODE", code),
+        (b"FUNC", _encode_functions(program.functions, strings)),
+        (b"CNST", _encode_constants(program.constants_table.constants)),
+        (b"PROG", _encode_program_info(program, strings)),
+    ]
+    flags = 0
+    if program.is_relocatable:
+        flags |= FLAG_RELOCATABLE
+        sections.append((b"SYMB", _encode_imports(program.imports, strings)))
+        sections.append((b"RELO", relocations))
+    if program.debug_info:
+        sections.append((b"DBUG", _encode_debug(program.debug_info, strings)))
+    # The string pool is filled while encoding the other sections, so it goes last
+    sections.append((b"STRS", strings.encode()))
+    _write_sections(output_file, sections, flags)
+
+
+def write_object(program: ObjectProgram, output_file: str) -> None:
+    """
+    Writes an ObjectProgram as a binary object file.
+    Relocatable programs also get their import and relocation tables.
+    """
+    strings = StringPool()
+    operators = _encode_operators(program.operators, strings)
+    code = _encode_code(program.quadruples, program.functions, strings)
+    relocations = None
+    if program.is_relocatable:
+        relocations = _encode_relocations(
+            program.relocations or compute_relocations(program.quadruples, program.operators)
+        )
+    _write_program(program, output_file, strings, operators, code, relocations)
+
+
+def _object_program(quadruples, operators, symbol_table, debug_info, kind, dependencies) -> ObjectProgram:
+    functions = {}
+    imports = {}
+    for name, container in symbol_table.containers.items():
+        if container.module is None:
+            functions[name] = container
+        else:
+            imports[name] = ImportEntry(
+                name=name,
+                module=container.module,
+                return_type=container.return_type,
+                param_signature=container.param_signature,
+                return_address=container.return_address,
+            )
+
+    constants = symbol_table.constants_table.constants
+    return ObjectProgram(
+        quadruples=quadruples,
+        operators=operators,
+        functions=functions,
+        constants_table=ConstantPool(
+            constants={address: constant.value for address, constant in constants.items()},
+            required_space=symbol_table.constants_table.required_space,
+        ),
+        global_container_name=symbol_table.global_container_name,
+        debug_info=debug_info or {},
+        kind=kind,
+        dependencies=list(dependencies),
+        imports=imports,
+    )
+
+
+def write_object_file(
+    quadruples,
+    symbol_table,
+    output_file: str,
+    debug_info: Dict[str, str] = None,
+    kind: str = "program",
+    dependencies: List[str] = (),
+) -> None:
+    """
+    Writes the quadruples and symbol table of a compiled program or module as a binary object file.
+    Functions imported from other modules go to the import table instead of the function table.
+    """
+    operators = quadruples.operators.operators
+    program = _object_program([], operators, symbol_table, debug_info, kind, dependencies)
+
+    # The string operands of the store go first in the pool, so the columns are written as they are
+    strings = StringPool()
+    for value in quadruples.strings:
+        strings.add(value)
+    operator_table = _encode_operators(operators, strings)
+    code = _encode_code_table(len(quadruples), program.functions, strings) + quadruples.to_bytes()
+    relocations = None
+    if program.is_relocatable:
+        relocations = _encode_relocations(compute_relocations(quadruples, operators))
+    _write_program(program, output_file, strings, operator_table, code, relocations)
+
+
+class ObjectFileWriter:
+    """
+    Writes an object file whose code is appended as it is generated, so the
+    compiler does not have to keep the whole program in memory. Instructions and
+    their relocations are spilled to temporary files and copied into the object
+    file by finish, which writes the same layout as write_object_file.
+    """
+
+    def __init__(self, operators: Dict[str, int]):
+        self.operators = operators
+        self.strings = StringPool()
+        self.operator_table = _encode_operators(operators, self.strings)
+        self.code = tempfile.TemporaryFile()
+        self.relocations = tempfile.TemporaryFile()
+        self.instruction_count = 0
+        self.relocation_count = 0
+
+    def append(self, quadruples) -> None:
+        """Append quadruples, with their operators already encoded, at the end of the code."""
+        self.code.write(_encode_instructions(quadruples, self.strings))
+        relocations = compute_relocations(quadruples, self.operators)
+        self.relocations.write(
+            b"".join(
+                RELOCATION_ENTRY.pack(self.instruction_count + index, operand_field, kind)
+                for index, operand_field, kind in relocations
+            )
+        )
+        self.relocation_count += len(relocations)
+        self.instruction_count += len(quadruples)
+
+    def set_jump_target(self, position: int, target: int) -> None:
+        """Set the target of a jump that was appended before its target was known."""
+        self.code.seek(position * INSTRUCTION.size)
+        op, arg1, arg2, _ = INSTRUCTION.unpack(self.code.read(INSTRUCTION.size))
+        self.code.seek(position * INSTRUCTION.size)
+        self.code.write(INSTRUCTION.pack(op, arg1, arg2, target))
+        self.code.seek(0, os.SEEK_END)
+        self.relocations.write(RELOCATION_ENTRY.pack(position, 3, RELOCATE_CODE))
+        self.relocation_count += 1
+
+    def finish(
+        self,
+        symbol_table,
+        output_file: str,
+        kind: str = "program",
+        dependencies: List[str] = (),
+    ) -> None:
+        """Write the object file with the code appended so far and the symbol table of the program."""
+        program = _object_program([], self.operators, symbol_table, None, kind, dependencies)
+        code = (_encode_code_table(self.instruction_count, program.functions, self.strings), self.code)
+        relocations = (COUNT.pack(self.relocation_count), self.relocations)
+        _write_program(program, output_file, self.strings, self.operator_table, code, relocations)
+
+    def close(self) -> None:
+        """Remove the temporary files."""
+        self.code.close()
+        self.relocations.close()
+
+
+class _SectionReader:
+    def __init__(self, buffer, offset: int, size: int):
+        self.buffer = buffer
+        self.offset = offset
+        self.end = offset + size
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        if self.offset + fmt.size > self.end:
+            raise InvalidObjectFileError("Section is truncated.")
+        values = fmt.unpack_from(self.buffer, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def count(self) -> int:
+        return self.unpack(COUNT)[0]
+
+    def raw(self, size: int) -> bytes:
+        if self.offset + size > self.end:
+            raise InvalidObjectFileError("Section is truncated.")
+        data = self.buffer[self.offset : self.offset + size]
+        self.offset += size
+        return data
+
+
+def _read_header(buffer) -> tuple:
+    if len(buffer) < HEADER.size:
+        raise InvalidObjectFileError("File is too small to be a QuackScript object file.")
+    magic, version, flags, section_count, directory_offset = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise InvalidObjectFileError("File is not a QuackScript object file.")
+    if version != FORMAT_VERSION:
+        raise InvalidObjectFileError(
+            f"Unsupported object file version {version} (expected {FORMAT_VERSION}). Recompile the program."
+        )
+    return flags, section_count, directory_offset
+
+
+def _read_directory(buffer) -> Dict[bytes, _SectionReader]:
+    _, section_count, directory_offset = _read_header(buffer)
+    if directory_offset + section_count * DIRECTORY_ENTRY.size > len(buffer):
+        raise InvalidObjectFileError("Section directory is truncated.")
+
+    sections = {}
+    for i in range(section_count):
+        tag, offset, size = DIRECTORY_ENTRY.unpack_from(buffer, directory_offset + i * DIRECTORY_ENTRY.size)
+        if offset + size > len(buffer):
+            raise InvalidObjectFileError(f"Section {tag!r} is truncated.")
+        sections[tag] = _SectionReader(buffer, offset, size)
+    return sections
+
+
+def _require(sections, tag: bytes) -> _SectionReader:
+    if tag not in sections:
+        raise InvalidObjectFileError(f"Missing required section {tag.decode()}.")
+    return sections[tag]
+
+
+def _decode_strings(section: _SectionReader) -> List[str]:
+    strings = []
+    for _ in range(section.count()):
+        length = section.count()
+        strings.append(section.raw(length).decode("utf-8"))
+    return strings
+
+
+def _decode_instructions(buffer, offset: int, count: int, decode: Callable) -> List[tuple]:
+    with memoryview(buffer)[offset : offset + count * INSTRUCTION.size] as data:
+        return [
+            (op, decode(arg1, arg1), decode(arg2, arg2), decode(result, result))
+            for op, arg1, arg2, result in INSTRUCTION.iter_unpack(data)
+        ]
+
+
+def _decode_code(section: _SectionReader, strings: List[str], lazy: bool):
+    """
+    Decode the program code blocks. Function blocks are decoded too unless lazy,
+    in which case they are returned as pending and their positions are left as None.
+    """
+    start = section.offset
+    total, block_count = section.unpack(CODE_HEADER)
+
+    # Negative operands map back to None or to a string from the pool, everything else is kept as is
+    special = {NONE_OPERAND: None}
+    for index, value in enumerate(strings):
+        special[-(2 + index)] = value
+    decode = special.get
+
+    quadruples = [None] * total
+    pending = {}
+    for _ in range(block_count):
+        base, count, offset, owner = section.unpack(CODE_BLOCK)
+        offset += start
+        if base + count > total or offset + count * INSTRUCTION.size > section.end:
+            raise InvalidObjectFileError("Code block is truncated.")
+        if lazy and owner != -1:
+            pending.setdefault(strings[owner], []).append((base, count, offset))
+        else:
+            quadruples[base : base + count] = _decode_instructions(section.buffer, offset, count, decode)
+    return quadruples, pending, decode
+
+
+def _decode_optional(value: int) -> Optional[int]:
+    return None if value == -1 else value
+
+
+def _decode_functions(section: _SectionReader, strings: List[str]) -> Dict[str, FunctionEntry]:
+    functions = {}
+    for _ in range(section.count()):
+        name, return_type, initial, final, return_address, *space, param_count = section.unpack(FUNCTION_ENTRY)
+        params = [strings[section.count()] for _ in range(param_count)]
+        functions[strings[name]] = FunctionEntry(
+            name=strings[name],
+            return_type=None if return_type == -1 else strings[return_type],
+            initial_position=_decode_optional(initial),
+            final_position=_decode_optional(final),
+            return_address=_decode_optional(return_address),
+            param_signature=params,
+            required_space=dict(zip(SPACE_TYPES, space)),
+        )
+    return functions
+
+
+def _decode_constants(section: _SectionReader) -> ConstantPool:
+    constants = {}
+    required_space = {var_type: 0 for var_type in CONSTANT_TAGS}
+    for _ in range(section.count()):
+        address, tag = section.unpack(CONSTANT_ENTRY)
+        if tag == 0:
+            value = section.unpack(INT_VALUE)[0]
+        elif tag == 1:
+            value = section.unpack(FLOAT_VALUE)[0]
+        elif tag == 2:
+            value = section.raw(section.count()).decode("utf-8")
+        else:
+            raise InvalidObjectFileError(f"Unknown constant tag {tag}.")
+        constants[address] = value
+        required_space[("int", "float", "str")[tag]] += 1
+    return ConstantPool(constants=constants, required_space=required_space)
+
+
+def _decode_imports(section: _SectionReader, strings: List[str]) -> Dict[str, ImportEntry]:
+    imports = {}
+    for _ in range(section.count()):
+        name, module, return_type, return_address, param_count = section.unpack(IMPORT_ENTRY)
+        params = [strings[section.count()] for _ in range(param_count)]
+        imports[strings[name]] = ImportEntry(
+            name=strings[name],
+            module=strings[module],
+            return_type=None if return_type == -1 else strings[return_type],
+            param_signature=params,
+            return_address=_decode_optional(return_address),
+        )
+    return imports
+
+
+def _decode_relocations(section: _SectionReader) -> List[Tuple[int, int, int]]:
+    count = section.count()
+    data = section.raw(count * RELOCATION_ENTRY.size)
+    return list(RELOCATION_ENTRY.iter_unpack(data))
+
+
+def _decode_debug(section: _SectionReader, strings: List[str]) -> Dict[str, str]:
+    debug_info = {}
+    for _ in range(section.count()):
+        key, value = section.unpack(PAIR)
+        debug_info[strings[key]] = strings[value]
+    return debug_info
+
+
+def decode_object(buffer, lazy: bool = False, relocatable: bool = False) -> ObjectProgram:
+    """
+    Decodes an object file held in a bytes-like buffer.
+    If lazy, function bodies are left pending and the buffer must stay open
+    until they are loaded. Relocatable objects are only accepted when relocatable
+    is True, since they cannot run before being linked.
+    """
+    flags = _read_header(buffer)[0]
+    if flags & FLAG_RELOCATABLE and not relocatable:
+        raise InvalidObjectFileError("Object is relocatable and must be linked with QuackLinker before running it.")
+
+    sections = _read_directory(buffer)
+    strings = _decode_strings(_require(sections, b"STRS"))
+
+    operators = {}
+    operator_section = _require(sections, b"OPER")
+    for _ in range(operator_section.count()):
+        code, name = operator_section.unpack(PAIR)
+        operators[strings[name]] = code
+
+    quadruples, pending, decode = _decode_code(_require(sections, b"CODE"), strings, lazy)
+
+    program_info = _require(sections, b"PROG")
+    global_container_name, kind = program_info.unpack(PROGRAM_INFO)
+    dependencies = [strings[program_info.count()] for _ in range(program_info.count())]
+
+    return ObjectProgram(
+        quadruples=quadruples,
+        operators=operators,
+        functions=_decode_functions(_require(sections, b"FUNC"), strings),
+        constants_table=_decode_constants(_require(sections, b"CNST")),
+        global_container_name=strings[global_container_name],
+        debug_info=_decode_debug(sections[b"DBUG"], strings) if b"DBUG" in sections else {},
+        kind=PROGRAM_KINDS[kind],
+        dependencies=dependencies,
+        imports=_decode_imports(sections[b"SYMB"], strings) if b"SYMB" in sections else {},
+        relocations=_decode_relocations(sections[b"RELO"]) if b"RELO" in sections else [],
+        pending_functions=pending,
+        buffer=buffer if pending else None,
+        decode_operand=decode,
+    )
+
+
+def read_object_file(file_name: str, lazy: bool = False, relocatable: bool = False) -> ObjectProgram:
+    """
+    Memory-maps an object file and decodes it into an ObjectProgram.
+    If lazy, each function is decoded on demand through ObjectProgram.load_function
+    and the file stays mapped until ObjectProgram.close is called.
+    Relocatable objects are rejected unless relocatable is True.
+    """
+    with open(file_name, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise InvalidObjectFileError(f"Object file {file_name} is empty.")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        program = decode_object(buffer, lazy=lazy, relocatable=relocatable)
+    except Exception:
+        buffer.close()
+        raise
+    if program.buffer is None:
+        buffer.close()
+    return program
+
+
+def is_relocatable(file_name: str) -> bool:
+    """Check the header of an object file to see whether it has to be linked before running it."""
+    with open(file_name, "rb") as f:
+        flags = _read_header(f.read(HEADER.size))[0]
+    return bool(flags & FLAG_RELOCATABLE)
@@ -0,0 +1,1641 @@
+"""
+Optimizer for the quadruples generated by QuackInterpreter.
+
+The code generator hands every unit of code to the optimizer as soon as the
+unit is generated: the initialization of the globals, each function up to its
+endFunc and the main body up to its end. The unit is split in basic blocks, the
+passes of the optimization level rewrite the blocks, and the blocks are laid
+out again with their jump targets recomputed. Units are optimized on their own,
+so sequential, per-function (ParallelCodegen) and streaming (StreamingCodegen)
+code generation produce the same code.
+
+The passes rely on what the code generator guarantees about addresses:
+temporaries are only read in the unit that writes them, locals belong to the
+running call, constants never change, and a call (gosub) can read and write
+every global variable, return slots included, but nothing else of its caller.
+
+Optimization levels:
+
+0. No optimization.
+1. The default. Operators on constants are folded while the code is generated,
+   and `const` declarations whose value is a constant are replaced by it.
+   simplify_control_flow threads jumps to jumps and rotates loops so they test
+   their condition at the bottom, then fold_constants propagates the values
+   known to be constant through the unit. eliminate_common_subexpressions
+   reuses the values of operations that were already computed,
+   propagate_copies makes the code read the values where they were first
+   stored instead of through copies, and eliminate_dead_code then removes the
+   blocks that can no longer run and the stores whose value is never read.
+   hoist_loop_invariants moves the operations whose operands a loop does not
+   change out of it, reduce_strength turns multiplications by a loop counter
+   into additions, unroll_loops runs several copies of the body of small
+   counted loops per test, and simplify_control_flow runs again to merge the
+   blocks left in a straight line. Last, allocate_temporaries packs the temporaries
+   of the unit in as few addresses as it can, and the optimizer sizes the
+   temporaries of the container to what its units use. The constants the
+   unit interned, folded values included, that it no longer reads are given
+   back to the constant memory.
+"""
+
+import math
+import operator
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from MemoryManager import DEFAULT_MAPPINGS
+from QuackQuadruple import OperatorsInterface
+from SymbolTable import Constant
+
+DEFAULT_OPTIMIZATION_LEVEL = 1
+# Copies of the body of a counted loop that unroll_loops runs per jump back, 1 to not unroll
+DEFAULT_UNROLL_FACTOR = 4
+
+OPERATORS = OperatorsInterface().operators
+GOTO = OPERATORS["goto"]
+GOTO_F = OPERATORS["gotoF"]
+GOTO_T = OPERATORS["gotoT"]
+ASSIGN = OPERATORS["="]
+PRINT = OPERATORS["print"]
+ERA = OPERATORS["era"]
+PARAM = OPERATORS["param"]
+GOSUB = OPERATORS["gosub"]
+RETURN = OPERATORS["return"]
+END_FUNC = OPERATORS["endFunc"]
+END = OPERATORS["end"]
+
+JUMPS = {GOTO, GOTO_F, GOTO_T}
+# The conditional jump taken when the other one falls through
+INVERTED = {GOTO_F: GOTO_T, GOTO_T: GOTO_F}
+# Operators that end a basic block
+BRANCHES = JUMPS | {RETURN, END_FUNC, END}
+
+# The operations of the virtual machine, see QuackVirtualMachine.process_quadruples
+OPERATIONS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "<": lambda left, right: int(left < right),
+    "<=": lambda left, right: int(left <= right),
+    ">": lambda left, right: int(left > right),
+    ">=": lambda left, right: int(left >= right),
+    "==": lambda left, right: int(left == right),
+    "!=": lambda left, right: int(left != right),
+    "and": lambda left, right: int(left and right),
+    "or": lambda left, right: int(left or right),
+}
+OPERATOR_NAMES = {OPERATORS[name]: name for name in OPERATIONS}
+
+# Int constants are stored as 64-bit integers in object files
+INT_MIN = -(1 << 63)
+INT_MAX = (1 << 63) - 1
+
+GLOBALS_START = DEFAULT_MAPPINGS["global"]["int"][0][0]
+GLOBALS_END = DEFAULT_MAPPINGS["global"]["float"][0][1]
+TEMPORARIES_END = DEFAULT_MAPPINGS["global"]["t_float"][0][1]
+LOCALS_START = DEFAULT_MAPPINGS["local"]["int"][0][0]
+LOCALS_END = DEFAULT_MAPPINGS["local"]["t_float"][0][1]
+# (first, last) address of the int variables and temporaries
+INT_RANGES = [DEFAULT_MAPPINGS[space][var_type][0] for space in ("global", "local") for var_type in ("int", "t_int")]
+# (first, last) address of the temporaries of each type, globals first
+TEMPORARY_RANGES = [DEFAULT_MAPPINGS[space][var_type][0] for space in ("global", "local") for var_type in ("t_int", "t_float")]
+CONSTANTS_START = DEFAULT_MAPPINGS["constant"]["int"][0][0]
+CONSTANTS_END = DEFAULT_MAPPINGS["constant"]["str"][0][1]
+
+# A constant value as the constants table keys it, (type, value), so 1 and 1.0 are different
+ConstantKey = Tuple[str, object]
+
+
+def is_global(address) -> bool:
+    """Global variables and return slots, which any call can read and write."""
+    return type(address) is int and GLOBALS_START <= address <= GLOBALS_END
+
+
+def is_constant(address) -> bool:
+    return type(address) is int and CONSTANTS_START <= address <= CONSTANTS_END
+
+
+def is_private(address) -> bool:
+    """Temporaries and locals, which only the running unit reads."""
+    return type(address) is int and GLOBALS_END < address < CONSTANTS_START
+
+
+def is_local(address) -> bool:
+    return type(address) is int and LOCALS_START <= address <= LOCALS_END
+
+
+def temporary_range(address) -> Optional[Tuple[int, int]]:
+    """The range of temporaries address is in, None if it is not a temporary."""
+    if type(address) is int:
+        for first, last in TEMPORARY_RANGES:
+            if first <= address <= last:
+                return first, last
+    return None
+
+
+def fold_operation(op: str, left, right):
+    """
+    Compute an operator on two constant values like the virtual machine does.
+    Returns None if the result cannot be a constant: division by zero stops
+    the program at run time, and int constants are 64-bit.
+    """
+    if op == "/" and right == 0:
+        return None
+    value = OPERATIONS[op](left, right)
+    if isinstance(value, float):
+        # -0.0 would be interned as 0.0
+        if not math.isfinite(value) or (value == 0 and math.copysign(1.0, value) < 0):
+            return None
+    elif not INT_MIN <= value <= INT_MAX:
+        return None
+    return value
+
+
+class Block:
+    """
+    A basic block: straight-line quadruples, as [op, arg1, arg2, result] lists,
+    and at most one quadruple at the end that transfers control.
+    """
+
+    __slots__ = ("code", "branch", "target", "next")
+
+    def __init__(self):
+        self.code = []
+        # goto, gotoF, gotoT, return, endFunc or end
+        self.branch = None
+        # Block the branch jumps to. A return jumps to the block of the endFunc.
+        self.target = None
+        # Block that runs after this one when it does not jump, None if it always does
+        self.next = None
+
+    def successors(self) -> List["Block"]:
+        successors = []
+        if self.next is not None:
+            successors.append(self.next)
+        if self.target is not None and self.target is not self.next:
+            successors.append(self.target)
+        return successors
+
+
+def build_blocks(quadruples: List[Tuple], start: int) -> Optional[List[Block]]:
+    """
+    Split the quadruples of a unit that starts at position start in basic
+    blocks, in layout order. Returns None if the unit jumps out of itself.
+    """
+    count = len(quadruples)
+    ends_function = count > 0 and quadruples[-1][0] == END_FUNC
+    leaders = {0}
+    if ends_function:
+        leaders.add(count - 1)
+    for index, (op, _, _, result) in enumerate(quadruples):
+        if op in JUMPS:
+            if not start <= result < start + count:
+                return None
+            leaders.add(result - start)
+        elif op == RETURN and not ends_function:
+            return None
+        if op in BRANCHES:
+            leaders.add(index + 1)
+    leaders.discard(count)
+
+    indexes = sorted(leaders)
+    blocks = {index: Block() for index in indexes}
+    exit_block = blocks[count - 1] if ends_function else None
+    for position, index in enumerate(indexes):
+        block = blocks[index]
+        following = blocks[indexes[position + 1]] if position + 1 < len(indexes) else None
+        end = indexes[position + 1] if following is not None else count
+        block.code = [list(quadruple) for quadruple in quadruples[index:end]]
+        if block.code and block.code[-1][0] in BRANCHES:
+            block.branch = block.code.pop()
+            op = block.branch[0]
+            if op in JUMPS:
+                block.target = blocks[block.branch[3] - start]
+            elif op == RETURN:
+                block.target = exit_block
+            if op in (GOTO_F, GOTO_T):
+                block.next = following
+        else:
+            block.next = following
+    return [blocks[index] for index in indexes]
+
+
+def layout(blocks: List[Block], start: int) -> List[Tuple]:
+    """
+    Lay the blocks out in order from position start. Jumps get the positions of
+    their targets, and a goto is added after a block whose next block is not
+    the one that follows it.
+    """
+
+    def needs_goto(index, block):
+        return block.next is not None and (index + 1 == len(blocks) or blocks[index + 1] is not block.next)
+
+    positions = {}
+    position = start
+    for index, block in enumerate(blocks):
+        positions[block] = position
+        position += len(block.code) + (block.branch is not None) + needs_goto(index, block)
+
+    quadruples = []
+    for index, block in enumerate(blocks):
+        quadruples.extend(tuple(quadruple) for quadruple in block.code)
+        if block.branch is not None:
+            op, arg1, arg2, result = block.branch
+            if op in JUMPS:
+                result = positions[block.target]
+            quadruples.append((op, arg1, arg2, result))
+        if needs_goto(index, block):
+            quadruples.append((GOTO, None, None, positions[block.next]))
+    return quadruples
+
+
+def reverse_postorder(blocks: List[Block]) -> List[Block]:
+    """The blocks reachable from the entry, in reverse postorder."""
+    order = []
+    visited = {blocks[0]}
+    stack = [(blocks[0], iter(blocks[0].successors()))]
+    while stack:
+        block, successors = stack[-1]
+        for successor in successors:
+            if successor not in visited:
+                visited.add(successor)
+                stack.append((successor, iter(successor.successors())))
+                break
+        else:
+            stack.pop()
+            order.append(block)
+    order.reverse()
+    return order
+
+
+def predecessors(blocks: List[Block]) -> Dict[Block, List[Block]]:
+    result = {block: [] for block in blocks}
+    for block in blocks:
+        for successor in block.successors():
+            result[successor].append(block)
+    return result
+
+
+class CodeUnit:
+    """A unit of code being optimized: its blocks and the constants table of the program."""
+
+    def __init__(self, interpreter, blocks: List[Block], unroll_factor: int = DEFAULT_UNROLL_FACTOR):
+        self.interpreter = interpreter
+        self.blocks = blocks
+        self.unroll_factor = unroll_factor
+        self.constants = interpreter.symbol_table.constants_table.constants
+        exit_op = blocks[-1].branch[0] if blocks[-1].branch is not None else None
+        self.is_function = exit_op == END_FUNC
+        # The initialization of the globals runs once, before any other code that uses them
+        self.is_globals = exit_op is None
+        self.params = set()
+        if self.is_function:
+            container = interpreter.symbol_table.get_function(interpreter.current_container)
+            symbols = list(container.symbols.values())[: len(container.param_signature)]
+            self.params = {symbol.address for symbol in symbols}
+        # (first, last) of a range of temporaries -> first address of it no quadruple uses, see new_temporary
+        self.unused_temporaries: Optional[Dict[Tuple[int, int], int]] = None
+        # The liveness of the blocks while it is up to date, see liveness and KEEP_LIVENESS
+        self.live_out: Optional[Dict[Block, set]] = None
+
+    def liveness(self) -> Dict[Block, set]:
+        """
+        The liveness of the blocks, computed once for the passes that keep it up
+        to date. A pass that changes the code must set live_out to None, unless
+        the optimizer clears it after the pass (see KEEP_LIVENESS). The sets must
+        not be changed.
+        """
+        if self.live_out is None:
+            self.live_out = liveness(self.blocks)
+        return self.live_out
+
+    def new_temporary(self, like) -> Optional[int]:
+        """A temporary of the same type as like that the unit does not use yet. None when they are all taken."""
+        if self.unused_temporaries is None:
+            self.unused_temporaries = {}
+            for block in self.blocks:
+                for quadruple in block.code + ([block.branch] if block.branch is not None else []):
+                    # The result of a jump is a position in the code
+                    for address in quadruple[1:3] if quadruple[0] in JUMPS else quadruple[1:]:
+                        bounds = temporary_range(address)
+                        if bounds is not None and address >= self.unused_temporaries.get(bounds, bounds[0]):
+                            self.unused_temporaries[bounds] = address + 1
+        bounds = temporary_range(like)
+        address = self.unused_temporaries.get(bounds, bounds[0])
+        if address > bounds[1]:
+            return None
+        self.unused_temporaries[bounds] = address + 1
+        return address
+
+    def starts_unset(self, address) -> bool:
+        """Whether address holds no value when the unit starts running."""
+        if self.is_function:
+            # Every call gets a new frame, in which only the parameters are set
+            return is_local(address) and address not in self.params
+        if self.is_globals:
+            return type(address) is int and GLOBALS_START <= address <= TEMPORARIES_END
+        return False
+
+    def constant(self, address) -> Optional[ConstantKey]:
+        """The value of a constant address, None for any other operand."""
+        if not is_constant(address):
+            return None
+        constant = self.constants.get(address)
+        return None if constant is None else (constant.var_type, constant.value)
+
+    def is_int(self, address) -> bool:
+        """Whether address is an int variable, temporary or constant."""
+        if is_constant(address):
+            constant = self.constant(address)
+            return constant is not None and constant[0] == "int"
+        return type(address) is int and any(first <= address <= last for first, last in INT_RANGES)
+
+    def intern(self, key: ConstantKey) -> Optional[int]:
+        """The address of a constant, allocating it if needed. None when the constants of its type are full."""
+        var_type, value = key
+        try:
+            return self.interpreter.intern_constant(value, var_type)
+        except MemoryError:
+            return None
+
+
+def _known(unit: CodeUnit, facts: Dict[int, ConstantKey], address) -> Optional[ConstantKey]:
+    return facts.get(address) if address in facts else unit.constant(address)
+
+
+def _fold(op: int, left: Optional[ConstantKey], right: Optional[ConstantKey]) -> Optional[ConstantKey]:
+    if left is None or right is None:
+        return None
+    value = fold_operation(OPERATOR_NAMES[op], left[1], right[1])
+    return None if value is None else (type(value).__name__, value)
+
+
+def _propagate(unit: CodeUnit, block: Block, facts: Dict[int, ConstantKey], rewrite: bool) -> Dict[int, ConstantKey]:
+    """
+    Run the quadruples of a block over the addresses known to hold a constant.
+    With rewrite, also replace the reads of those addresses by the constant and
+    fold what only depends on constants.
+    """
+
+    def operand(address):
+        if rewrite and address in facts:
+            constant_address = unit.intern(facts[address])
+            if constant_address is not None:
+                return constant_address
+        return address
+
+    for quadruple in block.code:
+        op, arg1, arg2, result = quadruple
+        if op in OPERATOR_NAMES:
+            value = _fold(op, _known(unit, facts, arg1), _known(unit, facts, arg2))
+            if rewrite:
+                address = unit.intern(value) if value is not None else None
+                if address is not None:
+                    quadruple[:] = [ASSIGN, address, None, result]
+                else:
+                    quadruple[1], quadruple[2] = operand(arg1), operand(arg2)
+        elif op == ASSIGN:
+            value = _known(unit, facts, arg1)
+            if rewrite:
+                quadruple[1] = operand(arg1)
+        elif op == GOSUB:
+            for address in [address for address in facts if is_global(address)]:
+                del facts[address]
+            continue
+        else:
+            if rewrite:
+                if op == PRINT:
+                    quadruple[3] = operand(result)
+                elif op == PARAM:
+                    quadruple[1] = operand(arg1)
+            continue
+        if value is None:
+            facts.pop(result, None)
+        else:
+            facts[result] = value
+
+    branch = block.branch
+    if rewrite and branch is not None:
+        op = branch[0]
+        if op == RETURN:
+            branch[3] = operand(branch[3])
+        elif op in (GOTO_F, GOTO_T):
+            condition = _known(unit, facts, branch[1])
+            if condition is not None:
+                if bool(condition[1]) == (op == GOTO_T):
+                    block.branch = [GOTO, None, None, None]
+                    block.next = None
+                else:
+                    block.branch = None
+                    block.target = None
+            else:
+                branch[1] = operand(branch[1])
+    return facts
+
+
+def fold_constants(unit: CodeUnit) -> None:
+    """
+    Constant propagation and folding. A forward dataflow analysis finds the
+    addresses that hold the same constant on every path into each block; reads
+    of them are replaced by the constant, operators and copies of constants
+    become copies of their folded value, and conditional jumps on a constant
+    become a goto or fall through.
+    """
+    order = reverse_postorder(unit.blocks)
+    incoming = predecessors(unit.blocks)
+    entry = unit.blocks[0]
+    exits: Dict[Block, Dict[int, ConstantKey]] = {}
+
+    def facts_into(block):
+        if block is entry:
+            return {}
+        known = [exits[predecessor] for predecessor in incoming[block] if predecessor in exits]
+        if not known:
+            return {}
+        facts = dict(known[0])
+        for other in known[1:]:
+            facts = {address: value for address, value in facts.items() if other.get(address) == value}
+        return facts
+
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            facts = _propagate(unit, block, facts_into(block), rewrite=False)
+            if exits.get(block) != facts:
+                exits[block] = facts
+                changed = True
+
+    entries = {block: facts_into(block) for block in order}
+    for block in order:
+        _propagate(unit, block, entries[block], rewrite=True)
+
+
+def _reads(quadruple) -> Tuple:
+    op, arg1, arg2, result = quadruple
+    if op in OPERATOR_NAMES:
+        return arg1, arg2
+    if op in (ASSIGN, PARAM, GOTO_F, GOTO_T):
+        return (arg1,)
+    if op in (PRINT, RETURN):
+        return (result,)
+    return ()
+
+
+def _replace_reads(quadruple, replacements: Dict) -> None:
+    """Make a quadruple read replacements[address] instead of each address it reads that is in replacements."""
+    op = quadruple[0]
+    if op in (PRINT, RETURN):
+        positions = (3,)
+    elif op in OPERATOR_NAMES:
+        positions = (1, 2)
+    else:
+        positions = (1,) if op in (ASSIGN, PARAM, GOTO_F, GOTO_T) else ()
+    for position in positions:
+        address = quadruple[position]
+        if address in replacements:
+            quadruple[position] = replacements[address]
+
+
+def _writes(quadruple):
+    """The address a quadruple stores to in the running frame, None if it does not store."""
+    op = quadruple[0]
+    return quadruple[3] if op == ASSIGN or op in OPERATOR_NAMES else None
+
+
+def _can_fail(unit: CodeUnit, quadruple) -> bool:
+    """A division that can stop the program must run even if its result is never read."""
+    if quadruple[0] != OPERATORS["/"]:
+        return False
+    divisor = unit.constant(quadruple[2])
+    return divisor is None or divisor[1] == 0
+
+
+def release_constants(interpreter, quadruples: List[Tuple]) -> List[Tuple]:
+    """
+    Give back the constants first interned for the unit being optimized (see
+    QuackInterpreter.start_unit), by the code generator or by the passes, that
+    none of its quadruples reads any more, like the intermediate values of
+    folding. The ones it reads move down so the constants of the program stay
+    contiguous. Returns the quadruples with the constants they read moved.
+    """
+    marks = interpreter.unit_constants
+    if marks is None:
+        return quadruples
+    read = set()
+    for quadruple in quadruples:
+        # The result of a jump is a position in the code
+        read.update(quadruple[1:3] if quadruple[0] in JUMPS else quadruple[1:])
+    table = interpreter.symbol_table.constants_table
+    memory = interpreter.memory_manager.memory_spaces["constant"]
+    moved = {}
+    for var_type, mark in marks.items():
+        address = mark
+        for interned in range(mark, memory.next_available[var_type]):
+            constant = table.constants.pop(interned)
+            if table.addresses.get((constant.var_type, constant.value)) == interned:
+                del table.addresses[(constant.var_type, constant.value)]
+            table.required_space[var_type] -= 1
+            if interned in read:
+                table.add_constant(address, constant.value, constant.var_type)
+                if address != interned:
+                    moved[interned] = address
+                address += 1
+        memory.next_available[var_type] = address
+    if not moved:
+        return quadruples
+    return [
+        (op, moved.get(arg1, arg1), moved.get(arg2, arg2), result if op in JUMPS else moved.get(result, result))
+        for op, arg1, arg2, result in quadruples
+    ]
+
+
+def remove_unreachable_blocks(unit: CodeUnit) -> None:
+    """Drop the blocks no path from the entry reaches. The last block, where the unit exits, always stays."""
+    reachable = set(reverse_postorder(unit.blocks))
+    last = unit.blocks[-1]
+    unit.blocks = [block for block in unit.blocks if block in reachable or block is last]
+
+
+def remove_unset_stores(unit: CodeUnit) -> None:
+    """
+    Drop the `= None` stores of declarations without a value into addresses
+    that no path from the start of the unit has set yet, so they hold None
+    already. A call may set any global.
+    """
+    order = reverse_postorder(unit.blocks)
+    incoming = predecessors(unit.blocks)
+    calls = object()
+    written: Dict[Block, set] = {}
+
+    def written_into(block):
+        result = set()
+        for predecessor in incoming[block]:
+            result |= written.get(predecessor, set())
+        return result
+
+    def run(block, addresses, rewrite):
+        kept = []
+        for quadruple in block.code:
+            if quadruple[0] == GOSUB:
+                addresses.add(calls)
+            address = _writes(quadruple)
+            if (
+                rewrite
+                and quadruple[0] == ASSIGN
+                and quadruple[1] is None
+                and unit.starts_unset(address)
+                and address not in addresses
+                and not (calls in addresses and is_global(address))
+            ):
+                continue
+            kept.append(quadruple)
+            if address is not None:
+                addresses.add(address)
+        if rewrite:
+            block.code = kept
+        return addresses
+
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            addresses = run(block, written_into(block), rewrite=False)
+            if written.get(block) != addresses:
+                written[block] = addresses
+                changed = True
+
+    for block in order:
+        run(block, written_into(block), rewrite=True)
+
+
+def _live_step(quadruple, live: set) -> None:
+    """Turn the temporaries and locals live after a quadruple into the ones live before it."""
+    address = _writes(quadruple)
+    if address is not None and is_private(address):
+        live.discard(address)
+    live.update(address for address in _reads(quadruple) if is_private(address))
+
+
+def liveness(blocks: List[Block]) -> Dict[Block, set]:
+    """The temporaries and locals live after the code of each block, before its branch."""
+    # What each block reads before storing it, and what it stores
+    used: Dict[Block, set] = {}
+    stored: Dict[Block, set] = {}
+    branch_reads: Dict[Block, set] = {}
+    for block in blocks:
+        reads, writes = set(), set()
+        for quadruple in block.code:
+            for address in _reads(quadruple):
+                if address not in writes and is_private(address):
+                    reads.add(address)
+            address = _writes(quadruple)
+            if is_private(address):
+                writes.add(address)
+        branch_reads[block] = set()
+        if block.branch is not None:
+            branch_reads[block] = {address for address in _reads(block.branch) if is_private(address)}
+            reads |= branch_reads[block] - writes
+        used[block] = reads
+        stored[block] = writes
+
+    successors = {block: block.successors() for block in blocks}
+    live_in = {block: set(used[block]) for block in blocks}
+    live_out = {}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(blocks):
+            live = set()
+            for successor in successors[block]:
+                live |= live_in[successor]
+            # Once nothing changes, these are the values live after each block
+            live_out[block] = live
+            live = used[block] | (live - stored[block])
+            if len(live) != len(live_in[block]):
+                live_in[block] = live
+                changed = True
+
+    for block in blocks:
+        live_out[block] |= branch_reads[block]
+    return live_out
+
+
+def remove_dead_stores(unit: CodeUnit) -> None:
+    """
+    Drop the stores to temporaries and locals that no path reads before they
+    are stored again or the unit exits, the operations that compute them
+    included, using a backward liveness analysis. Repeats while dropping
+    stores leaves fewer values live into a block, since the stores of those
+    values in other blocks can then be unused too.
+    """
+    changed = True
+    while changed:
+        changed = False
+        live_out = liveness(unit.blocks)
+        for block, live in live_out.items():
+            live = set(live)
+            # What is live into the block with all of its code
+            before = set(live)
+            kept = []
+            for quadruple in reversed(block.code):
+                _live_step(quadruple, before)
+                address = _writes(quadruple)
+                if address is not None and is_private(address) and address not in live:
+                    if not _can_fail(unit, quadruple):
+                        continue
+                _live_step(quadruple, live)
+                kept.append(quadruple)
+            if len(kept) != len(block.code):
+                kept.reverse()
+                block.code = kept
+                changed = changed or live != before
+    # No block has fewer values live into it, so what is live out of each one holds
+    unit.live_out = live_out
+
+
+def remove_jumps_to_next(unit: CodeUnit) -> None:
+    """
+    Jumps to the block laid out right after theirs become fall throughs, and
+    conditional jumps to it are inverted to jump where they fell through.
+    """
+    for block, following in zip(unit.blocks, unit.blocks[1:]):
+        if block.target is not following or block.branch[0] not in JUMPS:
+            continue
+        if block.branch[0] == GOTO or block.next is following:
+            if block.branch[0] != GOTO:
+                # The condition is no longer read
+                unit.live_out = None
+            block.branch = None
+            block.target = None
+        else:
+            block.branch[0] = INVERTED[block.branch[0]]
+            block.target = block.next
+        block.next = following
+
+
+def eliminate_dead_code(unit: CodeUnit) -> None:
+    """
+    Dead code elimination: unreachable blocks, initializations of declarations
+    that are already unset, stores that are never read, and the jumps that
+    removing them leaves pointing at the next block.
+    """
+    remove_unreachable_blocks(unit)
+    remove_unset_stores(unit)
+    remove_dead_stores(unit)
+    remove_jumps_to_next(unit)
+
+
+# Most quadruples of a loop condition that rotate_loops copies to the end of the loop
+ROTATION_LIMIT = 12
+
+
+def _thread(block: Block) -> Block:
+    """The block control reaches from block through empty blocks that only jump or fall through."""
+    seen = set()
+    while not block.code and block not in seen:
+        if block.branch is None and block.next is not None:
+            seen.add(block)
+            block = block.next
+        elif block.branch is not None and block.branch[0] == GOTO:
+            seen.add(block)
+            block = block.target
+        else:
+            break
+    return block
+
+
+def thread_jumps(unit: CodeUnit) -> None:
+    """
+    Jump threading: jumps and fall throughs into a chain of empty blocks go
+    straight to where the chain ends, and conditional jumps whose two paths
+    now reach the same block are dropped.
+    """
+    for block in unit.blocks:
+        if block.branch is not None and block.branch[0] in JUMPS:
+            block.target = _thread(block.target)
+        if block.next is not None:
+            block.next = _thread(block.next)
+        if block.branch is not None and block.branch[0] in INVERTED and block.target is block.next:
+            block.branch = None
+            block.target = None
+
+
+def rotate_loops(unit: CodeUnit) -> None:
+    """
+    Loop rotation. A while loop tests its condition at the top and jumps back
+    to it with a goto at the bottom, two jumps per iteration. A goto back to a
+    block that ends in a conditional jump is replaced by a copy of that block,
+    so each iteration runs one conditional jump and the test at the top only
+    guards the first one.
+    """
+    positions = {block: index for index, block in enumerate(unit.blocks)}
+    for index, block in enumerate(unit.blocks):
+        header = block.target
+        if (
+            block.branch is None
+            or block.branch[0] != GOTO
+            or header.branch is None
+            or header.branch[0] not in INVERTED
+            or positions[header] > index
+            or len(header.code) > ROTATION_LIMIT
+        ):
+            continue
+        following = unit.blocks[index + 1] if index + 1 < len(unit.blocks) else None
+        op, condition = header.branch[0], header.branch[1]
+        block.code.extend(list(quadruple) for quadruple in header.code)
+        if following is header.next:
+            block.branch = [op, condition, None, None]
+            block.target, block.next = header.target, header.next
+        else:
+            # Stay in the loop with the jump and leave it by falling through
+            block.branch = [INVERTED[op], condition, None, None]
+            block.target, block.next = header.next, header.target
+
+
+def merge_blocks(unit: CodeUnit) -> None:
+    """A block that is the only way into the block it falls through or jumps to absorbs it."""
+    incoming = predecessors(unit.blocks)
+    entry, last = unit.blocks[0], unit.blocks[-1]
+    merged = set()
+    for block in unit.blocks:
+        while block not in merged:
+            if block.branch is None:
+                successor = block.next
+            elif block.branch[0] == GOTO:
+                successor = block.target
+            else:
+                break
+            if successor is None or successor in (block, entry, last) or len(incoming[successor]) != 1:
+                break
+            block.code.extend(successor.code)
+            block.branch, block.target, block.next = successor.branch, successor.target, successor.next
+            merged.add(successor)
+    unit.blocks = [block for block in unit.blocks if block not in merged]
+
+
+def simplify_control_flow(unit: CodeUnit) -> None:
+    """
+    Control flow simplification: jump threading, loop rotation, and merging of
+    the blocks that removing jumps leaves in a straight line.
+    """
+    thread_jumps(unit)
+    rotate_loops(unit)
+    remove_unreachable_blocks(unit)
+    merge_blocks(unit)
+    remove_jumps_to_next(unit)
+
+
+# Operators whose operands can be swapped. `and` and `or` return one of their operands, so they can not.
+COMMUTATIVE = {OPERATORS[name] for name in ("+", "*", "==", "!=")}
+
+# An operation as the value numbering keys it, (op, arg1, arg2)
+Expression = Tuple[int, object, object]
+
+
+def _expression(quadruple) -> Expression:
+    op, arg1, arg2, _ = quadruple
+    if op in COMMUTATIVE and arg2 < arg1:
+        arg1, arg2 = arg2, arg1
+    return op, arg1, arg2
+
+
+def _available(block: Block, available: Dict[Expression, int], rewrite: bool) -> Dict[Expression, int]:
+    """
+    Run the quadruples of a block over the operations available in an address.
+    With rewrite, an operation that is available becomes a copy of the address
+    that holds it, and the reads of its result that follow in the block read
+    that address instead, as long as neither of them is stored again.
+    """
+
+    def kill(address):
+        for expression in [e for e, holder in available.items() if address in (holder, e[1], e[2])]:
+            del available[expression]
+
+    for index, quadruple in enumerate(block.code):
+        op = quadruple[0]
+        if op == GOSUB:
+            for expression in [e for e, holder in available.items() if is_global(holder) or any(map(is_global, e[1:]))]:
+                del available[expression]
+            continue
+        result = _writes(quadruple)
+        if result is None:
+            continue
+        expression = _expression(quadruple) if op in OPERATOR_NAMES else None
+        holder = available.get(expression)
+        if rewrite and holder is not None:
+            quadruple[:] = [ASSIGN, holder, None, result]
+            for following in block.code[index + 1 :] + ([block.branch] if block.branch is not None else []):
+                _replace_reads(following, {result: holder})
+                if _writes(following) in (result, holder):
+                    break
+        kill(result)
+        if expression is not None and result not in expression[1:]:
+            available.setdefault(expression, result)
+    if rewrite:
+        # An operation recomputed into the address that already holds it
+        block.code = [quadruple for quadruple in block.code if quadruple[0] != ASSIGN or quadruple[1] != quadruple[3]]
+    return available
+
+
+def eliminate_common_subexpressions(unit: CodeUnit) -> None:
+    """
+    Common subexpression elimination. A forward dataflow analysis finds the
+    operations whose result is in the same address on every path into each
+    block, with value numbering inside the blocks. Storing to an operand or to
+    the address that holds the result makes an operation unavailable, and a
+    call does so for the operations on globals or held in one.
+    """
+    order = reverse_postorder(unit.blocks)
+    incoming = predecessors(unit.blocks)
+    entry = unit.blocks[0]
+    exits: Dict[Block, Dict[Expression, int]] = {}
+
+    def available_into(block):
+        if block is entry:
+            return {}
+        known = [exits[predecessor] for predecessor in incoming[block] if predecessor in exits]
+        if not known:
+            return {}
+        available = dict(known[0])
+        for other in known[1:]:
+            available = {expression: holder for expression, holder in available.items() if other.get(expression) == holder}
+        return available
+
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            available = _available(block, available_into(block), rewrite=False)
+            if exits.get(block) != available:
+                exits[block] = available
+                changed = True
+
+    entries = {block: available_into(block) for block in order}
+    for block in order:
+        _available(block, entries[block], rewrite=True)
+
+
+def _copies(block: Block, copies: Dict[int, int], rewrite: bool) -> Dict[int, int]:
+    """
+    Run the quadruples of a block over the copies that hold, destination ->
+    source. With rewrite, reads of a destination read its source instead.
+    """
+
+    def kill(address):
+        if address in copies or address in copies.values():
+            for destination in [d for d, source in copies.items() if address in (d, source)]:
+                del copies[destination]
+
+    quadruples = block.code + ([block.branch] if block.branch is not None else [])
+    for quadruple in quadruples:
+        if rewrite:
+            _replace_reads(quadruple, copies)
+        op = quadruple[0]
+        if op == GOSUB:
+            for destination in [d for d, source in copies.items() if is_global(d) or is_global(source)]:
+                del copies[destination]
+            continue
+        result = _writes(quadruple)
+        if result is None:
+            continue
+        source = copies.get(quadruple[1], quadruple[1]) if op == ASSIGN else None
+        kill(result)
+        if type(source) is int and source != result:
+            copies[result] = source
+    return copies
+
+
+def _touches(quadruple, address) -> bool:
+    """Whether a quadruple reads or stores address. A call reads and stores every global."""
+    if quadruple[0] == GOSUB:
+        return is_global(address)
+    return address in _reads(quadruple) or _writes(quadruple) == address
+
+
+def _reads_after(code: List, index: int, temporary, destination) -> Optional[List]:
+    """
+    The quadruples after code[index] that read temporary before it is stored
+    again, if they can read destination instead: nothing before them touches
+    destination. None if some of them can not.
+    """
+    readers = []
+    touched = False
+    for quadruple in code[index + 1 :]:
+        if temporary in _reads(quadruple):
+            if touched:
+                return None
+            readers.append(quadruple)
+        if _writes(quadruple) == temporary:
+            break
+        touched = touched or _touches(quadruple, destination)
+    return readers
+
+
+def _coalesce(block: Block, live: set) -> None:
+    """
+    Store values straight into the destination of the copy that moves them,
+    `op a b t; = t v` -> `op a b v`, when nothing between the two quadruples
+    touches v. Reads of t after the copy read v, so t must not be live out of
+    the block and nothing may touch v before those reads.
+    """
+    code = block.code
+    live_out = set(live)
+    for index in range(len(code) - 1, -1, -1):
+        quadruple = code[index]
+        temporary, destination = quadruple[1], quadruple[3]
+        readers = None
+        if quadruple[0] == ASSIGN and is_private(temporary) and temporary != destination:
+            if temporary not in live:
+                readers = []
+            elif temporary not in live_out:
+                readers = _reads_after(code, index, temporary, destination)
+        if readers is not None:
+            for definition in range(index - 1, -1, -1):
+                if _writes(code[definition]) == temporary:
+                    break
+                if _touches(code[definition], destination):
+                    definition = None
+                    break
+            else:
+                definition = None
+            if definition is not None:
+                code[definition][3] = destination
+                for between in code[definition + 1 : index]:
+                    _replace_reads(between, {temporary: destination})
+                for reader in readers:
+                    _replace_reads(reader, {temporary: destination})
+                del code[index]
+                live.discard(temporary)
+                if is_private(destination):
+                    live.add(destination)
+                continue
+        _live_step(quadruple, live)
+
+
+def propagate_copies(unit: CodeUnit) -> None:
+    """
+    Copy propagation and coalescing. A forward dataflow analysis finds the
+    copies that hold on every path into each block, and reads of their
+    destination read the source instead, like the return slot of a call in
+    place of the temporary it was copied to. Copies whose source is computed
+    in the same block and not read after them are then coalesced with the
+    quadruple that computes it. The copies left unread are removed by
+    eliminate_dead_code.
+    """
+    order = reverse_postorder(unit.blocks)
+    incoming = predecessors(unit.blocks)
+    entry = unit.blocks[0]
+    exits: Dict[Block, Dict[int, int]] = {}
+
+    def copies_into(block):
+        if block is entry:
+            return {}
+        known = [exits[predecessor] for predecessor in incoming[block] if predecessor in exits]
+        if not known:
+            return {}
+        copies = dict(known[0])
+        for other in known[1:]:
+            copies = {destination: source for destination, source in copies.items() if other.get(destination) == source}
+        return copies
+
+    changed = True
+    while changed:
+        changed = False
+        for block in order:
+            copies = _copies(block, copies_into(block), rewrite=False)
+            if exits.get(block) != copies:
+                exits[block] = copies
+                changed = True
+
+    entries = {block: copies_into(block) for block in order}
+    for block in order:
+        _copies(block, entries[block], rewrite=True)
+
+    for block, live in liveness(unit.blocks).items():
+        _coalesce(block, live)
+
+
+def _live_in(block: Block, live_out: set) -> set:
+    """The temporaries and locals live before the code of a block, from the ones live after it."""
+    live = set(live_out)
+    for quadruple in reversed(block.code):
+        _live_step(quadruple, live)
+    return live
+
+
+def _loops(unit: CodeUnit) -> List[Tuple[Block, set]]:
+    """
+    The loops of the unit, innermost first, as (header, blocks of the loop). A
+    jump back in reverse postorder closes a loop with the blocks that reach it
+    without going through its header. The code generator only emits structured
+    loops, whose header is the only way into them; any other loop is skipped.
+    """
+    order = reverse_postorder(unit.blocks)
+    positions = {block: index for index, block in enumerate(order)}
+    incoming = predecessors(unit.blocks)
+    bodies: Dict[Block, set] = {}
+    for block in order:
+        for successor in block.successors():
+            if positions[successor] <= positions[block]:
+                body = bodies.setdefault(successor, {successor})
+                stack = [block]
+                while stack:
+                    member = stack.pop()
+                    if member not in body:
+                        body.add(member)
+                        stack.extend(incoming[member])
+
+    entry = unit.blocks[0]
+    loops = []
+    for header, body in bodies.items():
+        members = [block for block in body if block is not header]
+        if entry not in members and all(predecessor in body for block in members for predecessor in incoming[block]):
+            loops.append((header, body))
+    loops.sort(key=lambda loop: len(loop[1]))
+    return loops
+
+
+def _uses_in_block(code: List, index: int, address, live_out: set) -> Optional[List]:
+    """
+    The quadruples that read the value code[index] stores to address, if they
+    are all in its block: address is stored again or is not live out of it.
+    None if the value can be read in another block.
+    """
+    readers = []
+    for quadruple in code[index + 1 :]:
+        if address in _reads(quadruple):
+            readers.append(quadruple)
+        if _writes(quadruple) == address:
+            return readers
+    return None if address in live_out else readers
+
+
+def _add_preheader(unit: CodeUnit, header: Block, body: set, incoming: Dict[Block, List[Block]]) -> Block:
+    """Insert an empty block before a loop header that the paths from outside the loop go through instead."""
+    preheader = Block()
+    preheader.next = header
+    outside = [predecessor for predecessor in incoming[header] if predecessor not in body]
+    for predecessor in outside:
+        if predecessor.next is header:
+            predecessor.next = preheader
+        if predecessor.target is header:
+            predecessor.target = preheader
+    unit.blocks.insert(unit.blocks.index(header), preheader)
+    incoming[preheader] = outside
+    incoming[header] = [preheader] + [predecessor for predecessor in incoming[header] if predecessor in body]
+    return preheader
+
+
+class _Loop:
+    """What the loop passes need to know about a loop: its blocks and the addresses it stores to."""
+
+    def __init__(self, unit: CodeUnit, body: set):
+        self.body = body
+        self.blocks = [block for block in unit.blocks if block in body]
+        self.calls = any(quadruple[0] == GOSUB for block in self.blocks for quadruple in block.code)
+        self.writes = Counter(_writes(quadruple) for block in self.blocks for quadruple in block.code)
+
+    def exits(self) -> set:
+        """The blocks outside the loop that it jumps or falls through to."""
+        return {successor for block in self.blocks for successor in block.successors() if successor not in self.body}
+
+    def invariant(self, address) -> bool:
+        """Whether address holds the same value in every iteration. A call can store to any global."""
+        return is_constant(address) or (self.writes[address] == 0 and not (self.calls and is_global(address)))
+
+    def induction_variables(self, unit: CodeUnit) -> Dict[int, Tuple[Block, List, int]]:
+        """
+        The int addresses the loop only stores to by adding a constant to them
+        in one place: address -> (block of the increment, increment, step).
+        """
+        variables = {}
+        for block in self.blocks:
+            for quadruple in block.code:
+                step = _step(unit, quadruple)
+                address = quadruple[3]
+                if (
+                    step
+                    and self.writes[address] == 1
+                    and unit.is_int(address)
+                    and not (self.calls and is_global(address))
+                ):
+                    variables[address] = (block, quadruple, step)
+        return variables
+
+
+def hoist_loop_invariants(unit: CodeUnit) -> None:
+    """
+    Loop invariant code motion. An operation or copy in a loop whose operands
+    are constants or addresses the loop never stores to is computed once, in a
+    preheader the loop is entered through. A call in the loop can store to any
+    global, so operations on globals stay. Its destination must be a temporary
+    or local that only it stores to in the loop, that the loop does not read
+    before it and that is not read after the loop; a temporary that the code
+    generator reuses in the loop is renamed instead when its value is only read
+    in its block. Divisions that can fail stay where they are.
+    """
+    loops = _loops(unit)
+    incoming = predecessors(unit.blocks)
+    for header, body in loops:
+        loop = _Loop(unit, body)
+        writes = loop.writes
+        live_out = unit.liveness()
+        live = set()
+        for block in loop.exits() | {header}:
+            live |= _live_in(block, live_out[block])
+
+        hoisted = []
+        changed = True
+        while changed:
+            changed = False
+            for block in loop.blocks:
+                kept = []
+                for index, quadruple in enumerate(block.code):
+                    result = _writes(quadruple)
+                    if (
+                        result is None
+                        or not is_private(result)
+                        or (quadruple[0] == ASSIGN and quadruple[1] is None)
+                        or not all(loop.invariant(address) for address in _reads(quadruple))
+                        or _can_fail(unit, quadruple)
+                    ):
+                        kept.append(quadruple)
+                        continue
+                    if writes[result] != 1 or result in live:
+                        readers = None
+                        if temporary_range(result) is not None:
+                            readers = _uses_in_block(block.code, index, result, live_out[block])
+                        renamed = None if readers is None else unit.new_temporary(result)
+                        if renamed is None:
+                            kept.append(quadruple)
+                            continue
+                        for reader in readers:
+                            _replace_reads(reader, {result: renamed})
+                        quadruple[3] = renamed
+                    writes[result] -= 1
+                    hoisted.append(quadruple)
+                    changed = True
+                block.code = kept
+
+        if hoisted:
+            preheader = _add_preheader(unit, header, body, incoming)
+            preheader.code = hoisted
+            for _, outer in loops:
+                if header in outer and outer is not body:
+                    outer.add(preheader)
+            unit.live_out = None
+
+
+ADD = OPERATORS["+"]
+SUBTRACT = OPERATORS["-"]
+MULTIPLY = OPERATORS["*"]
+COMPARISONS = {OPERATORS[name] for name in ("<", "<=", ">", ">=", "==", "!=")}
+# Loop tests `i op n` that hold for every i between the start and a value they hold for, when i
+# grows or when it shrinks, and the op of the same test written `n op i`
+INCREASING = {OPERATORS["<"]: OPERATORS[">"], OPERATORS["<="]: OPERATORS[">="]}
+DECREASING = {OPERATORS[">"]: OPERATORS["<"], OPERATORS[">="]: OPERATORS["<="]}
+# Most quadruples in the body of a loop that unroll_loops copies
+UNROLL_LIMIT = 8
+
+
+def _step(unit: CodeUnit, quadruple) -> Optional[int]:
+    """The int constant `+ i s i`, `+ s i i` or `- i s i` adds to i, None for any other quadruple."""
+    op, arg1, arg2, result = quadruple
+    if op == ADD and arg2 == result:
+        arg1, arg2 = arg2, arg1
+    if op not in (ADD, SUBTRACT) or arg1 != result or not unit.is_int(arg2) or not is_constant(arg2):
+        return None
+    step = unit.constant(arg2)[1]
+    return -step if op == SUBTRACT else step
+
+
+def _position(code: List, quadruple) -> int:
+    return next(index for index, other in enumerate(code) if other is quadruple)
+
+
+def reduce_strength(unit: CodeUnit) -> None:
+    """
+    Induction variable strength reduction. A multiplication `i * c` in a loop,
+    where i only changes by adding a constant step once per iteration and c is
+    an int the loop does not change, reads a new variable j instead, computed
+    once before the loop and increased by step * c right after i. Its result
+    has to be a temporary only read in its block, before i changes. When c is
+    a positive constant, i is private and the loop only reads i to increase it
+    and compare it with an int it does not change, the comparison is made on j
+    and the bound times c, and i is no longer increased.
+    """
+    loops = _loops(unit)
+    incoming = predecessors(unit.blocks)
+    for header, body in loops:
+        loop = _Loop(unit, body)
+        variables = loop.induction_variables(unit)
+        if not variables:
+            continue
+        live_out = unit.liveness()
+        prologue = []
+        # (i, c) -> j
+        derived: Dict[Tuple[int, object], int] = {}
+        # Increment of i -> the increments of its derived variables that follow it
+        increments: Dict[int, List] = defaultdict(list)
+
+        for block in loop.blocks:
+            kept = []
+            for index, quadruple in enumerate(block.code):
+                variable, factor = quadruple[1], quadruple[2]
+                if variable not in variables:
+                    variable, factor = factor, variable
+                readers = None
+                if (
+                    quadruple[0] == MULTIPLY
+                    and variable in variables
+                    and loop.invariant(factor)
+                    and unit.is_int(factor)
+                    and temporary_range(quadruple[3]) is not None
+                ):
+                    readers = _uses_in_block(block.code, index, quadruple[3], live_out[block])
+                if readers:
+                    increment_block, increment, step = variables[variable]
+                    if increment_block is block:
+                        # The value is read before i changes again
+                        changes = _position(block.code, increment)
+                        if any(index < changes < _position(block.code, reader) for reader in readers):
+                            readers = None
+                if not readers:
+                    kept.append(quadruple)
+                    continue
+                reduced = derived.get((variable, factor))
+                if reduced is None:
+                    reduced = _derive(unit, prologue, increments[id(increment)], quadruple, variable, factor, step)
+                    if reduced is None:
+                        kept.append(quadruple)
+                        continue
+                    derived[(variable, factor)] = reduced
+                for reader in readers:
+                    _replace_reads(reader, {quadruple[3]: reduced})
+            block.code = kept
+
+        if not prologue:
+            continue
+        for block, increment, _ in variables.values():
+            added = increments.get(id(increment))
+            if added:
+                position = _position(block.code, increment) + 1
+                block.code[position:position] = added
+        _replace_tests(unit, loop, live_out, variables, derived, prologue)
+
+        preheader = _add_preheader(unit, header, body, incoming)
+        preheader.code = prologue
+        for _, outer in loops:
+            if header in outer and outer is not body:
+                outer.add(preheader)
+        unit.live_out = None
+
+
+def _derive(unit: CodeUnit, prologue: List, increments: List, multiplication, variable, factor, step) -> Optional[int]:
+    """A temporary that holds variable * factor, like multiplication, increased by step * factor after variable is."""
+    reduced = unit.new_temporary(multiplication[3])
+    if reduced is None:
+        return None
+    # Constants are interned last, once nothing else can make the rewrite give up
+    factor_value = unit.constant(factor)
+    if factor_value is not None:
+        value = fold_operation("*", step, factor_value[1])
+        stride = None if value is None else unit.intern(("int", value))
+        if stride is None:
+            return None
+        prologue.append([MULTIPLY, variable, factor, reduced])
+    else:
+        stride = unit.new_temporary(reduced)
+        step_address = None if stride is None else unit.intern(("int", step))
+        if step_address is None:
+            return None
+        prologue.append([MULTIPLY, variable, factor, reduced])
+        prologue.append([MULTIPLY, factor, step_address, stride])
+    increments.append([ADD, reduced, stride, reduced])
+    return reduced
+
+
+def _replace_tests(unit: CodeUnit, loop: _Loop, live_out, variables, derived, prologue) -> None:
+    """Compare derived variables instead of the induction variables that are only read to be compared."""
+    live = set()
+    for block in loop.exits():
+        live |= _live_in(block, live_out[block])
+
+    for (variable, factor), reduced in derived.items():
+        constant = unit.constant(factor)
+        increment = variables[variable][1]
+        if constant is None or constant[1] <= 0 or not is_private(variable) or variable in live:
+            continue
+        readers = [
+            quadruple
+            for block in loop.blocks
+            for quadruple in block.code + ([block.branch] if block.branch is not None else [])
+            if quadruple is not increment and variable in _reads(quadruple)
+        ]
+        if len(readers) != 1 or readers[0][0] not in COMPARISONS:
+            continue
+        test = readers[0]
+        bound = test[2] if test[1] == variable else test[1]
+        if bound == variable or not loop.invariant(bound) or not unit.is_int(bound):
+            continue
+        bound_value = unit.constant(bound)
+        if bound_value is not None:
+            value = fold_operation("*", bound_value[1], constant[1])
+            # Interned only when the test is replaced
+            scaled = None if value is None else unit.intern(("int", value))
+            if scaled is None:
+                continue
+        else:
+            scaled = unit.new_temporary(reduced)
+            if scaled is None:
+                continue
+            prologue.append([MULTIPLY, bound, factor, scaled])
+        _replace_reads(test, {variable: reduced, bound: scaled})
+        for block in loop.blocks:
+            block.code = [quadruple for quadruple in block.code if quadruple is not increment]
+
+
+def unroll_loops(unit: CodeUnit) -> None:
+    """
+    Loop unrolling. A loop of one small block that ends by adding a constant
+    step to an int i and comparing i with a bound the loop does not change,
+    `i <= n` while i grows or `i >= n` while it shrinks, runs unit.unroll_factor
+    copies of its body per jump back as long as the test would still hold for
+    the last of them, `i + (factor - 1) * step <= n`. The original loop runs the
+    iterations that remain.
+    """
+    factor = unit.unroll_factor
+    if factor <= 1:
+        return
+    incoming = predecessors(unit.blocks)
+    for header, body in _loops(unit):
+        loop = _Loop(unit, body)
+        code = header.code
+        if (
+            len(body) != 1
+            or header.branch[0] != GOTO_T
+            or header.target is not header
+            or not 1 < len(code) <= UNROLL_LIMIT + 1
+            or code[-1][0] not in INCREASING.keys() | DECREASING.keys()
+            or code[-1][3] != header.branch[1]
+            or temporary_range(code[-1][3]) is None
+            or any(code[-1][3] in _reads(quadruple) for quadruple in code[:-1])
+        ):
+            continue
+        test = code[-1]
+        variables = loop.induction_variables(unit)
+        op, variable, bound = test[0], test[1], test[2]
+        if variable not in variables:
+            op, variable, bound = (INCREASING.get(op) or DECREASING.get(op)), bound, variable
+        if variable not in variables or not loop.invariant(bound):
+            continue
+        step = variables[variable][2]
+        if op not in (INCREASING if step > 0 else DECREASING):
+            continue
+
+        value = fold_operation("*", factor - 1, step)
+        last = unit.new_temporary(test[3])
+        holds = unit.new_temporary(test[3])
+        if value is None or last is None or holds is None:
+            continue
+        # Interned last, once nothing else can stop the unrolling
+        ahead = unit.intern(("int", value))
+        if ahead is None:
+            continue
+
+        # Whether the test holds for the last copy, see unroll_loops
+        check = [
+            [ADD, variable, ahead, last],
+            [test[0], *(last if operand == variable else operand for operand in test[1:3]), holds],
+        ]
+        guard, unrolled, retest = Block(), Block(), Block()
+        guard.code = [list(quadruple) for quadruple in check]
+        guard.branch, guard.target, guard.next = [GOTO_F, holds, None, None], header, unrolled
+        unrolled.code = [list(quadruple) for _ in range(factor) for quadruple in code[:-1]]
+        unrolled.code += [list(quadruple) for quadruple in check]
+        unrolled.branch, unrolled.target, unrolled.next = [GOTO_T, holds, None, None], unrolled, retest
+        retest.code = [list(test)]
+        retest.branch, retest.target, retest.next = [GOTO_F, test[3], None, None], header.next, header
+
+        outside = [predecessor for predecessor in incoming[header] if predecessor is not header]
+        for predecessor in outside:
+            if predecessor.next is header:
+                predecessor.next = guard
+            if predecessor.target is header:
+                predecessor.target = guard
+        position = unit.blocks.index(header)
+        unit.blocks[position:position] = [guard, unrolled, retest]
+        incoming[guard] = outside
+        incoming[header] = [header, guard, retest]
+
+
+def allocate_temporaries(unit: CodeUnit) -> None:
+    """
+    Register allocation of the temporaries. Two temporaries interfere when
+    one is stored while the other is live, unless the store copies one into
+    the other. Temporaries are colored greedily in order of appearance with
+    the lowest address of their type that no interfering temporary has,
+    trying the address of the temporary they are copied from or to first, and
+    copies that end up with the same address on both sides are removed.
+    """
+    blocks = unit.blocks
+    live_out = unit.liveness()
+    interference = defaultdict(set)
+    partners = defaultdict(list)
+    for block, live in live_out.items():
+        live = set(live)
+        for quadruple in reversed(block.code):
+            written = _writes(quadruple)
+            if temporary_range(written) is not None:
+                copied = quadruple[1] if quadruple[0] == ASSIGN else None
+                for other in live:
+                    if other != written and other != copied and temporary_range(other) is not None:
+                        interference[written].add(other)
+                        interference[other].add(written)
+                if temporary_range(copied) == temporary_range(written):
+                    partners[written].append(copied)
+                    partners[copied].append(written)
+            _live_step(quadruple, live)
+        if block is blocks[0] and any(temporary_range(address) is not None for address in live):
+            # A temporary read before the unit stores it, its address has to stay
+            return
+
+    slots: Dict[int, int] = {}
+    for block in blocks:
+        for quadruple in block.code + ([block.branch] if block.branch is not None else []):
+            written = _writes(quadruple)
+            for address in _reads(quadruple) + (written,):
+                address_range = temporary_range(address)
+                if address_range is None or address in slots:
+                    continue
+                taken = {slots[other] for other in interference[address] if other in slots}
+                preferred = [slots[partner] for partner in partners[address] if partner in slots]
+                free = [slot for slot in preferred if slot not in taken]
+                if free:
+                    slots[address] = free[0]
+                else:
+                    slot = address_range[0]
+                    while slot in taken:
+                        slot += 1
+                    slots[address] = slot
+
+    for block in blocks:
+        for quadruple in block.code + ([block.branch] if block.branch is not None else []):
+            written = _writes(quadruple)
+            _replace_reads(quadruple, slots)
+            if written in slots:
+                quadruple[3] = slots[written]
+        block.code = [quadruple for quadruple in block.code if quadruple[0] != ASSIGN or quadruple[1] != quadruple[3]]
+
+
+OPTIMIZATION_LEVELS = {
+    0: [],
+    1: [
+        simplify_control_flow,
+        fold_constants,
+        eliminate_common_subexpressions,
+        propagate_copies,
+        eliminate_dead_code,
+        hoist_loop_invariants,
+        reduce_strength,
+        unroll_loops,
+        simplify_control_flow,
+        allocate_temporaries,
+    ],
+}
+# The passes that leave CodeUnit.live_out up to date or clear it, so the next pass can use it
+KEEP_LIVENESS = {eliminate_dead_code, hoist_loop_invariants, reduce_strength}
+
+
+class QuackOptimizer:
+    """Runs the passes of an optimization level over every unit of code QuackInterpreter generates."""
+
+    def __init__(self, level: int = DEFAULT_OPTIMIZATION_LEVEL, unroll_factor: int = DEFAULT_UNROLL_FACTOR):
+        if level not in OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown optimization level {level}, expected one of {sorted(OPTIMIZATION_LEVELS)}.")
+        if unroll_factor < 1:
+            raise ValueError(f"The unroll factor must be at least 1, got {unroll_factor}.")
+        self.level = level
+        self.unroll_factor = unroll_factor
+        self.passes = OPTIMIZATION_LEVELS[level]
+        # Time spent optimizing, reported by the compile metrics
+        self.seconds = 0.0
+        # Container -> var type -> temporaries its optimized units use, see size_temporaries
+        self.temporaries: Dict[str, Dict[str, int]] = {}
+
+    def constant(self, interpreter, operand) -> Optional[Constant]:
+        """The constant an operand of the code generator is: a folded Constant or the address of one."""
+        if isinstance(operand, Constant):
+            return operand
+        if not is_constant(operand):
+            return None
+        return interpreter.symbol_table.constants_table.constants.get(operand)
+
+    def fold(self, interpreter, op: str, left, right) -> Optional[Constant]:
+        """Fold an operator while generating code, if both operands are constants."""
+        left = self.constant(interpreter, left)
+        right = self.constant(interpreter, right)
+        if left is None or right is None:
+            return None
+        value = fold_operation(op, left.value, right.value)
+        return None if value is None else Constant(value=value, var_type=type(value).__name__)
+
+    def optimize(self, interpreter, start: int) -> None:
+        """Optimize the code interpreter generated from position start on."""
+        if not self.passes:
+            return
+        began = time.perf_counter()
+        quack_quadruple = interpreter.quack_quadruple
+        quadruples = quack_quadruple.get_quadruples_from(start)
+        blocks = build_blocks(quadruples, start) if quadruples else None
+        if blocks is not None:
+            unit = CodeUnit(interpreter, blocks, self.unroll_factor)
+            for run in self.passes:
+                run(unit)
+                if run not in KEEP_LIVENESS:
+                    unit.live_out = None
+            quadruples = layout(unit.blocks, start)
+        quadruples = release_constants(interpreter, quadruples)
+        quack_quadruple.replace_from(start, quadruples)
+        if allocate_temporaries in self.passes:
+            self.size_temporaries(interpreter, quadruples)
+        self.seconds += time.perf_counter() - began
+
+    def release_temporaries(self, memory, available: Dict[str, int]) -> None:
+        """
+        Called after the code generator generates a statement, with the
+        addresses memory had available before it. No temporary is live after a
+        statement, so once half the temporaries of a type are taken, the next
+        statement allocates them from where this one did. Until then they stay
+        apart, which leaves more values to eliminate_common_subexpressions.
+        """
+        if allocate_temporaries not in self.passes:
+            return
+        for var_type in ("t_int", "t_float"):
+            first, last = memory.memory[var_type]["address_range"]
+            if memory.next_available[var_type] - first > (last - first + 1) // 2:
+                memory.next_available[var_type] = available[var_type]
+
+    def size_temporaries(self, interpreter, quadruples: List[Tuple]) -> None:
+        """
+        Size the temporaries of the container being generated to the most any
+        of its units uses, and let the next unit allocate them from the first
+        address again. Temporaries are never live from one unit to the next.
+        """
+        container = interpreter.symbol_table.get_function(interpreter.current_container)
+        memory = interpreter.memory_manager.memory_spaces[interpreter.current_memory_space]
+        used = self.temporaries.setdefault(container.name, {})
+        for var_type in ("t_int", "t_float"):
+            first, last = memory.memory[var_type]["address_range"]
+            end = first
+            for quadruple in quadruples:
+                # The result of a jump is a position in the code
+                for address in quadruple[1:3] if quadruple[0] in JUMPS else quadruple[1:]:
+                    if type(address) is int and first <= address <= last and address >= end:
+                        end = address + 1
+            used[var_type] = max(used.get(var_type, 0), end - first)
+            if used[var_type] or var_type in container.required_space:
+                container.required_space[var_type] = used[var_type]
+            memory.next_available[var_type] = first
@@ -1,4 +1,8 @@
-from collections import deque
+import sys
+from array import array
+
+# Encoding of None operands, the same one the object file uses
+NONE_OPERAND = -1
 
 
 class OperatorsInterface:
@@ -35,13 +39,49 @@ class OperatorsInterface:
 
 
 class QuackQuadruple:
+    """
+    Columnar store of the generated quadruples. Every field is kept in an array
+    of 32-bit integers, so any quadruple can be read or patched in O(1). Operands
+    that are not addresses or positions are encoded as in the object file: -1
+    for None and -(2 + index) for a string (a function name) in self.strings.
+    """
+
     def __init__(self):
         self.jumps_stack = []
         self.returns_stack = []
-        self.quadruples = deque()
+        self.ops = array("i")
+        self.arg1s = array("i")
+        self.arg2s = array("i")
+        self.results = array("i")
+        # Side table of the string operands, see encode_operand
+        self.strings = []
+        self.string_indexes = {}
         self.current_index = 0
+        # Position of the first quadruple still in the store, see flush
+        self.flushed = 0
         self.operators = OperatorsInterface()
 
+    def encode_operand(self, value) -> int:
+        """Encode an operand as an integer of the store."""
+        if type(value) is int:
+            return value
+        if value is None:
+            return NONE_OPERAND
+        index = self.string_indexes.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self.string_indexes[value] = index
+        return -2 - index
+
+    def decode_operand(self, value: int):
+        """Decode an operand of the store."""
+        if value >= 0:
+            return value
+        if value == NONE_OPERAND:
+            return None
+        return self.strings[-2 - value]
+
     def get_current_index(self):
         """Get the current index."""
         return self.current_index
@@ -50,8 +90,12 @@ class QuackQuadruple:
         self, op: str, arg1: str, arg2: str, result: str = None, memory_space: str = None, result_type: str = None
     ):
         """Add a quadruple to the list."""
-        op = self.operators.get_operator(op)
-        self.quadruples.append((op, arg1, arg2, result))
+        # Addresses are stored as they are, only None and strings have to be encoded
+        encode = self.encode_operand
+        self.ops.append(self.operators.operators[op])
+        self.arg1s.append(arg1 if type(arg1) is int else encode(arg1))
+        self.arg2s.append(arg2 if type(arg2) is int else encode(arg2))
+        self.results.append(result if type(result) is int else encode(result))
         self.current_index += 1
         return result
 
@@ -64,13 +108,87 @@ class QuackQuadruple:
 
     def add_jump(self, type: str = "goto", condition: str = None, target: str = None):
         """Add a jump to the list."""
-        type = self.operators.get_operator(type)
-        self.quadruples.append((type, condition, None, target))
-        self.current_index += 1
+        self.add_quadruple(type, condition, None, target)
+
+    def extend(self, quadruples):
+        """Append quadruples whose operators are already encoded."""
+        encode = self.encode_operand
+        for op, arg1, arg2, result in quadruples:
+            self.ops.append(op)
+            self.arg1s.append(encode(arg1))
+            self.arg2s.append(encode(arg2))
+            self.results.append(encode(result))
+            self.current_index += 1
+
+    def get_quadruples_from(self, start: int):
+        """Get the quadruples from position start on. They must not have been flushed."""
+        position = start - self.flushed
+        if position < 0:
+            raise IndexError("Quadruples already flushed")
+        return [self[index] for index in range(position, len(self.ops))]
+
+    def replace_from(self, start: int, quadruples):
+        """Replace the quadruples from position start on with quadruples whose operators are already encoded."""
+        position = start - self.flushed
+        if position < 0:
+            raise IndexError("Quadruples already flushed")
+        for column in (self.ops, self.arg1s, self.arg2s, self.results):
+            del column[position:]
+        self.current_index = start
+        self.extend(quadruples)
+
+    def flush(self):
+        """
+        Remove and return the quadruples generated so far, for compilers that
+        write the code as it is generated. Positions keep counting from where
+        they were, so flushed quadruples can no longer be updated.
+        """
+        quadruples = self.get_quadruples()
+        for column in (self.ops, self.arg1s, self.arg2s, self.results):
+            del column[:]
+        self.flushed = self.current_index
+        return quadruples
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __getitem__(self, position: int):
+        """Get the quadruple at a position of the store as an (op, arg1, arg2, result) tuple."""
+        decode = self.decode_operand
+        return (
+            self.ops[position],
+            decode(self.arg1s[position]),
+            decode(self.arg2s[position]),
+            decode(self.results[position]),
+        )
+
+    def __iter__(self):
+        decode = self.decode_operand
+        for op, arg1, arg2, result in zip(self.ops, self.arg1s, self.arg2s, self.results):
+            yield op, decode(arg1), decode(arg2), decode(result)
+
+    @property
+    def quadruples(self):
+        """The quadruples in the store as (op, arg1, arg2, result) tuples."""
+        return self.get_quadruples()
 
     def get_quadruples(self):
         """Get the list of quadruples."""
-        return list(self.quadruples)
+        return list(self)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the store as little-endian (op, arg1, arg2, result) int32
+        records, with string operands as indices into self.strings.
+        """
+        records = array("i", bytes(4 * 4 * len(self.ops)))
+        records[0::4] = self.ops
+        records[1::4] = self.arg1s
+        records[2::4] = self.arg2s
+        records[3::4] = self.results
+        if sys.byteorder != "little":
+            records.byteswap()
+        return records.tobytes()
 
     def push_jump(self, jump: int = None):
         """Push a jump onto the stack."""
@@ -92,16 +210,16 @@ class QuackQuadruple:
 
     def update_jump(self, index: int, target: int):
         """Update the jump at the given index."""
-        if 0 <= index < len(self.quadruples):
-            op, arg1, arg2, _ = self.quadruples[index]
-            self.quadruples[index] = (op, arg1, arg2, target)
+        position = index - self.flushed
+        if 0 <= position < len(self.ops):
+            self.results[position] = target
         else:
             raise IndexError("Jump index out of range")
 
     def get_str_representation(self, pretty: bool = False):
         """Get a string representation of the quadruples."""
         lines = []
-        for i, quadruple in enumerate(self.quadruples):
+        for i, quadruple in enumerate(self):
             op = quadruple[0]
             op_str = next((k for k, v in self.operators.operators.items() if v == op), op) if pretty else op
             lines.append(f"{i}: ({op_str}, {quadruple[1]}, {quadruple[2]}, {quadruple[3]})")
@@ -109,7 +227,7 @@ class QuackQuadruple:
 
     def __str__(self):
         """Get a string representation of the quadruples."""
-        return "\n".join([f"{i}: {quadruple}" for i, quadruple in enumerate(self.quadruples)])
+        return "\n".join([f"{i}: {quadruple}" for i, quadruple in enumerate(self)])
 
     def __repr__(self):
         """Get a string representation of the quadruples."""
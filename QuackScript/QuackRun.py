@@ -0,0 +1,39 @@
+"""
+Runs compiled QuackScript object files without the compiler.
+
+Only the virtual machine, the memory manager and the object file reader are
+imported, so starting it does not load Lark or build the parser:
+
+    python QuackRun.py program.obj
+
+Relocatable objects have to be linked with QuackLinker.py first.
+"""
+
+import argparse
+import sys
+
+from Exceptions import InvalidObjectFileError
+from VirtualMachine import QuackVirtualMachine
+
+
+def run_object(object_file):
+    """
+    Runs an executable object file. The file is kept and each function is
+    decoded on its first call.
+    """
+    QuackVirtualMachine().translate_program(object_file, delete_object=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python QuackRun.py <object_file>",
+        description="Run a compiled QuackScript object file.",
+    )
+    parser.add_argument("object_file")
+    args = parser.parse_args()
+
+    try:
+        run_object(args.object_file)
+    except InvalidObjectFileError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
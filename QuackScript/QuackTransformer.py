@@ -1,4 +1,6 @@
-from lark import Transformer, v_args
+from functools import partial
+
+from lark import Transformer_NonRecursive, v_args
 
 from SymbolTable import SymbolTable
 from TransformerClasses import (
@@ -15,21 +17,71 @@ from TransformerClasses import (
     IfNode,
     LogicalAndNode,
     LogicalOrNode,
+    ModuleNode,
     MultiplicativeOpNode,
+    Node,
     ParamNode,
     ParamsNode,
     PrintNode,
     ProgramNode,
     ReturnNode,
+    SourceSpans,
     VarDeclNode,
     WhileNode,
 )
 
 
+def _with_span(rule, spans, children):
+    """
+    Call a rule with its children inline, and give the node it builds the span
+    from the start of its first child that has a position to the end of the
+    last one. Tokens have start_pos and end_pos, and the nodes built for earlier
+    rules have their span in spans. Nodes a rule passes through keep the span
+    they already have.
+    """
+    node = rule(*children)
+    if isinstance(node, Node) and node not in spans:
+        start_pos = end_pos = None
+        for child in children:
+            start_pos = _span(spans, child)[0]
+            if start_pos is not None:
+                break
+        for child in reversed(children):
+            end_pos = _span(spans, child)[1]
+            if end_pos is not None:
+                break
+        if start_pos is not None and end_pos is not None:
+            spans.set(node, start_pos, end_pos)
+    return node
+
+
+def _span(spans, child):
+    if isinstance(child, Node):
+        return spans.get(child) or (None, None)
+    return getattr(child, "start_pos", None), getattr(child, "end_pos", None)
+
+
+def _rule_names(cls) -> set:
+    """The rules a QuackTransformer class defines a callback for."""
+    names = set()
+    for base in cls.__mro__:
+        if issubclass(base, QuackTransformer):
+            names.update(name for name, value in vars(base).items() if not name.startswith("_") and callable(value))
+    return names
+
+
+# Non-recursive, so transforming a parse tree works for expressions of any depth
 @v_args(inline=True)
-class QuackTransformer(Transformer):
-    def __init__(self):
+class QuackTransformer(Transformer_NonRecursive):
+    def __init__(self, spans: bool = False):
         self.symbol_table = None
+        self.imports = []
+        # The SourceSpans of the nodes built, only recorded when asked for
+        self.spans = SourceSpans() if spans else None
+        if spans:
+            # Lark looks the rules up on the transformer, so these instance attributes record the spans
+            for name in _rule_names(type(self)):
+                setattr(self, name, partial(_with_span, getattr(self, name), self.spans))
 
     """
     id: CNAME
@@ -44,10 +96,10 @@ class QuackTransformer(Transformer):
     """
 
     def int(self, value):
-        return int(value)
+        return CteNumNode(value=int(value))
 
     def float(self, value):
-        return float(value)
+        return CteNumNode(value=float(value))
 
     """
     cte_string: ESCAPED_STRING
@@ -77,15 +129,18 @@ class QuackTransformer(Transformer):
         return ArithmeticOpNode(op="-", left=CteNumNode(0), right=id)
 
     def factor_cte_num(self, cte_num):
-        return CteNumNode(value=cte_num)
+        return cte_num
 
     def positive_cte_num(self, plus, cte_num):
-        return CteNumNode(value=cte_num)
+        return cte_num
 
     def negative_cte_num(self, minus, cte_num):
-        return ArithmeticOpNode(op="-", left=CteNumNode(0), right=CteNumNode(cte_num))
+        return ArithmeticOpNode(op="-", left=CteNumNode(0), right=cte_num)
 
     def parenthesis_expresion(self, lpar, expresion, rpar):
+        # The span of a parenthesized expression includes the parentheses
+        if self.spans is not None:
+            self.spans.set(expresion, lpar.start_pos, rpar.end_pos)
         return expresion
 
     def factor_func_call(self, func_call):
@@ -329,21 +384,21 @@ class QuackTransformer(Transformer):
     """
 
     def program_no_decl(self, program_pt1, program_pt2, main, body, end):
-        return ProgramNode(name=program_pt2, global_decls=[], functions=[], main_body=body)
+        return ProgramNode(name=program_pt2, global_decls=[], functions=[], main_body=body, imports=self.imports)
 
     def program_decl_no_func(self, program_pt1, program_pt2, *args):
         body = args[-2]
         decls = []
         for i in range(0, len(args) - 3):
             decls.append(args[i])
-        return ProgramNode(name=program_pt2, global_decls=decls, functions=[], main_body=body)
+        return ProgramNode(name=program_pt2, global_decls=decls, functions=[], main_body=body, imports=self.imports)
 
     def program_func_no_decl(self, program_pt1, program_pt2, *args):
         body = args[-2]
         funcs = []
         for i in range(0, len(args) - 3):
             funcs.append(args[i])
-        return ProgramNode(name=program_pt2, global_decls=[], functions=funcs, main_body=body)
+        return ProgramNode(name=program_pt2, global_decls=[], functions=funcs, main_body=body, imports=self.imports)
 
     def program_decl_func(self, program_pt1, program_pt2, *args):
         body = args[-2]
@@ -355,17 +410,112 @@ class QuackTransformer(Transformer):
                 decls.append(item)
             elif isinstance(item, FunctionDeclNode):
                 funcs.append(item)
-        return ProgramNode(name=program_pt2, global_decls=decls, functions=funcs, main_body=body)
+        return ProgramNode(name=program_pt2, global_decls=decls, functions=funcs, main_body=body, imports=self.imports)
 
     """
     ?program_pt1: PROGRAM
-    ?program_pt2: id SEMICOLON
+    ?program_pt2: id SEMICOLON import_decl*
     """
 
     def program_pt1(self, program):
         self.symbol_table = SymbolTable()
+        self.imports = []
         return program
 
-    def program_pt2(self, id, semicolon):
+    def program_pt2(self, id, semicolon, *imports):
         self.symbol_table.create_global_container(id.name)
+        self.imports = list(imports)
         return id.name
+
+    """
+    import_decl: IMPORT id SEMICOLON
+    """
+
+    def import_decl(self, import_, id, semicolon):
+        return id.name
+
+    """
+    module: module_pt1 program_pt2 (const_decl | var_decl)* function* END
+    module_pt1: MODULE
+    """
+
+    def module(self, module_pt1, program_pt2, *args):
+        decls = []
+        funcs = []
+        for item in args[:-1]:
+            if isinstance(item, VarDeclNode):
+                decls.append(item)
+            elif isinstance(item, FunctionDeclNode):
+                funcs.append(item)
+        return ModuleNode(name=program_pt2, global_decls=decls, functions=funcs, imports=self.imports)
+
+    def module_pt1(self, module):
+        self.symbol_table = SymbolTable()
+        self.imports = []
+        return module
+
+
+@v_args(inline=True)
+class StreamingTransformer(QuackTransformer):
+    """
+    QuackTransformer for streaming compilation (see StreamingCodegen). Every
+    function is handed to on_function(global_decls, function) as soon as it is
+    reduced and is left out of the program or module node. The global
+    declarations all come before the first function and are passed with it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.on_function = None
+        # Declarations reduced since the last function: the globals, then the locals of the next function
+        self.declarations = []
+
+    def _declare(self, decl):
+        self.declarations.append(decl)
+        return decl
+
+    def _stream(self, function):
+        global_count = len(self.declarations) - len(function.var_decls)
+        global_decls = self.declarations[:global_count]
+        self.declarations = []
+        self.on_function(global_decls, function)
+        return None
+
+    def const_decl(self, *args):
+        return self._declare(super().const_decl(*args))
+
+    def var_single_decl_no_assign(self, *args):
+        return self._declare(super().var_single_decl_no_assign(*args))
+
+    def var_single_decl_assign(self, *args):
+        return self._declare(super().var_single_decl_assign(*args))
+
+    def var_multi_decl_no_assign(self, *args):
+        return self._declare(super().var_multi_decl_no_assign(*args))
+
+    def var_multi_decl_assign(self, *args):
+        return self._declare(super().var_multi_decl_assign(*args))
+
+    def function_no_params_no_var_decl(self, *args):
+        return self._stream(super().function_no_params_no_var_decl(*args))
+
+    def function_no_var_decl(self, *args):
+        return self._stream(super().function_no_var_decl(*args))
+
+    def function_params_var_decl(self, *args):
+        return self._stream(super().function_params_var_decl(*args))
+
+    def function_no_params(self, *args):
+        return self._stream(super().function_no_params(*args))
+
+    def program_func_no_decl(self, program_pt1, program_pt2, *args):
+        # The functions were streamed, only MAIN body END are left
+        return self.program_no_decl(program_pt1, program_pt2, *args[-3:])
+
+    def program_pt1(self, program):
+        self.declarations = []
+        return super().program_pt1(program)
+
+    def module_pt1(self, module):
+        self.declarations = []
+        return super().module_pt1(module)
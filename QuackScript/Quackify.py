@@ -1,29 +1,174 @@
-from QuackCompiler import compile_program
+from Exceptions import InvalidObjectFileError, LinkError
+from QuackCache import DEFAULT_MAX_SIZE, ObjectCache
+from QuackLinker import link_program
+from QuackObjectFile import is_relocatable
+from QuackRun import run_object
 from VirtualMachine import QuackVirtualMachine
+import argparse
+import os
 import sys
+import tempfile
 import traceback
 
+
+def link_and_run(qvm, object_file, resolver):
+    """
+    Runs an object file. Relocatable objects are linked with their modules
+    into a temporary executable object first.
+    """
+    if not is_relocatable(object_file):
+        return False
+    fd, executable = tempfile.mkstemp(suffix=".obj")
+    os.close(fd)
+    try:
+        link_program(object_file, resolver.resolve, executable)
+        qvm.translate_program(executable)
+    finally:
+        if os.path.exists(executable):
+            os.remove(executable)
+    return True
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python Quackify.py <input_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        usage="python Quackify.py [--no-cache] [-I <module_dir>] <input_file>",
+        description="Compile and run a QuackScript program, or run a compiled .obj file.",
+    )
+    parser.add_argument("input_file")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always recompile and do not store the object in __quackcache__",
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=DEFAULT_MAX_SIZE // (1024 * 1024),
+        help="size cap of the __quackcache__ directory in MiB (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print the time, memory and output size of every compiler phase to stderr",
+    )
+    parser.add_argument(
+        "--stats-json",
+        metavar="FILE",
+        help="write the compiler metrics as a JSON report to FILE",
+    )
+    parser.add_argument(
+        "--codegen-jobs",
+        type=int,
+        metavar="N",
+        help="generate each function into its own buffer, in N worker processes when N > 1",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="compile the source a chunk at a time, writing out each function as it is parsed",
+    )
+    parser.add_argument(
+        "-O",
+        "--optimization-level",
+        type=int,
+        choices=[0, 1],
+        default=1,
+        help="0 turns the optimizer off (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--unroll",
+        type=int,
+        metavar="FACTOR",
+        default=4,
+        help="copies of the body of small counted loops per iteration, 1 to not unroll (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-I",
+        "--module-path",
+        action="append",
+        default=[],
+        help="directory to search for imported modules, after the directory of the input file",
+    )
+    args = parser.parse_args()
+
+    input_file = args.input_file
 
-    input_file = sys.argv[1]
+    if input_file.endswith(".obj"):
+        try:
+            run_object(input_file)
+        except InvalidObjectFileError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        sys.exit(0)
 
     if not input_file.endswith(".quack"):
-        print("Error: Input file must have a .quack extension.")
+        print("Error: Input file must have a .quack or .obj extension.")
         sys.exit(1)
 
+    # The compiler imports Lark, so it is only loaded when there is something to compile
+    from QuackCompiler import ModuleResolver, compile_cached, compile_program
+    from QuackMetrics import CompileMetrics
+
+    metrics = CompileMetrics() if args.stats or args.stats_json else None
+
     qvm = QuackVirtualMachine()
+    resolver = ModuleResolver(
+        [os.path.dirname(os.path.abspath(input_file))] + args.module_path,
+        use_cache=not args.no_cache,
+        optimization_level=args.optimization_level,
+        unroll_factor=args.unroll,
+    )
 
     try:
-        compile_program(input_file, input_file.replace(".quack", ".obj"))
-        qvm.translate_program(input_file.replace(".quack", ".obj"))
+        if args.no_cache:
+            object_file = input_file.replace(".quack", ".obj")
+            compile_program(
+                input_file,
+                object_file,
+                resolver,
+                metrics,
+                codegen_jobs=args.codegen_jobs,
+                streaming=args.stream,
+                optimization_level=args.optimization_level,
+                unroll_factor=args.unroll,
+            )
+            if os.path.exists(object_file) and is_relocatable(object_file):
+                try:
+                    link_and_run(qvm, object_file, resolver)
+                finally:
+                    os.remove(object_file)
+            else:
+                qvm.translate_program(object_file)
+        else:
+            cache = ObjectCache.for_source(input_file, max_size=args.cache_max_size * 1024 * 1024)
+            object_file = compile_cached(
+                input_file,
+                cache,
+                resolver,
+                metrics,
+                codegen_jobs=args.codegen_jobs,
+                streaming=args.stream,
+                optimization_level=args.optimization_level,
+                unroll_factor=args.unroll,
+            )
+            if object_file is not None and not link_and_run(qvm, object_file, resolver):
+                qvm.translate_program(object_file, delete_object=False)
     except FileNotFoundError:
         print(f"File {input_file} not found.")
+    except LinkError as e:
+        print(f"Link error: {e}")
     except Exception as e:
         print("An unexpected error occurred!")
         print(f"Type: {type(e).__name__}")
         print(f"Message: {e}")
         print("Traceback:")
         traceback.print_exc()
+    finally:
+        resolver.cleanup()
+        if metrics is not None:
+            metrics.stop()
+            if args.stats:
+                print(metrics.format_table(), file=sys.stderr)
+            if args.stats_json:
+                with open(args.stats_json, "w", encoding="utf-8") as f:
+                    f.write(metrics.to_json())
@@ -0,0 +1,87 @@
+"""
+Code generation for streaming compilation.
+
+compile_streaming (see QuackCompiler) feeds the source to Lark's interactive
+LALR parser a chunk at a time. Its StreamingTransformer hands every function
+to StreamingCodegen as soon as the function is reduced, and StreamingCodegen
+generates its code and appends it to an ObjectFileWriter, which spills it to a
+temporary file. The parse tree is never built and neither the IR nor the code
+of the functions is kept: the compiler holds the symbol table, the constant
+table, the global declarations, the function it is generating and, at the end,
+the main body.
+
+The code is the same the sequential generator produces for the whole program:
+the global declarations, a jump over the functions, the functions in order and
+the main body.
+"""
+
+from typing import Callable, List, Optional, Union
+
+from MemoryManager import MemoryManager
+from QuackInterpreter import QuackInterpreter
+from QuackObjectFile import ObjectFileWriter
+from QuackOptimizer import QuackOptimizer
+from QuackQuadruple import QuackQuadruple
+from QuackTransformer import StreamingTransformer
+from TransformerClasses import FunctionDeclNode, ModuleNode, ProgramNode, VarDeclNode
+
+
+class StreamingCodegen:
+    """
+    Generates the code of a program or module one top-level function at a time,
+    while it is being parsed. declare_imports(symbol_table, imports) declares
+    the functions of the imported modules before any code is generated.
+    """
+
+    def __init__(
+        self,
+        transformer: StreamingTransformer,
+        writer: ObjectFileWriter,
+        declare_imports: Callable,
+        optimizer: Optional[QuackOptimizer] = None,
+    ):
+        self.transformer = transformer
+        self.writer = writer
+        self.declare_imports = declare_imports
+        self.optimizer = optimizer
+        self.interpreter: Optional[QuackInterpreter] = None
+        # Position of the jump from the global declarations over the functions
+        self.jump = None
+
+    def start(self, global_decls: List[VarDeclNode]) -> None:
+        """Declare the imports and the globals, and emit the jump over the functions that follow them."""
+        symbol_table = self.transformer.symbol_table
+        if self.transformer.imports:
+            self.declare_imports(symbol_table, self.transformer.imports)
+
+        self.interpreter = QuackInterpreter(symbol_table, QuackQuadruple(), MemoryManager())
+        self.interpreter.optimizer = self.optimizer
+        self.interpreter.generate_globals(global_decls)
+
+        quack_quadruple = self.interpreter.quack_quadruple
+        self.jump = quack_quadruple.get_current_index()
+        quack_quadruple.add_jump(type="goto")
+        self.flush()
+
+    def function(self, global_decls: List[VarDeclNode], decl: FunctionDeclNode) -> None:
+        """Generate a function that was just parsed. The first one comes with the global declarations."""
+        if self.interpreter is None:
+            self.start(global_decls)
+        self.interpreter.execute(decl)
+        self.flush()
+
+    def finish(self, ir: Union[ProgramNode, ModuleNode]) -> None:
+        """Generate what follows the functions: the main body of a program."""
+        if self.interpreter is None:
+            self.start(ir.global_decls)
+
+        quack_quadruple = self.interpreter.quack_quadruple
+        self.writer.set_jump_target(self.jump, quack_quadruple.get_current_index())
+        if isinstance(ir, ProgramNode):
+            self.interpreter.generate_main(ir.main_body)
+
+        self.interpreter.symbol_table.get_function(self.interpreter.global_container_name).clear()
+        self.flush()
+
+    def flush(self) -> None:
+        self.writer.append(self.interpreter.quack_quadruple.flush())
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Literal, Union
+from typing import Literal, Optional, Union
 
 from Exceptions import (
     ContainerRedeclarationError,
@@ -25,6 +25,8 @@ RESERVED_WORDS = [
     "and",
     "or",
     "return",
+    "module",
+    "import",
 ]
 
 
@@ -34,6 +36,8 @@ class Symbol:
     var_type: Literal["int", "float", "str", "bool"]
     isConstant: bool = False
     address: int = None
+    # Value of a constant whose declaration folds to one, see QuackOptimizer
+    constant: Optional["Constant"] = None
 
     def __post_init__(self):
         if not isinstance(self.name, str):
@@ -58,6 +62,8 @@ class Container:
         self.symbols = {}
         self.param_signature = []
         self.required_space = {}
+        # Name of the module that defines the function, None if it is defined in this program
+        self.module = None
 
     def add_symbol(self, symbol: Symbol) -> None:
         """Add a symbol to the container."""
@@ -105,6 +111,8 @@ class ConstantsTable:
     def __init__(self):
         self.constants = {}
         self.required_space = {"int": 0, "float": 0, "str": 0}
+        # (type, value) -> address, so 1, 1.0 and True are different constants
+        self.addresses = {}
 
     def add_constant(
         self, address: int, value: Union[int, float, str, bool], value_type: Literal["int", "float", "str", "bool"]
@@ -113,13 +121,15 @@ class ConstantsTable:
         if address not in self.constants:
             self.constants[address] = Constant(value=value, var_type=value_type)
             self.required_space[value_type] += 1
+            self.addresses.setdefault((value_type, value), address)
 
-    def check_and_get_address(self, value: Union[int, float, str, bool]) -> int:
-        """Check if a constant exists and retrieve its address."""
-        for address, constant in self.constants.items():
-            if constant.value == value:
-                return address
-        return None
+    def check_and_get_address(
+        self, value: Union[int, float, str, bool], value_type: Optional[str] = None
+    ) -> Optional[int]:
+        """Check if a constant of the given type exists and retrieve its address. The type defaults to the value's."""
+        if value_type is None:
+            value_type = type(value).__name__
+        return self.addresses.get((value_type, value))
 
 
 class SymbolTable:
@@ -178,6 +188,13 @@ class SymbolTable:
             raise ContainerRedeclarationError(f"Container '{name}' already exists.")
         self.containers[name] = Container(name=name, return_type=return_type)
 
+    def add_external_function(self, name: str, return_type: str, param_signature: list, module: str) -> None:
+        """Add a function imported from another module, known only by its signature."""
+        self.add_function(name=name, return_type=return_type)
+        container = self.containers[name]
+        container.param_signature = list(param_signature)
+        container.module = module
+
     def create_global_container(self, id):
         """Create a global container with the given id."""
         self.add_function(id, None)
@@ -1,99 +1,136 @@
-from dataclasses import dataclass
-from typing import List, Literal, Optional, Union
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional, Tuple, Union
 
 
-@dataclass
-class CteNumNode:
+class Node:
+    """
+    Base of the IR nodes. Nodes use __slots__ instead of a __dict__. _span is
+    only set on the nodes of a compilation that records spans, see SourceSpans.
+    """
+
+    __slots__ = ("_span",)
+
+
+class SourceSpans:
+    """
+    The spans of source characters [start_pos, end_pos) IR nodes were built
+    from, for debugging. A span is packed into a single int in the _span slot
+    of its node, which stays unset when spans are not recorded, so the IR of a
+    regular compilation only pays for the empty slot.
+    """
+
+    def __init__(self):
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, node) -> bool:
+        return hasattr(node, "_span")
+
+    def set(self, node: Node, start_pos: int, end_pos: int) -> None:
+        if not hasattr(node, "_span"):
+            self._count += 1
+        node._span = start_pos << 32 | end_pos
+
+    def get(self, node: Node) -> Optional[Tuple[int, int]]:
+        """The (start_pos, end_pos) of a node, None if it has no span, like the 0 of a negation."""
+        span = getattr(node, "_span", None)
+        return None if span is None else (span >> 32, span & 0xFFFFFFFF)
+
+
+@dataclass(slots=True)
+class CteNumNode(Node):
     value: Union[int, float]
 
 
-@dataclass
-class IdNode:
+@dataclass(slots=True)
+class IdNode(Node):
     name: str
 
 
-@dataclass
-class CteStringNode:
+@dataclass(slots=True)
+class CteStringNode(Node):
     value: str
 
 
-@dataclass
-class UnaryOpNode:
+@dataclass(slots=True)
+class UnaryOpNode(Node):
     op: Literal["+", "-"]
     expr: Union[CteNumNode, IdNode]
 
 
-@dataclass
-class ExpMinusNode:
+@dataclass(slots=True)
+class ExpMinusNode(Node):
     left: CteNumNode
     right: IdNode
 
 
-@dataclass
-class MultiplicativeOpNode:
+@dataclass(slots=True)
+class MultiplicativeOpNode(Node):
     op: Literal["*", "/"]
     left: "ExprNode"
     right: "ExprNode"
 
 
-@dataclass
-class ArithmeticOpNode:
+@dataclass(slots=True)
+class ArithmeticOpNode(Node):
     op: Literal["+", "-"]
     left: "ExprNode"
     right: "ExprNode"
 
 
-@dataclass
-class ComparisonNode:
+@dataclass(slots=True)
+class ComparisonNode(Node):
     op: Literal[">", "<", "==", "!=", ">=", "<="]
     left: "ExprNode"
     right: "ExprNode"
 
 
-@dataclass
-class LogicalAndNode:
+@dataclass(slots=True)
+class LogicalAndNode(Node):
     op: Literal["and"]
     left: "ExprNode"
     right: "ExprNode"
 
 
-@dataclass
-class LogicalOrNode:
+@dataclass(slots=True)
+class LogicalOrNode(Node):
     op: Literal["or"]
     left: "ExprNode"
     right: "ExprNode"
 
 
-@dataclass
-class AssignNode:
+@dataclass(slots=True)
+class AssignNode(Node):
     var_name: str
     expr: "ExprNode"
 
 
-@dataclass
-class BodyNode:
+@dataclass(slots=True)
+class BodyNode(Node):
     statements: List["StmtNode"]
 
 
-@dataclass
-class PrintNode:
+@dataclass(slots=True)
+class PrintNode(Node):
     values: List[Union["ExprNode", CteStringNode]]
 
 
-@dataclass
-class WhileNode:
+@dataclass(slots=True)
+class WhileNode(Node):
     condition: "ExprNode"
     body: BodyNode
 
 
-@dataclass
-class IfNode:
+@dataclass(slots=True)
+class IfNode(Node):
     condition: "ExprNode"
     then_body: BodyNode
 
 
-@dataclass
-class IfElseNode:
+@dataclass(slots=True)
+class IfElseNode(Node):
     condition: "ExprNode"
     then_body: BodyNode
     else_body: BodyNode
@@ -102,27 +139,27 @@ class IfElseNode:
 TypeNode = Literal["int", "float"]
 
 
-@dataclass
-class VarDeclNode:
+@dataclass(slots=True)
+class VarDeclNode(Node):
     names: List[str]
     var_type: TypeNode
     init_value: Optional["ExprNode"] = None
     isConstant: bool = False
 
 
-@dataclass
-class ParamNode:
+@dataclass(slots=True)
+class ParamNode(Node):
     name: str
     param_type: TypeNode
 
 
-@dataclass
-class ParamsNode:
+@dataclass(slots=True)
+class ParamsNode(Node):
     params: List[ParamNode]
 
 
-@dataclass
-class FunctionDeclNode:
+@dataclass(slots=True)
+class FunctionDeclNode(Node):
     name: str
     return_type: Union[TypeNode, Literal["void"]]
     params: ParamsNode
@@ -130,23 +167,32 @@ class FunctionDeclNode:
     var_decls: List[VarDeclNode]
 
 
-@dataclass
-class ReturnNode:
+@dataclass(slots=True)
+class ReturnNode(Node):
     expresion: "ExprNode"
 
 
-@dataclass
-class FuncCallNode:
+@dataclass(slots=True)
+class FuncCallNode(Node):
     name: str
     args: List["ExprNode"]
 
 
-@dataclass
-class ProgramNode:
+@dataclass(slots=True)
+class ProgramNode(Node):
     name: str
     global_decls: List[VarDeclNode]
     functions: List[FunctionDeclNode]
     main_body: BodyNode
+    imports: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ModuleNode(Node):
+    name: str
+    global_decls: List[VarDeclNode]
+    functions: List[FunctionDeclNode]
+    imports: List[str] = field(default_factory=list)
 
 
 # Para poder referenciar ExprNode y StmtNode antes de que estén completamente definidos
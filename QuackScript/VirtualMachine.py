@@ -1,7 +1,7 @@
 import os
-import pickle
 
 from MemoryManager import Memory, MemoryManager
+from QuackObjectFile import read_object_file
 
 
 class QuackVirtualMachine:
@@ -16,6 +16,7 @@ class QuackVirtualMachine:
         Initializes the Quack Virtual Machine.
         """
         # self.symbol_table = None
+        self.program = None
         self.quadruples = None
         self.memory_manager = None
         self.operators = None
@@ -27,10 +28,9 @@ class QuackVirtualMachine:
 
     def read_and_delete_object_files(self, file_name):
         # print(f"Reading object file: {file_name}")
-        with open(file_name, "rb") as f:
-            data = pickle.load(f)
+        program = read_object_file(file_name)
         os.remove(file_name)
-        return data
+        return program
 
     def display_quads(self):
         """
@@ -96,6 +96,9 @@ class QuackVirtualMachine:
         op_endFunc = self.operators["endFunc"]
         op_end = self.operators["end"]
 
+        # Functions whose code has not been decoded yet (lazily loaded object files)
+        pending_functions = self.program.pending_functions
+
         while quadruple[0] != self.operators["end"]:
             quadruple = self.quadruples[current_pos]
             op, arg1, arg2, result = quadruple
@@ -198,6 +201,9 @@ class QuackVirtualMachine:
                     self.next_local_memory.set_memory(index=result, value=arg1)
 
                 case _ if op == op_gosub:
+                    if result in pending_functions:
+                        self.program.load_function(result)
+
                     prev_local_memory = self.swap_local_memory(self.next_local_memory)
                     if prev_local_memory:
                         self.sleeping_stack.append(prev_local_memory)
@@ -285,24 +291,39 @@ class QuackVirtualMachine:
         # Reconstruct constants
         constants = self.constant_table.constants
         if constants:
-            for address, constant in constants.items():
-                self.memory_manager.set_memory(index=address, value=constant.value)
+            for address, value in constants.items():
+                self.memory_manager.set_memory(index=address, value=value)
 
-    def translate_program(self, file_name):
+    def translate_program(self, file_name, delete_object: bool = True):
         """
-        Translates a QuackScript program from an object file
+        Translates a QuackScript program from an object file.
+        The object file is deleted after loading unless delete_object is False,
+        in which case it is kept mapped and each function is decoded on its first call.
         """
         if not os.path.exists(file_name):
             print(f"File {file_name} does not exist.")
             return
 
-        data = self.read_and_delete_object_files(file_name)
+        if delete_object:
+            program = self.read_and_delete_object_files(file_name)
+        else:
+            program = read_object_file(file_name, lazy=True)
+
+        try:
+            self.execute_program(program)
+        finally:
+            program.close()
 
-        self.quadruples = data["quadruples"]
-        self.operators = data["operators"]
-        self.functions = data["functions"]
-        self.constant_table = data["constants_table"]
-        self.global_container_name = data["global_container_name"]
+    def execute_program(self, program):
+        """
+        Executes a program decoded by QuackObjectFile.
+        """
+        self.program = program
+        self.quadruples = program.quadruples
+        self.operators = program.operators
+        self.functions = program.functions
+        self.constant_table = program.constants_table
+        self.global_container_name = program.global_container_name
 
         self.reconstruct_memory()
 